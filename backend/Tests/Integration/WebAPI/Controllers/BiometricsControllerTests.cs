@@ -8,6 +8,7 @@ using FluentAssertions;
 using Infrastructure.Data;
 using Microsoft.Extensions.DependencyInjection;
 using Tests.Helpers;
+using WebAPI.Controllers;
 using Xunit;
 
 namespace Tests.Integration.WebAPI.Controllers;
@@ -160,4 +161,63 @@ public class BiometricsControllerTests : IClassFixture<TestWebApplicationFactory
 
         response.StatusCode.Should().Be(HttpStatusCode.NotFound);
     }
+
+    [Fact]
+    public async Task ReceiveBleReadings_Batch_AppliesLatestReading()
+    {
+        // Fora de ordem: a leitura mais recente prevalece, independente da posição no lote
+        var dto = new
+        {
+            appointmentId = _appointment.Id.ToString(),
+            deviceType = "blood_pressure",
+            readings = new object[]
+            {
+                new { timestamp = "2026-01-10T09:00:00", values = new { systolic = 121, diastolic = 79, heartRate = 93 } },
+                new { timestamp = "2026-01-10T08:00:00", values = new { systolic = 135, diastolic = 88, heartRate = 70 } }
+            }
+        };
+
+        var response = await _client.PostAsJsonAsync("/api/biometrics/ble-readings", dto);
+
+        response.StatusCode.Should().Be(HttpStatusCode.OK);
+
+        var biometrics = await _client.GetFromJsonAsync<BiometricsDto>($"/api/appointments/{_appointment.Id}/biometrics");
+        biometrics.Should().NotBeNull();
+        biometrics!.BloodPressureSystolic.Should().Be(121);
+        biometrics.BloodPressureDiastolic.Should().Be(79);
+        biometrics.HeartRate.Should().Be(93);
+    }
+
+    [Fact]
+    public async Task ReceiveBleReadings_NonExistingAppointment_ReturnsNotFound()
+    {
+        var dto = new
+        {
+            appointmentId = Guid.NewGuid().ToString(),
+            deviceType = "blood_pressure",
+            readings = new[]
+            {
+                new { timestamp = "2026-01-10T09:00:00", values = new { systolic = 121, diastolic = 79 } }
+            }
+        };
+
+        var response = await _client.PostAsJsonAsync("/api/biometrics/ble-readings", dto);
+
+        response.StatusCode.Should().Be(HttpStatusCode.NotFound);
+    }
+
+    [Fact]
+    public async Task ReceiveBleReadings_EmptyReadings_ReturnsBadRequest()
+    {
+        var dto = new
+        {
+            appointmentId = _appointment.Id.ToString(),
+            deviceType = "blood_pressure",
+            readings = Array.Empty<object>()
+        };
+
+        var response = await _client.PostAsJsonAsync("/api/biometrics/ble-readings", dto);
+
+        response.StatusCode.Should().Be(HttpStatusCode.BadRequest);
+    }
 }
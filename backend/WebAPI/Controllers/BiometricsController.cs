@@ -135,32 +135,7 @@ public class BleBridgeController : ControllerBase
             ? new BiometricsDto()
             : JsonSerializer.Deserialize<BiometricsDto>(appointment.BiometricsJson) ?? new BiometricsDto();
 
-        // Aplica valores baseado no tipo
-        switch (dto.DeviceType?.ToLower())
-        {
-            case "scale":
-                if (dto.Values.TryGetValue("weight", out var weight))
-                    biometrics.Weight = Convert.ToDecimal(weight);
-                break;
-            case "blood_pressure":
-                if (dto.Values.TryGetValue("systolic", out var sys))
-                    biometrics.BloodPressureSystolic = Convert.ToInt32(sys);
-                if (dto.Values.TryGetValue("diastolic", out var dia))
-                    biometrics.BloodPressureDiastolic = Convert.ToInt32(dia);
-                if (dto.Values.TryGetValue("heartRate", out var hr))
-                    biometrics.HeartRate = Convert.ToInt32(hr);
-                break;
-            case "oximeter":
-                if (dto.Values.TryGetValue("spo2", out var spo2))
-                    biometrics.OxygenSaturation = Convert.ToInt32(spo2);
-                if (dto.Values.TryGetValue("pulseRate", out var pulse))
-                    biometrics.HeartRate = Convert.ToInt32(pulse);
-                break;
-            case "thermometer":
-                if (dto.Values.TryGetValue("temperature", out var temp))
-                    biometrics.Temperature = Convert.ToDecimal(temp);
-                break;
-        }
+        ApplyReading(biometrics, dto.DeviceType, dto.Values);
 
         biometrics.LastUpdated = DateTime.UtcNow.ToString("o");
         appointment.BiometricsJson = JsonSerializer.Serialize(biometrics);
@@ -181,6 +156,95 @@ public class BleBridgeController : ControllerBase
 
         return Ok(new { message = "Leitura processada", biometrics });
     }
+
+    /// <summary>
+    /// Recebe o histórico de um dispositivo (ex.: medições guardadas no Omron) em uma única chamada.
+    /// As leituras são aplicadas em ordem cronológica, com um único SaveChanges e um único aviso via SignalR.
+    /// </summary>
+    [HttpPost("ble-readings")]
+    public async Task<ActionResult> ReceiveBleReadings([FromBody] BleReadingBatchDto dto)
+    {
+        _logger.LogInformation("[BLE Bridge] Lote recebido: {Type} com {Count} leituras", dto.DeviceType, dto.Readings.Count);
+
+        if (!Guid.TryParse(dto.AppointmentId, out var appointmentId))
+            return BadRequest(new { message = "appointmentId inválido" });
+
+        if (dto.Readings.Count == 0)
+            return BadRequest(new { message = "Lote sem leituras" });
+
+        var appointment = await _context.Appointments.FindAsync(appointmentId);
+        if (appointment == null)
+            return NotFound(new { message = "Consulta não encontrada" });
+
+        var biometrics = string.IsNullOrEmpty(appointment.BiometricsJson)
+            ? new BiometricsDto()
+            : JsonSerializer.Deserialize<BiometricsDto>(appointment.BiometricsJson) ?? new BiometricsDto();
+
+        // A mais recente prevalece; leituras sem data ficam antes das datadas
+        var readings = dto.Readings
+            .OrderBy(r => DateTime.TryParse(r.Timestamp, out var t) ? t : DateTime.MinValue)
+            .ToList();
+        foreach (var reading in readings)
+            ApplyReading(biometrics, reading.DeviceType ?? dto.DeviceType, reading.Values);
+
+        biometrics.LastUpdated = DateTime.UtcNow.ToString("o");
+        appointment.BiometricsJson = JsonSerializer.Serialize(biometrics);
+        await _context.SaveChangesAsync();
+
+        var latest = readings[^1];
+        await _hubContext.Clients.Group($"appointment_{appointmentId}")
+            .SendAsync("BiometricsUpdated", new
+            {
+                appointmentId = dto.AppointmentId,
+                deviceType = latest.DeviceType ?? dto.DeviceType,
+                values = latest.Values,
+                count = readings.Count,
+                biometrics,
+                timestamp = biometrics.LastUpdated
+            });
+
+        return Ok(new { message = "Lote processado", count = readings.Count, biometrics });
+    }
+
+    /// <summary>
+    /// Aplica os valores de uma leitura nos biométricos conforme o tipo do dispositivo
+    /// </summary>
+    private static void ApplyReading(BiometricsDto biometrics, string? deviceType, Dictionary<string, object> values)
+    {
+        switch (deviceType?.ToLower())
+        {
+            case "scale":
+                if (values.TryGetValue("weight", out var weight))
+                    biometrics.Weight = ToDecimal(weight);
+                break;
+            case "blood_pressure":
+                if (values.TryGetValue("systolic", out var sys))
+                    biometrics.BloodPressureSystolic = ToInt32(sys);
+                if (values.TryGetValue("diastolic", out var dia))
+                    biometrics.BloodPressureDiastolic = ToInt32(dia);
+                if (values.TryGetValue("heartRate", out var hr))
+                    biometrics.HeartRate = ToInt32(hr);
+                break;
+            case "oximeter":
+                if (values.TryGetValue("spo2", out var spo2))
+                    biometrics.OxygenSaturation = ToInt32(spo2);
+                if (values.TryGetValue("pulseRate", out var pulse))
+                    biometrics.HeartRate = ToInt32(pulse);
+                break;
+            case "thermometer":
+                if (values.TryGetValue("temperature", out var temp))
+                    biometrics.Temperature = ToDecimal(temp);
+                break;
+        }
+    }
+
+    /// <summary>
+    /// Valores do corpo chegam como JsonElement (Dictionary&lt;string, object&gt;), que não é IConvertible
+    /// </summary>
+    private static decimal ToDecimal(object value) =>
+        value is JsonElement element ? element.GetDecimal() : Convert.ToDecimal(value);
+
+    private static int ToInt32(object value) => (int)Math.Round(ToDecimal(value));
 }
 
 public class BleReadingDto
@@ -191,6 +255,13 @@ public class BleReadingDto
     public Dictionary<string, object> Values { get; set; } = new();
 }
 
+public class BleReadingBatchDto
+{
+    public string? AppointmentId { get; set; }
+    public string? DeviceType { get; set; }
+    public List<BleReadingDto> Readings { get; set; } = new();
+}
+
 public class BiometricsDto
 {
     public int? HeartRate { get; set; }
@@ -1,50 +1,34 @@
 import asyncio
-from bleak import BleakScanner
+
+from ble.decoders import okok_advertisement
+from ble.estabilizacao import para_tipo
+from ble.scan_daemon import ScannerCompartilhado
 
 TARGET_MAC = "F8:8F:C8:3A:B7:92"
 
-ULTIMO_PESO = 0
-CONTADOR = 0
-JA_MOSTROU = False
+balanca = para_tipo("scale")
 
 def detection_callback(device, advertisement_data):
-    global ULTIMO_PESO, CONTADOR, JA_MOSTROU
-
-    if device.address.upper() != TARGET_MAC:
-        return
-
     for _, data in advertisement_data.manufacturer_data.items():
         if len(data) < 6:
             continue
             
-        # Peso em bytes 0-1 Big Endian, dividido por 100
-        raw = (data[0] << 8) | data[1]
-        peso = round(raw / 100, 2)
+        peso = okok_advertisement(data).weight
         
         # Se zerou, reseta
-        if raw == 0:
-            if JA_MOSTROU:
+        if peso == 0:
+            if balanca.confirmado is not None:
                 print("🔄 Zerou - pronta para próxima pesagem\n")
-            ULTIMO_PESO = 0
-            CONTADOR = 0
-            JA_MOSTROU = False
+            balanca.reiniciar()
             return
         
         # Mostra em tempo real
         print(f"⚖️  {peso} kg", end="\r")
         
-        # Conta estabilidade
-        if raw == ULTIMO_PESO:
-            CONTADOR += 1
-        else:
-            ULTIMO_PESO = raw
-            CONTADOR = 1
-            JA_MOSTROU = False
-        
-        # Confirma após 5 leituras iguais
-        if CONTADOR >= 5 and not JA_MOSTROU:
-            JA_MOSTROU = True
-            print(f"\n\n✅ PESO: {peso} kg\n")
+        # Confirma quando o peso estabiliza
+        confirmado = balanca.adicionar(peso)
+        if confirmado is not None:
+            print(f"\n\n✅ PESO: {confirmado} kg (estável em {balanca.tempo_confirmacao:.1f}s)\n")
 
 async def main():
     print("=" * 40)
@@ -52,7 +36,7 @@ async def main():
     print("=" * 40)
     print("\nCtrl+C para sair\n")
     
-    scanner = BleakScanner(detection_callback)
+    scanner = ScannerCompartilhado(detection_callback, macs=[TARGET_MAC])
     await scanner.start()
 
     try:
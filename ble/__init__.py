@@ -0,0 +1,3 @@
+"""
+Módulos compartilhados pelos scripts BLE do TeleCuidar (ble_bridge.py e ferramentas de diagnóstico)
+"""
@@ -0,0 +1,284 @@
+"""
+Vários adaptadores HCI no mesmo gateway (BlueZ: hci0, hci1, ...)
+Um adaptador sozinho aceita poucas conexões LE ao mesmo tempo e divide o rádio
+entre scan e conexões. Com vários:
+  - todos escaneiam (ScannerMultiplo): cada um registra o RSSI que vê de cada
+    dispositivo, e os anúncios repetidos entre adaptadores caem no dedup do bridge
+  - cada conexão vai para o adaptador com melhor pontuação (Balanceador):
+    RSSI suavizado naquele adaptador menos uma penalidade proporcional à
+    ocupação; adaptador cheio não recebe conexão
+  - a conexão usa o BLEDevice visto pelo próprio adaptador (no BlueZ o caminho
+    D-Bus do dispositivo é por adaptador)
+
+    python ble_bridge.py --adaptadores hci0,hci1,hci2
+
+RadioFalso substitui scanners e clientes com adaptadores e dispositivos em
+posições fixas (RSSI pela distância, capacidade de conexões por adaptador):
+    python -m ble.adaptadores --adaptadores 3 --dispositivos 12
+"""
+import argparse
+import asyncio
+import math
+import random
+import time
+
+from ble.console import console
+from ble.filtros import FiltroScan
+from ble.scan_daemon import iniciar_scanner
+from ble.trace import AnuncioFalso, DispositivoFalso
+
+CONEXOES_POR_ADAPTADOR = 5   # limite prático de conexões LE simultâneas por controlador
+RSSI_AUSENTE = -100          # adaptador que não vê o dispositivo (ou viu há muito tempo)
+
+
+class Adaptador:
+    __slots__ = ("nome", "capacidade", "conexoes", "vistos")
+
+    def __init__(self, nome: str, capacidade: int = CONEXOES_POR_ADAPTADOR):
+        self.nome = nome
+        self.capacidade = capacidade
+        self.conexoes = set()   # MACs conectados (ou conectando) por este adaptador
+        self.vistos = {}        # mac -> [rssi suavizado, monotonic do último anúncio, BLEDevice]
+
+    @property
+    def livres(self) -> int:
+        return self.capacidade - len(self.conexoes)
+
+
+class Balanceador:
+    """Escolhe o adaptador de cada conexão por RSSI e carga"""
+
+    def __init__(self, adaptadores: list, validade_rssi: float = 15.0, peso_carga: float = 15.0,
+                 suavizacao: float = 0.3, relogio=time.monotonic):
+        self.adaptadores = {a.nome: a for a in adaptadores}
+        self.validade_rssi = validade_rssi
+        self.peso_carga = peso_carga   # dB de RSSI que valem um adaptador cheio
+        self.suavizacao = suavizacao
+        self.relogio = relogio
+        self._conectado = {}           # mac -> Adaptador
+
+    def anuncio(self, nome: str, dispositivo, rssi):
+        """Chamado pelo scanner de cada adaptador (caminho quente: só atualiza a entrada)"""
+        mac = dispositivo.address.upper()
+        visto = self.adaptadores[nome].vistos.get(mac)
+        if visto is None:
+            self.adaptadores[nome].vistos[mac] = [float(rssi if rssi is not None else RSSI_AUSENTE),
+                                                  self.relogio(), dispositivo]
+            return
+        if rssi is not None:
+            visto[0] += self.suavizacao * (rssi - visto[0])
+        visto[1] = self.relogio()
+        visto[2] = dispositivo
+
+    def rssi(self, adaptador: Adaptador, mac: str) -> float:
+        visto = adaptador.vistos.get(mac)
+        if visto is None or self.relogio() - visto[1] > self.validade_rssi:
+            return RSSI_AUSENTE
+        return visto[0]
+
+    def pontuacao(self, adaptador: Adaptador, mac: str):
+        """None se o adaptador está cheio"""
+        if adaptador.livres <= 0:
+            return None
+        return self.rssi(adaptador, mac) - self.peso_carga * len(adaptador.conexoes) / adaptador.capacidade
+
+    def escolher(self, mac: str):
+        """Adaptador com a melhor pontuação para conectar `mac` (None se todos estão cheios)"""
+        mac = mac.upper()
+        melhor, melhor_pontos = None, None
+        for adaptador in self.adaptadores.values():
+            pontos = self.pontuacao(adaptador, mac)
+            if pontos is not None and (melhor_pontos is None or pontos > melhor_pontos):
+                melhor, melhor_pontos = adaptador, pontos
+        return melhor
+
+    def ocupar(self, adaptador: Adaptador, mac: str):
+        mac = mac.upper()
+        self.liberar(mac)
+        adaptador.conexoes.add(mac)
+        self._conectado[mac] = adaptador
+
+    def liberar(self, mac: str):
+        adaptador = self._conectado.pop(mac.upper(), None)
+        if adaptador is not None:
+            adaptador.conexoes.discard(mac.upper())
+
+    def dispositivo(self, adaptador: Adaptador, mac: str):
+        """BLEDevice visto por este adaptador; sem ele, o MAC (o bleak procura pelo adaptador)"""
+        visto = adaptador.vistos.get(mac.upper())
+        return visto[2] if visto is not None else mac
+
+    def argumentos_cliente(self, adaptador: Adaptador) -> dict:
+        return {"bluez": {"adapter": adaptador.nome}}
+
+    def resumo(self) -> dict:
+        return {a.nome: sorted(a.conexoes) for a in self.adaptadores.values()}
+
+
+class ScannerMultiplo:
+    """
+    Substituto do BleakScanner(detection_callback) com um scanner por adaptador.
+    `fabrica(callback, filtro, adaptador)` abre cada scanner (RadioFalso.iniciar_scanner nos testes).
+    """
+
+    def __init__(self, detection_callback, balanceador: Balanceador, macs=None, fabrica=iniciar_scanner):
+        self.detection_callback = detection_callback
+        self.balanceador = balanceador
+        self.fabrica = fabrica
+        self.filtros = {nome: FiltroScan(macs) for nome in balanceador.adaptadores}
+        self._scanners = []
+
+    async def start(self):
+        for nome, filtro in self.filtros.items():
+            try:
+                self._scanners.append(await self.fabrica(filtro.envolver(self._callback(nome)), filtro, nome))
+            except Exception as e:
+                console.log("⚠️  Adaptador {} sem scan: {}", nome, str(e) or type(e).__name__)
+        if not self._scanners:
+            raise RuntimeError("nenhum adaptador conseguiu escanear")
+
+    async def stop(self):
+        for scanner in self._scanners:
+            await scanner.stop()
+        self._scanners = []
+
+    def filtrar(self, macs):
+        for filtro in self.filtros.values():
+            filtro.trocar_macs(macs)
+
+    def resumo(self) -> dict:
+        return {"modo": f"local, {len(self.filtros)} adaptadores",
+                "no_sistema": "nenhum",
+                "vistos": sum(f.vistos for f in self.filtros.values()),
+                "filtrados": sum(f.filtrados for f in self.filtros.values())}
+
+    def _callback(self, nome: str):
+        anuncio = self.balanceador.anuncio
+        detection_callback = self.detection_callback
+
+        def callback(dispositivo, adv):
+            anuncio(nome, dispositivo, adv.rssi)
+            detection_callback(dispositivo, adv)
+        return callback
+
+
+# === Backend falso ===
+
+class RadioFalso:
+    """
+    Adaptadores e dispositivos num plano (metros): RSSI = -45 - 20·log10(d) + ruído.
+    Cada dispositivo anuncia a cada `intervalo`; conexão falha se o adaptador
+    passar da capacidade ou se o RSSI estiver abaixo de `rssi_minimo`.
+    """
+
+    def __init__(self, adaptadores: dict, dispositivos: dict, capacidade: int = CONEXOES_POR_ADAPTADOR,
+                 intervalo: float = 0.1, ruido: float = 3.0, rssi_minimo: float = -90.0):
+        self.adaptadores = adaptadores     # nome -> (x, y)
+        self.dispositivos = dispositivos   # mac -> (x, y)
+        self.capacidade = capacidade
+        self.intervalo = intervalo
+        self.ruido = ruido
+        self.rssi_minimo = rssi_minimo
+        self.conectados = {nome: set() for nome in adaptadores}
+
+    def rssi(self, adaptador: str, mac: str) -> float:
+        (ax, ay), (dx, dy) = self.adaptadores[adaptador], self.dispositivos[mac]
+        return -45 - 20 * math.log10(max(0.1, math.hypot(ax - dx, ay - dy)))
+
+    async def iniciar_scanner(self, callback, filtro, adaptador: str):
+        radio = self
+
+        class Scanner:
+            def __init__(self):
+                self.tarefa = asyncio.create_task(radio._anunciar(callback, adaptador))
+
+            async def stop(self):
+                self.tarefa.cancel()
+                await asyncio.gather(self.tarefa, return_exceptions=True)
+        return Scanner()
+
+    async def _anunciar(self, callback, adaptador: str):
+        dispositivos = {mac: DispositivoFalso(mac) for mac in self.dispositivos}
+        while True:
+            for mac, dispositivo in dispositivos.items():
+                rssi = round(self.rssi(adaptador, mac) + random.gauss(0, self.ruido))
+                if rssi >= self.rssi_minimo - 10:
+                    callback(dispositivo, AnuncioFalso({0xFFFF: mac.encode()}, {}, rssi))
+            await asyncio.sleep(self.intervalo)
+
+    def cliente(self, dispositivo, disconnected_callback=None, timeout=None, bluez=None, **_):
+        """cliente_factory para GerenciadorSessoes"""
+        return _ClienteRadio(self, getattr(dispositivo, "address", dispositivo).upper(),
+                             (bluez or {}).get("adapter"), disconnected_callback)
+
+
+class _ClienteRadio:
+    services = None
+
+    def __init__(self, radio: RadioFalso, mac: str, adaptador: str, disconnected_callback):
+        self.radio = radio
+        self.mac = mac
+        self.adaptador = adaptador
+        self.disconnected_callback = disconnected_callback
+        self.is_connected = False
+
+    async def connect(self):
+        conectados = self.radio.conectados[self.adaptador]
+        if len(conectados) >= self.radio.capacidade:
+            raise ConnectionError(f"{self.adaptador} sem slot de conexão")
+        if self.radio.rssi(self.adaptador, self.mac) < self.radio.rssi_minimo:
+            raise TimeoutError(f"{self.mac} fora do alcance de {self.adaptador}")
+        await asyncio.sleep(0.05)
+        conectados.add(self.mac)
+        self.is_connected = True
+        return True
+
+    async def start_notify(self, uuid, handler):
+        pass
+
+    async def disconnect(self):
+        if self.is_connected:
+            self.radio.conectados[self.adaptador].discard(self.mac)
+            self.is_connected = False
+
+
+async def simular(n_adaptadores: int, n_dispositivos: int, capacidade: int, duracao: float):
+    """Sessões GATT reais (GerenciadorSessoes) sobre o RadioFalso; devolve a distribuição final"""
+    from ble.sessoes import GerenciadorSessoes
+
+    adaptadores = {f"hci{i}": (10.0 * i, 0.0) for i in range(n_adaptadores)}
+    dispositivos = {f"AA:00:00:00:00:{i:02X}": (random.uniform(-5, 10.0 * n_adaptadores), random.uniform(-5, 5))
+                    for i in range(n_dispositivos)}
+    radio = RadioFalso(adaptadores, dispositivos, capacidade)
+    balanceador = Balanceador([Adaptador(nome, capacidade) for nome in adaptadores])
+    sessoes = GerenciadorSessoes(lambda *_: None, conexoes_simultaneas=n_adaptadores,
+                                 backoff_max=1.0, cliente_factory=radio.cliente, balanceador=balanceador)
+    scanner = ScannerMultiplo(lambda d, _: sessoes.anuncio(d.address, d), balanceador, macs=dispositivos,
+                              fabrica=radio.iniciar_scanner)
+    for mac in dispositivos:
+        sessoes.adicionar(mac, [])
+    await scanner.start()
+    sessoes.iniciar()
+    await asyncio.sleep(duracao)
+    await scanner.stop()
+    distribuicao = {mac: (adaptador, round(radio.rssi(adaptador, mac)))
+                    for adaptador, macs in balanceador.resumo().items() for mac in macs}
+    await sessoes.encerrar()
+    return distribuicao
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simula a distribuição de conexões entre adaptadores")
+    parser.add_argument("--adaptadores", type=int, default=3)
+    parser.add_argument("--dispositivos", type=int, default=12)
+    parser.add_argument("--capacidade", type=int, default=CONEXOES_POR_ADAPTADOR)
+    parser.add_argument("--duracao", type=float, default=3.0)
+    args = parser.parse_args()
+    distribuicao = asyncio.run(simular(args.adaptadores, args.dispositivos, args.capacidade, args.duracao))
+    for mac, (adaptador, rssi) in sorted(distribuicao.items()):
+        print(f"{mac}  {adaptador}  {rssi:>4} dBm")
+    print(f"\n{len(distribuicao)} de {args.dispositivos} conectados")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Agendador de conexões GATT por RSSI, recência do anúncio, prioridade e falhas
+Uma tentativa de conexão com um aparelho fora de alcance prende o adaptador
+por até 30 s. Aqui cada tentativa precisa de uma vaga (no máximo
+`conexoes_simultaneas` ao mesmo tempo), e a vaga livre vai para o candidato
+com a maior pontuação:
+
+    prioridade × peso_prioridade + (RSSI − rssi_minimo) − idade do anúncio × peso_idade
+    − falhas × peso_falha (pela metade a cada `meia_vida` s sem falhar)
+
+Candidato sem anúncio há mais de `validade` s, abaixo de `rssi_minimo` ou que
+não anunciou desde a última falha não recebe vaga. Durante a tentativa, se o
+aparelho para de anunciar por `abandono` s ela é abortada, sem esperar o
+timeout do bleak.
+
+    async with conexao(ADDRESS, prioridade=MEDICAO) as client:
+        ...
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from bleak import BleakClient
+from bleak.exc import BleakError
+
+from ble import metricas
+from ble.console import console
+from ble.scan_daemon import ScannerCompartilhado, alvo
+
+# Prioridades: a vaga vai primeiro para onde uma leitura está para acontecer
+MEDICAO = 3      # o aparelho acabou de medir / acordou para mandar a leitura
+HISTORICO = 2    # download dos registros guardados
+METADADOS = 1    # informações do aparelho (Device Information, serviços)
+
+
+class Candidato:
+    __slots__ = ("mac", "prioridade", "rssi", "visto", "dispositivo", "falhas", "ultima_falha")
+
+    def __init__(self, mac: str, prioridade: int = METADADOS):
+        self.mac = mac
+        self.prioridade = prioridade
+        self.rssi = None           # suavizado
+        self.visto = None          # monotonic do último anúncio
+        self.dispositivo = None    # último BLEDevice
+        self.falhas = 0
+        self.ultima_falha = None
+
+
+class Agendador:
+    def __init__(self, conexoes_simultaneas: int = 1, validade: float = 5.0, abandono: float = 4.0,
+                 timeout: float = 10.0, rssi_minimo: float = -90.0, peso_prioridade: float = 20.0,
+                 peso_idade: float = 2.0, peso_falha: float = 10.0, meia_vida: float = 60.0,
+                 suavizacao: float = 0.3, relogio=time.monotonic):
+        self.conexoes_simultaneas = conexoes_simultaneas
+        self.validade = validade
+        self.abandono = abandono
+        self.timeout = timeout
+        self.rssi_minimo = rssi_minimo
+        self.peso_prioridade = peso_prioridade
+        self.peso_idade = peso_idade
+        self.peso_falha = peso_falha
+        self.meia_vida = meia_vida
+        self.suavizacao = suavizacao
+        self.relogio = relogio
+        self.candidatos = {}
+        self.ocupadas = 0
+        self._espera = {}   # mac -> Future da vaga
+
+    def anuncio(self, dispositivo, rssi=None):
+        """Chamado pelo detection_callback (caminho quente: atualiza e, se alguém espera, despacha)"""
+        mac = dispositivo.address.upper()
+        candidato = self.candidatos.get(mac)
+        if candidato is None:
+            candidato = self.candidatos[mac] = Candidato(mac)
+        if rssi is not None:
+            candidato.rssi = rssi if candidato.rssi is None else \
+                candidato.rssi + self.suavizacao * (rssi - candidato.rssi)
+        candidato.visto = self.relogio()
+        candidato.dispositivo = dispositivo
+        if self._espera:
+            self._despachar()
+
+    def pontuacao(self, candidato: Candidato, agora: float = None):
+        """None se o candidato não deve receber vaga agora"""
+        agora = self.relogio() if agora is None else agora
+        if candidato.visto is None or agora - candidato.visto > self.validade:
+            return None
+        if candidato.ultima_falha is not None and candidato.visto <= candidato.ultima_falha:
+            return None
+        rssi = candidato.rssi if candidato.rssi is not None else self.rssi_minimo
+        if rssi < self.rssi_minimo:
+            return None
+        pontos = (self.peso_prioridade * candidato.prioridade + (rssi - self.rssi_minimo)
+                  - self.peso_idade * (agora - candidato.visto))
+        if candidato.falhas:
+            pontos -= self.peso_falha * candidato.falhas * 0.5 ** ((agora - candidato.ultima_falha) / self.meia_vida)
+        return pontos
+
+    def ranking(self) -> list:
+        """(mac, pontuação) de quem espera vaga, do primeiro ao último (None = inelegível)"""
+        agora = self.relogio()
+        pontos = [(mac, self.pontuacao(self.candidatos[mac], agora)) for mac in self._espera]
+        return sorted(pontos, key=lambda p: float("-inf") if p[1] is None else p[1], reverse=True)
+
+    def _despachar(self):
+        agora = self.relogio()
+        while self.ocupadas < self.conexoes_simultaneas and self._espera:
+            melhor, melhor_pontos = None, None
+            for mac in self._espera:
+                pontos = self.pontuacao(self.candidatos[mac], agora)
+                if pontos is not None and (melhor_pontos is None or pontos > melhor_pontos):
+                    melhor, melhor_pontos = mac, pontos
+            if melhor is None:
+                return
+            self.ocupadas += 1
+            self._espera.pop(melhor).set_result(None)
+
+    def _liberar(self):
+        self.ocupadas -= 1
+        self._despachar()
+
+    @asynccontextmanager
+    async def vaga(self, mac: str, prioridade: int = MEDICAO, espera: float = None):
+        """
+        Espera a vez de tentar conectar `mac` (asyncio.TimeoutError após `espera` s);
+        a vaga é devolvida ao sair do bloco. Um pedido por MAC de cada vez.
+        """
+        mac = mac.upper()
+        if mac in self._espera:
+            raise RuntimeError(f"{mac} já está esperando vaga")
+        candidato = self.candidatos.get(mac)
+        if candidato is None:
+            candidato = self.candidatos[mac] = Candidato(mac)
+        candidato.prioridade = prioridade
+        vez = self._espera[mac] = asyncio.get_running_loop().create_future()
+        self._despachar()
+        try:
+            await asyncio.wait_for(vez, espera)
+        except BaseException:
+            if self._espera.get(mac) is vez:
+                del self._espera[mac]
+            elif vez.done() and not vez.cancelled():
+                self._liberar()
+            raise
+        try:
+            yield candidato
+        finally:
+            self._liberar()
+
+    async def conectar(self, cliente, mac: str, timeout: float = None):
+        """cliente.connect() abortado no timeout ou quando o aparelho para de anunciar"""
+        candidato = self.candidatos[mac.upper()]
+        limite = self.timeout if timeout is None else timeout
+        inicio = self.relogio()
+        tentativa = asyncio.ensure_future(cliente.connect())
+        try:
+            while not tentativa.done():
+                await asyncio.wait({tentativa}, timeout=min(0.5, self.abandono / 4))
+                agora = self.relogio()
+                if tentativa.done():
+                    break
+                if agora - inicio > limite:
+                    metricas.CONEXOES_ABORTADAS.inc("timeout")
+                    raise asyncio.TimeoutError(f"sem conexão em {limite:.0f}s")
+                if agora - max(candidato.visto or inicio, inicio) > self.abandono:
+                    metricas.CONEXOES_ABORTADAS.inc("parou_de_anunciar")
+                    raise asyncio.TimeoutError(f"parou de anunciar há {agora - (candidato.visto or inicio):.1f}s")
+            tentativa.result()
+        except BaseException:
+            candidato.falhas += 1
+            candidato.ultima_falha = self.relogio()
+            if not tentativa.done():
+                tentativa.cancel()
+                await asyncio.gather(tentativa, return_exceptions=True)
+                try:
+                    await cliente.disconnect()
+                except Exception:
+                    pass
+            raise
+        candidato.falhas = 0
+        candidato.ultima_falha = None
+
+
+# Agendador do processo: as conexões abertas por conexao() disputam as mesmas vagas
+compartilhado = Agendador()
+
+
+@asynccontextmanager
+async def conexao(mac: str, prioridade: int = MEDICAO, espera: float = 60.0, agendador: Agendador = None,
+                  **argumentos_cliente):
+    """
+    BleakClient conectado a `mac` quando ele estiver anunciando e for a vez dele;
+    tentativas abortadas são refeitas no próximo anúncio até `espera` s (None = sem limite).
+    asyncio.TimeoutError se não der para conectar a tempo.
+    """
+    agendador = agendador or compartilhado
+    mac = mac.upper()
+    scanner = ScannerCompartilhado(lambda dispositivo, adv: agendador.anuncio(dispositivo, adv.rssi), macs=[mac])
+    await scanner.start()
+    limite = None if espera is None else time.monotonic() + espera
+    cliente = None
+    try:
+        while cliente is None:
+            restante = None if limite is None else limite - time.monotonic()
+            if restante is not None and restante <= 0:
+                raise asyncio.TimeoutError(f"{mac} não anunciou / não conectou em {espera:.0f}s")
+            async with agendador.vaga(mac, prioridade, restante) as candidato:
+                tentativa = BleakClient(alvo(candidato.dispositivo), timeout=agendador.timeout * 2, **argumentos_cliente)
+                try:
+                    await agendador.conectar(tentativa, mac)
+                    cliente = tentativa
+                except (asyncio.TimeoutError, BleakError, OSError) as e:
+                    console.log("⚠️  {}: tentativa abortada ({}), esperando o próximo anúncio",
+                                mac, str(e) or type(e).__name__)
+    finally:
+        await scanner.stop()
+    try:
+        yield cliente
+    finally:
+        await cliente.disconnect()
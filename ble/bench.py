@@ -0,0 +1,297 @@
+"""
+Benchmark dos decodificadores e da latência ponta a ponta do BLE Bridge
+    python -m ble.bench [--corpus captura.bltrace ...] [--saida bench_ble.json]
+
+1. Decodificadores: pacotes/s e p50/p99 por chamada sobre corpora sintéticos
+   e, opcionalmente, capturas .bltrace (ble.trace).
+2. Ponta a ponta: o bridge inteiro (detection_callback → outbox → envio) contra
+   um backend HTTP local, com 1, 10 e 100 dispositivos simulados; mede o tempo
+   de leitura confirmada até o 200 do backend.
+Os resultados vão para um JSON para comparação entre versões.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import struct
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+from aiohttp import web
+
+from ble import gatt_saude
+from ble.decoders import okok_advertisement, registro_padrao
+from ble.trace import AnuncioFalso, DispositivoFalso, ler
+
+
+def percentil(ordenados: list, p: float) -> float:
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def _estatisticas(amostras_ns: list, total_s: float) -> dict:
+    amostras_ns.sort()
+    return {
+        "pacotes": len(amostras_ns),
+        "pacotes_s": round(len(amostras_ns) / total_s) if total_s else 0,
+        "p50_us": round(percentil(amostras_ns, 0.50) / 1000, 3),
+        "p99_us": round(percentil(amostras_ns, 0.99) / 1000, 3),
+    }
+
+
+def medir(funcao, pacotes: list, repeticoes: int = 1) -> dict:
+    """Chama funcao(pacote) para cada pacote, cronometrando cada chamada"""
+    amostras = []
+    relogio = time.perf_counter_ns
+    inicio = relogio()
+    # Decodificadores dos scripts imprimem: a saída vai para um buffer, não para o terminal
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeticoes):
+            for pacote in pacotes:
+                t0 = relogio()
+                funcao(pacote)
+                amostras.append(relogio() - t0)
+    return _estatisticas(amostras, (relogio() - inicio) / 1e9)
+
+
+# === Corpora sintéticos ===
+
+def corpus_okok(n: int = 5000) -> list:
+    pacotes = []
+    for i in range(n):
+        gramas = 0 if i % 50 == 0 else 7000 + (i // 10) % 500
+        raw = gramas // 10 if gramas else 0
+        pacotes.append(bytes([raw >> 8, raw & 0xFF, 0x00, 0x00, 0x00, 0x01]))
+    return pacotes
+
+
+def corpus_pressao(n: int = 5000) -> list:
+    pacotes = []
+    for i in range(n):
+        flags = (0x00, 0x04, 0x06, 0x1E)[i % 4]
+        pacote = bytes([flags]) + struct.pack("<HHH", 110 + i % 40, 70 + i % 20, 85 + i % 20)
+        if flags & 0x02:
+            pacote += struct.pack("<HBBBBB", 2026, 1, 1 + i % 28, i % 24, i % 60, i % 60)
+        if flags & 0x04:
+            pacote += struct.pack("<H", 60 + i % 40)
+        if flags & 0x08:
+            pacote += bytes([1])
+        if flags & 0x10:
+            pacote += struct.pack("<H", 0)
+        pacotes.append(pacote)
+    return pacotes
+
+
+def corpus_temperatura(n: int = 5000) -> list:
+    return [bytes([i % 2 * 0x04]) + struct.pack("<I", (0xFF << 24) | (355 + i % 30)) + bytes([2]) * (i % 2)
+            for i in range(n)]
+
+
+def corpus_oximetria(n: int = 5000) -> list:
+    return [bytes([0x10 if i % 2 else 0x00]) + struct.pack("<HHH", 94 + i % 6, 60 + i % 40, 0xF000 | 40)
+            for i in range(n)]
+
+
+def corpus_peso(n: int = 5000) -> list:
+    return [bytes([0x08 if i % 2 else 0x00]) + struct.pack("<HHH", 14000 + i, 245, 1750) for i in range(n)]
+
+
+def bench_decodificadores(corpora_capturados: list) -> dict:
+    import ble_bridge
+    import pressao
+    import temperatura
+
+    okok = corpus_okok()
+    ble_bridge.registro.registrar_modelo("okok", mac="AA:00:00:00:00:00")
+    pressao_pacotes = corpus_pressao()
+    temperatura_pacotes = corpus_temperatura()
+
+    resultados = {
+        "okok_advertisement": medir(okok_advertisement, okok),
+        "ble_bridge.processar_balanca": medir(lambda p: ble_bridge.processar_balanca("AA:00:00:00:00:00", okok_advertisement(p)), okok),
+        # Anúncio repetido: descartado pelo ble.dedup antes de decodificar
+        "ble_bridge.tratar_pacote (repetido)": medir(
+            lambda p: ble_bridge.tratar_pacote("AA:00:00:00:00:00", 0xC0, p, anuncio=True), [okok[0]] * len(okok)),
+        "gatt_saude.pressao_arterial": medir(gatt_saude.pressao_arterial, pressao_pacotes),
+        "pressao.parse_blood_pressure": medir(pressao.parse_blood_pressure, pressao_pacotes),
+        "gatt_saude.temperatura": medir(gatt_saude.temperatura, temperatura_pacotes),
+        "temperatura.parse_temperature": medir(temperatura.parse_temperature, temperatura_pacotes),
+        "gatt_saude.oximetria_continua": medir(gatt_saude.oximetria_continua, corpus_oximetria()),
+        "gatt_saude.peso": medir(gatt_saude.peso, corpus_peso()),
+    }
+
+    # Capturas reais: cada registro passa pela resolução do registro + decodificador
+    registro = registro_padrao()
+    for mac, info in ble_bridge.DEVICES.items():
+        registro.registrar_modelo(info["modelo"], mac=mac)
+    for caminho in corpora_capturados:
+        registros = ler(caminho)
+
+        def decodificar(r):
+            decodificador = registro.resolver(r.mac, r.uuid if r.uuid else r.company_id)
+            if decodificador:
+                decodificador.decodificar(r.data)
+        resultados[f"trace:{os.path.basename(caminho)}"] = medir(decodificar, registros)
+    return resultados
+
+
+# === Ponta a ponta ===
+
+class BackendFalso:
+    """Stand-in local de POST /api/biometrics/ble-reading"""
+
+    def __init__(self, atraso_ms: float = 0.0):
+        self.atraso = atraso_ms / 1000
+        self.recebidas = 0
+        self._runner = None
+        self.url = None
+
+    async def _ble_reading(self, request):
+        await request.read()
+        if self.atraso:
+            await asyncio.sleep(self.atraso)
+        self.recebidas += 1
+        return web.json_response({"message": "Leitura processada"})
+
+    async def iniciar(self):
+        app = web.Application()
+        app.router.add_post("/api/biometrics/ble-reading", self._ble_reading)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        porta = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{porta}/api/biometrics/ble-reading"
+
+    async def encerrar(self):
+        await self._runner.cleanup()
+
+
+async def bench_ponta_a_ponta(dispositivos: int, duracao: float, intervalo: float, atraso_ms: float) -> dict:
+    """Simula `dispositivos` balanças OKOK anunciando a cada `intervalo` s durante `duracao` s"""
+    import ble_bridge
+    from ble.envio import Entregador
+    from ble.outbox import Outbox, Replicador
+    from ble.estado import TabelaEstados
+    from ble.sessoes import GerenciadorSessoes
+
+    backend = BackendFalso(atraso_ms)
+    await backend.iniciar()
+
+    enviadas, confirmadas = {}, {}
+    relogio = time.perf_counter
+
+    class OutboxMedido(Outbox):
+        def adicionar(self, payload, mac=None):
+            chave = super().adicionar(payload, mac)
+            enviadas[chave] = relogio()
+            return chave
+
+        def confirmar(self, id_):
+            chave = self.db.execute("SELECT chave FROM leituras WHERE id = ?", (id_,)).fetchone()[0]
+            confirmadas[chave] = relogio()
+            super().confirmar(id_)
+
+    # Apagada no fim (ou pelo finalizador, se o bench quebrar no meio)
+    pasta = tempfile.TemporaryDirectory(prefix="ble_bench_")
+    macs = [f"AA:00:00:00:{i >> 8:02X}:{i & 0xFF:02X}" for i in range(dispositivos)]
+    for mac in macs:
+        ble_bridge.registro.registrar_modelo("okok", mac=mac)
+    ble_bridge.concessoes.padrao = "00000000-0000-0000-0000-000000000000"
+    ble_bridge.estado = TabelaEstados(ttl=ble_bridge.ESTADO_TTL_S)
+    ble_bridge.outbox = OutboxMedido(os.path.join(pasta.name, "outbox.db"))
+    ble_bridge.entregador = Entregador(backend.url, workers=ble_bridge.ENVIO_WORKERS,
+                                       tamanho_fila=ble_bridge.ENVIO_FILA, tentativas=3)
+    await ble_bridge.entregador.iniciar()
+    ble_bridge.replicador = Replicador(ble_bridge.outbox, ble_bridge.entregador)
+    ble_bridge.replicador.iniciar()
+    ble_bridge.sessoes = GerenciadorSessoes(ble_bridge.notification_handler)
+
+    async def balanca(mac: str):
+        dispositivo = DispositivoFalso(mac)
+        await asyncio.sleep(random.uniform(0, intervalo))
+        fim = relogio() + duracao
+        while relogio() < fim:
+            # Paciente sobe (peso estável por ~10 anúncios) e desce
+            raw = random.randint(4000, 12000)
+            for pacote in [raw] * 10 + [0] * 3:
+                data = bytes([pacote >> 8, pacote & 0xFF, 0, 0, 0, 1])
+                ble_bridge.detection_callback(dispositivo, AnuncioFalso({0xC0: data}, {}, -60))
+                await asyncio.sleep(intervalo)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*(balanca(mac) for mac in macs))
+        # Aguarda o replicador esvaziar o outbox
+        limite = relogio() + 10
+        while ble_bridge.outbox.profundidade() and relogio() < limite:
+            await asyncio.sleep(0.05)
+        await ble_bridge.replicador.encerrar()
+        await ble_bridge.entregador.encerrar()
+    ble_bridge.outbox.fechar()
+    pasta.cleanup()
+    await backend.encerrar()
+
+    latencias = sorted((confirmadas[k] - enviadas[k]) * 1000 for k in confirmadas if k in enviadas)
+    return {
+        "dispositivos": dispositivos,
+        "leituras_confirmadas": len(enviadas),
+        "leituras_entregues": len(latencias),
+        "pendentes": len(enviadas) - len(latencias),
+        "p50_ms": round(percentil(latencias, 0.50), 3),
+        "p99_ms": round(percentil(latencias, 0.99), 3),
+        "max_ms": round(latencias[-1], 3) if latencias else 0.0,
+    }
+
+
+def _versao() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecida"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do stack BLE do TeleCuidar")
+    parser.add_argument("--corpus", action="append", default=[], metavar="ARQUIVO",
+                        help="captura .bltrace para decodificar (pode repetir)")
+    parser.add_argument("--dispositivos", default="1,10,100", help="cenários ponta a ponta")
+    parser.add_argument("--duracao", type=float, default=5.0, help="segundos por cenário")
+    parser.add_argument("--intervalo", type=float, default=0.1, help="intervalo entre anúncios (s)")
+    parser.add_argument("--atraso-backend", type=float, default=0.0, help="latência simulada do backend (ms)")
+    parser.add_argument("--saida", default="bench_ble.json", help="arquivo JSON de resultados")
+    args = parser.parse_args()
+
+    resultados = {
+        "versao": _versao(),
+        "data": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "decodificadores": bench_decodificadores(args.corpus),
+        "ponta_a_ponta": {},
+    }
+
+    print(f"{'decodificador':40} {'pacotes/s':>12} {'p50 µs':>9} {'p99 µs':>9}")
+    for nome, r in resultados["decodificadores"].items():
+        print(f"{nome:40} {r['pacotes_s']:>12,} {r['p50_us']:>9.2f} {r['p99_us']:>9.2f}")
+
+    print(f"\n{'dispositivos':>12} {'leituras':>9} {'entregues':>10} {'p50 ms':>9} {'p99 ms':>9}")
+    for n in (int(x) for x in args.dispositivos.split(",")):
+        r = asyncio.run(bench_ponta_a_ponta(n, args.duracao, args.intervalo, args.atraso_backend))
+        resultados["ponta_a_ponta"][str(n)] = r
+        print(f"{n:>12} {r['leituras_confirmadas']:>9} {r['leituras_entregues']:>10} {r['p50_ms']:>9.2f} {r['p99_ms']:>9.2f}")
+
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Resultados em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Roteamento dispositivo → consulta por concessões com prazo (quiosque da sala de espera)
+Um bridge atende várias teleconsultas ao mesmo tempo: cada leitura vai para a
+consulta que tem a concessão do dispositivo naquele momento. A consulta no
+caminho quente é um get de dicionário; concessão vencida é descartada ali mesmo
+e a varredura periódica só limpa as que ninguém consultou.
+
+Atribuição em tempo de execução, sem reiniciar o bridge (nem o scan):
+    curl -X PUT  127.0.0.1:9465/leases/00:5F:BF:9A:64:DF -d '{"appointmentId": "...", "ttl": 1800}'
+    curl -X DELETE 127.0.0.1:9465/leases/00:5F:BF:9A:64:DF
+    curl -X DELETE '127.0.0.1:9465/leases?appointmentId=...'   # fim da consulta
+    curl 127.0.0.1:9465/leases
+O backend não atribui dispositivos pelo hub: a API local é o único caminho.
+
+Leitura feita antes da concessão fica guardada sem consulta; `ao_conceder(mac, consulta)`
+avisa o bridge a cada concessão para ligá-las à consulta que chegou.
+"""
+import time
+
+from aiohttp import web
+
+from ble.console import console
+
+
+class Concessao:
+    __slots__ = ("mac", "consulta", "expira", "criada")
+
+    def __init__(self, mac: str, consulta: str, expira: float, criada: float):
+        self.mac = mac
+        self.consulta = consulta
+        self.expira = expira
+        self.criada = criada
+
+
+class TabelaConcessoes:
+    """MAC -> Concessao; `padrao` atende dispositivos sem concessão (bridge de uma consulta só)"""
+
+    def __init__(self, duracao: float = 1800.0, padrao: str = None, relogio=time.monotonic):
+        self.duracao = duracao
+        self.padrao = padrao
+        self.relogio = relogio
+        self._concessoes = {}
+        self.expiradas = 0
+        self.ao_conceder = None   # ao_conceder(mac, consulta) após cada concessão
+
+    def consulta(self, mac: str):
+        """Consulta atual do dispositivo (caminho quente)"""
+        concessao = self._concessoes.get(mac)
+        if concessao is None:
+            return self.padrao
+        if concessao.expira <= self.relogio():
+            self._expirou(concessao)
+            return self.padrao
+        return concessao.consulta
+
+    def conceder(self, mac: str, consulta: str, duracao: float = None) -> Concessao:
+        """Cria ou renova; um dispositivo tem no máximo uma concessão (a nova substitui)"""
+        mac = mac.upper()
+        agora = self.relogio()
+        anterior = self._concessoes.get(mac)
+        concessao = self._concessoes[mac] = Concessao(mac, consulta, agora + (duracao or self.duracao), agora)
+        if anterior is not None and anterior.consulta != consulta:
+            console.log("🔀 {}: consulta {} → {}", mac, anterior.consulta, consulta)
+        elif anterior is None:
+            console.log("📌 {} → consulta {} ({:.0f} min)", mac, consulta, (duracao or self.duracao) / 60)
+        if self.ao_conceder is not None:
+            self.ao_conceder(mac, consulta)
+        return concessao
+
+    def revogar(self, mac: str = None, consulta: str = None) -> int:
+        """Libera um dispositivo, ou todos os da consulta; devolve quantos saíram"""
+        if mac is not None:
+            macs = [mac.upper()] if mac.upper() in self._concessoes else []
+        else:
+            macs = [m for m, c in self._concessoes.items() if c.consulta == consulta]
+        for m in macs:
+            console.log("🔓 {} liberado da consulta {}", m, self._concessoes.pop(m).consulta)
+        return len(macs)
+
+    def expirar(self) -> int:
+        """Remove as concessões vencidas; devolve quantas saíram"""
+        agora = self.relogio()
+        vencidas = [c for c in self._concessoes.values() if c.expira <= agora]
+        for concessao in vencidas:
+            self._expirou(concessao)
+        return len(vencidas)
+
+    def listar(self) -> list:
+        agora = self.relogio()
+        return [{"deviceMac": c.mac, "appointmentId": c.consulta, "expiresIn": round(c.expira - agora, 1)}
+                for c in self._concessoes.values() if c.expira > agora]
+
+    def _expirou(self, concessao: Concessao):
+        if self._concessoes.get(concessao.mac) is concessao:
+            del self._concessoes[concessao.mac]
+            self.expiradas += 1
+            console.log("⌛ Concessão de {} para a consulta {} expirou", concessao.mac, concessao.consulta)
+
+    def __len__(self):
+        return len(self._concessoes)
+
+
+async def servir(tabela: TabelaConcessoes, porta: int, host: str = "127.0.0.1") -> web.AppRunner:
+    """API local das concessões; devolve o runner para `await runner.cleanup()`"""
+    async def listar(_):
+        return web.json_response(tabela.listar())
+
+    async def conceder(request):
+        try:
+            corpo = await request.json()
+            consulta = corpo["appointmentId"]
+            duracao = float(corpo["ttl"]) if corpo.get("ttl") else None
+        except (ValueError, KeyError, TypeError):
+            return web.json_response({"message": "esperado {appointmentId, ttl?}"}, status=400)
+        concessao = tabela.conceder(request.match_info["mac"], consulta, duracao)
+        return web.json_response({"deviceMac": concessao.mac, "appointmentId": concessao.consulta,
+                                  "expiresIn": round(concessao.expira - concessao.criada, 1)})
+
+    async def revogar(request):
+        mac = request.match_info.get("mac")
+        consulta = request.query.get("appointmentId")
+        if mac is None and consulta is None:
+            return web.json_response({"message": "informe o MAC ou ?appointmentId="}, status=400)
+        return web.json_response({"released": tabela.revogar(mac, consulta)})
+
+    app = web.Application()
+    app.router.add_get("/leases", listar)
+    app.router.add_put("/leases/{mac}", conceder)
+    app.router.add_delete("/leases/{mac}", revogar)
+    app.router.add_delete("/leases", revogar)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, porta).start()
+    return runner
@@ -0,0 +1,149 @@
+"""
+Console não bloqueante para as ferramentas BLE
+Callbacks só empurram eventos (formato + argumentos, sem formatar nada) para
+uma fila; uma tarefa do loop monta o quadro no máximo `fps` vezes por segundo e
+a escrita no terminal / arquivo de log acontece numa thread, em lote. Terminal
+lento ou stdout redirecionado não freiam mais o tratamento dos pacotes.
+
+    from ble.console import console, Hex
+    console.log("✅ PESO: {:.2f} kg", peso)             # linha de log
+    console.ao_vivo(mac, "⚖️  {} kg", peso)              # linha redesenhada no lugar
+    console.log("  RAW: {}", Hex(data))                  # hex só é montado na hora de escrever
+    console.log(desenhar_caixa, leitura)                 # formato pode ser uma função
+
+Antes de `iniciar()` (ou fora de um event loop) o console escreve direto, como print.
+"""
+import asyncio
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Hex:
+    """Bytes formatados em hex só quando o evento é desenhado"""
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = bytes(data)
+
+    def __format__(self, _especificacao):
+        return self.data.hex(" ").upper()
+
+
+def _formatar(formato, args) -> str:
+    try:
+        return formato(*args) if callable(formato) else formato.format(*args)
+    except Exception as e:
+        return f"{formato!r} {args!r} (erro de formatação: {e})"
+
+
+class Console:
+    def __init__(self, fps: float = 10, max_eventos: int = 10000):
+        self.fps = fps
+        self.saida = None          # None = sys.stdout no momento da escrita
+        self.arquivo = None        # log em arquivo (sem a linha ao vivo)
+        self.descartados = 0       # eventos perdidos com a fila cheia
+        self._eventos = deque(maxlen=max_eventos)
+        self._ao_vivo = {}
+        self._mudou = False
+        self._largura = 0          # largura da linha ao vivo na tela
+        self._tarefa = None
+        self._executor = None
+
+    # === Lado dos callbacks: custo constante ===
+
+    def log(self, formato, *args):
+        if self._tarefa is None:
+            self._escrever(_formatar(formato, args) + "\n", [(time.time(), formato, args)])
+            return
+        if len(self._eventos) == self._eventos.maxlen:
+            self.descartados += 1
+        self._eventos.append((time.time(), formato, args))
+
+    def ao_vivo(self, chave, formato, *args):
+        """Linha de status redesenhada no lugar (uma por chave, só vale a mais recente)"""
+        self._ao_vivo[chave] = (formato, args)
+        self._mudou = True
+        if self._tarefa is None:
+            self._escrever(self._linha_viva(), [])
+
+    def limpar(self, chave):
+        if self._ao_vivo.pop(chave, None) is not None:
+            self._mudou = True
+
+    # === Consumidor ===
+
+    def iniciar(self, arquivo_log: str = None):
+        if arquivo_log:
+            self.arquivo = open(arquivo_log, "a", encoding="utf-8")
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="console")
+        self._tarefa = asyncio.create_task(self._desenhar(), name="console")
+
+    async def encerrar(self):
+        """Desenha o que faltou e fecha o arquivo de log"""
+        if self._tarefa is None:
+            return
+        self._tarefa.cancel()
+        await asyncio.gather(self._tarefa, return_exceptions=True)
+        self._tarefa = None
+        self._ao_vivo.clear()
+        quadro = self._quadro()
+        if quadro:
+            self._escrever(*quadro)
+        self._executor.shutdown(wait=True)
+        if self.descartados:
+            print(f"⚠️  Console: {self.descartados} evento(s) descartados")
+        if self.arquivo:
+            self.arquivo.close()
+            self.arquivo = None
+
+    async def _desenhar(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(1 / self.fps)
+            quadro = self._quadro()
+            if quadro:
+                # Uma escrita por quadro, fora do loop
+                await loop.run_in_executor(self._executor, self._escrever, *quadro)
+
+    def _linha_viva(self) -> str:
+        viva = " | ".join(_formatar(f, a) for f, a in self._ao_vivo.values())
+        linha = "\r" + viva.ljust(self._largura)
+        self._largura = len(viva)
+        return linha
+
+    def _quadro(self):
+        eventos = []
+        while self._eventos:
+            eventos.append(self._eventos.popleft())
+        if not eventos and not self._mudou:
+            return None
+
+        tela = []
+        if eventos:
+            if self._largura:
+                tela.append("\r" + " " * self._largura + "\r")
+                self._largura = 0
+            tela.extend(_formatar(f, a) + "\n" for _, f, a in eventos)
+        if self._ao_vivo:
+            tela.append(self._linha_viva())
+        elif self._largura:
+            tela.append("\r" + " " * self._largura + "\r")
+            self._largura = 0
+        self._mudou = False
+        return "".join(tela), eventos
+
+    def _escrever(self, tela: str, eventos: list):
+        saida = self.saida or sys.stdout
+        saida.write(tela)
+        saida.flush()
+        if self.arquivo and eventos:
+            self.arquivo.write("".join(
+                f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(t))} {_formatar(f, a)}\n"
+                for t, f, a in eventos))
+            self.arquivo.flush()
+
+
+# Instância compartilhada pelos módulos de ble/ e pelos scripts
+console = Console()
@@ -0,0 +1,144 @@
+"""
+Registro de decodificadores BLE
+Cada pacote é resolvido por (MAC, fonte) com uma consulta de dicionário, onde
+fonte é o company ID (manufacturer data) ou o UUID (service data / característica).
+"""
+import re
+from collections import namedtuple
+
+from ble import gatt_saude
+
+# tipo: deviceType enviado ao backend; decodificar(data) -> resultado (namedtuple) | None
+Decodificador = namedtuple("Decodificador", "tipo nome decodificar")
+
+PesoOkok = namedtuple("PesoOkok", "weight stable")
+
+# Curinga: qualquer MAC / qualquer fonte
+QUALQUER = None
+# Curinga só de manufacturer data: qualquer company ID, nunca service data nem característica
+QUALQUER_FABRICANTE = -1
+
+BASE_UUID = "-0000-1000-8000-00805f9b34fb"
+
+
+def normalizar_uuid(uuid: str) -> str:
+    """'2A35' ou '0x2a35' -> UUID completo em minúsculas, como o bleak entrega"""
+    uuid = uuid.lower().removeprefix("0x")
+    if len(uuid) == 4:
+        return f"0000{uuid}{BASE_UUID}"
+    if len(uuid) == 8:
+        return f"{uuid}{BASE_UUID}"
+    return uuid
+
+
+def _normalizar_fonte(fonte):
+    return normalizar_uuid(fonte) if isinstance(fonte, str) else fonte
+
+
+class Registro:
+    """Tabela (dispositivo, fonte) -> Decodificador com cache das resoluções"""
+
+    def __init__(self, limite_cache: int = 4096):
+        self.limite_cache = limite_cache
+        self._exatos = {}    # (mac | QUALQUER, fonte | QUALQUER) -> Decodificador
+        self._padroes = []   # (regex do nome, fonte | QUALQUER, Decodificador)
+        self._cache = {}     # (mac, fonte) -> Decodificador | None
+
+    def registrar(self, decodificador: Decodificador, mac=QUALQUER, nome=None, fonte=QUALQUER):
+        """
+        Associa um decodificador a um MAC exato ou a um padrão de nome
+        (regex sobre o local_name) e a uma fonte (company ID int ou UUID)
+        """
+        fonte = _normalizar_fonte(fonte)
+        if nome is not None:
+            self._padroes.append((re.compile(nome), fonte, decodificador))
+        else:
+            self._exatos[(mac.upper() if mac else QUALQUER, fonte)] = decodificador
+        self._cache.clear()
+
+    def registrar_modelo(self, modelo: str, mac=QUALQUER, nome=None):
+        """Registra todos os decodificadores de um modelo de MODELOS"""
+        for fonte, decodificador in MODELOS[modelo]:
+            self.registrar(decodificador, mac=mac, nome=nome, fonte=fonte)
+
+    def resolver(self, mac: str, fonte, nome=None):
+        """Decodificador para o pacote (None se ninguém trata) - caminho quente do callback"""
+        chave = (mac, fonte)
+        try:
+            return self._cache[chave]
+        except KeyError:
+            pass
+
+        decodificador = self._buscar(mac, fonte, nome)
+        # Sem nome ainda (chega no scan response) o padrão pode casar depois: não cacheia
+        if decodificador is None and nome is None and self._padroes:
+            return None
+        if len(self._cache) >= self.limite_cache:
+            self._cache.clear()
+        self._cache[chave] = decodificador
+        return decodificador
+
+    def _buscar(self, mac, fonte, nome):
+        exatos = self._exatos
+        curinga = QUALQUER_FABRICANTE if isinstance(fonte, int) else QUALQUER
+        for chave in ((mac, fonte), (mac, curinga), (mac, QUALQUER)):
+            if chave in exatos:
+                return exatos[chave]
+        if nome:
+            for padrao, fonte_padrao, decodificador in self._padroes:
+                if fonte_padrao in (fonte, curinga, QUALQUER) and padrao.search(nome):
+                    return decodificador
+        return exatos.get((QUALQUER, fonte))
+
+
+def okok_advertisement(data):
+    """Balança OKOK: peso nos bytes 0-1 (big-endian, /100) do manufacturer data"""
+    if len(data) < 2:
+        return None
+    return PesoOkok(round(((data[0] << 8) | data[1]) / 100, 2), None)
+
+
+def okok_notify(data):
+    """Balança OKOK via notify 2A9D (formato próprio): bytes 2-3 big-endian, byte 5 = estável"""
+    if len(data) < 6:
+        return None
+    raw = (data[2] << 8) | data[3]
+    return PesoOkok(round(raw * 0.01548, 2), data[5] == 0x01)
+
+
+# Modelo -> [(fonte, Decodificador)]
+MODELOS = {
+    "okok": [
+        # O company ID da OKOK varia entre pacotes: aceita qualquer um (só manufacturer data)
+        (QUALQUER_FABRICANTE, Decodificador("scale", "OKOK advertisement", okok_advertisement)),
+        (gatt_saude.WEIGHT_MEASUREMENT, Decodificador("scale", "OKOK notify", okok_notify)),
+    ],
+    "blood_pressure": [
+        (gatt_saude.BP_MEASUREMENT, Decodificador("blood_pressure", "Blood Pressure Measurement", gatt_saude.pressao_arterial)),
+        # Pressão do manguito durante a medição: vai para o stream (ble.fluxo), não para o outbox
+        (gatt_saude.INTERMEDIATE_CUFF_PRESSURE, Decodificador("cuff_pressure", "Intermediate Cuff Pressure", gatt_saude.pressao_arterial)),
+    ],
+    "thermometer": [
+        (gatt_saude.TEMPERATURE_MEASUREMENT, Decodificador("thermometer", "Temperature Measurement", gatt_saude.temperatura)),
+    ],
+    "oximeter": [
+        (gatt_saude.PLX_SPOT_CHECK, Decodificador("oximeter", "PLX Spot-check", gatt_saude.oximetria_pontual)),
+        (gatt_saude.PLX_CONTINUOUS, Decodificador("oximeter_continuous", "PLX Continuous", gatt_saude.oximetria_continua)),
+    ],
+    "weight_scale": [
+        (gatt_saude.WEIGHT_MEASUREMENT, Decodificador("scale", "Weight Measurement", gatt_saude.peso)),
+    ],
+}
+
+
+def caracteristicas(modelo: str) -> list:
+    """UUIDs GATT (notify/indicate) que um modelo decodifica"""
+    return [fonte for fonte, _ in MODELOS[modelo] if isinstance(fonte, str)]
+
+
+def registro_padrao() -> Registro:
+    """Perfis GATT padrão valem para qualquer dispositivo que os exponha"""
+    registro = Registro()
+    for modelo in ("blood_pressure", "thermometer", "oximeter", "weight_scale"):
+        registro.registrar_modelo(modelo)
+    return registro
@@ -0,0 +1,45 @@
+"""
+Descarte de advertisements repetidos antes da decodificação
+Dispositivos BLE repetem o mesmo anúncio várias vezes por segundo. Compara os
+bytes crus com o último payload do mesmo (MAC, fonte) e só deixa passar
+mudanças, mais um "heartbeat" a cada `heartbeat` segundos para quem precisa de
+amostras contínuas (ex.: estabilização do peso).
+"""
+import time
+
+
+class Deduplicador:
+    __slots__ = ("heartbeat", "limite", "relogio", "_ultimos", "passados", "repetidos")
+
+    def __init__(self, heartbeat: float = 0.2, limite: int = 4096, relogio=time.monotonic):
+        self.heartbeat = heartbeat
+        self.limite = limite
+        self.relogio = relogio
+        self._ultimos = {}   # (mac, fonte) -> [payload, passou_em, repetições]
+        self.passados = 0
+        self.repetidos = 0
+
+    def novo(self, mac: str, fonte, data) -> bool:
+        """True se o payload deve seguir para o decodificador"""
+        chave = (mac, fonte)
+        ultimo = self._ultimos.get(chave)
+        agora = self.relogio()
+        if ultimo is not None and ultimo[0] == data:
+            if agora - ultimo[1] < self.heartbeat:
+                ultimo[2] += 1
+                self.repetidos += 1
+                return False
+            ultimo[1] = agora
+            self.passados += 1
+            return True
+
+        if ultimo is None and len(self._ultimos) >= self.limite:
+            self._ultimos.clear()
+        self._ultimos[chave] = [bytes(data), agora, 0]
+        self.passados += 1
+        return True
+
+    def repeticoes(self, mac: str, fonte) -> int:
+        """Quantas cópias idênticas deste payload foram descartadas"""
+        ultimo = self._ultimos.get((mac, fonte))
+        return ultimo[2] if ultimo else 0
@@ -0,0 +1,132 @@
+"""
+Dispositivos conhecidos em arquivo (ou pasta) de configuração, recarregados sem reiniciar
+O bridge observa o caminho e, quando algo muda, monta DEVICES e o Registro de
+decodificadores novos e troca os dois de uma vez: o scan continua rodando e a
+estabilização em andamento dos aparelhos que ficaram não é perdida. Arquivo
+inválido é reportado e a configuração anterior continua valendo.
+
+    ble_devices.json (ou uma pasta com vários .json, juntados na ordem do nome):
+    {
+      "F8:8F:C8:3A:B7:92": {"type": "scale", "name": "Balança OKOK", "modelo": "okok"},
+      "00:5F:BF:9A:64:DF": {"type": "blood_pressure", "name": "Omron HEM-7156T",
+                            "modelo": "blood_pressure", "gatt": true}
+    }
+
+A verificação periódica é barata: compara só (nome, mtime, tamanho) dos
+arquivos a cada `intervalo`; o JSON é lido quando essa assinatura muda.
+"""
+import asyncio
+import json
+import os
+
+from ble import metricas
+from ble.console import console
+from ble.decoders import MODELOS, registro_padrao
+
+CAMINHO = "ble_devices.json"
+
+
+def _arquivos(caminho: str) -> list:
+    if os.path.isdir(caminho):
+        return sorted(os.path.join(caminho, n) for n in os.listdir(caminho) if n.endswith(".json"))
+    return [caminho] if os.path.exists(caminho) else []
+
+
+def assinatura(caminho: str) -> tuple:
+    """(arquivo, mtime, tamanho) de cada arquivo: muda quando algum é salvo, criado ou apagado"""
+    resultado = []
+    for arquivo in _arquivos(caminho):
+        try:
+            info = os.stat(arquivo)
+        except OSError:
+            continue
+        resultado.append((arquivo, info.st_mtime_ns, info.st_size))
+    return tuple(resultado)
+
+
+def carregar(caminho: str) -> dict:
+    """MAC -> info de todos os arquivos; ValueError com o arquivo e o motivo se algo estiver errado"""
+    dispositivos = {}
+    for arquivo in _arquivos(caminho):
+        try:
+            with open(arquivo, encoding="utf-8") as f:
+                conteudo = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"{arquivo}: {e}") from None
+        if not isinstance(conteudo, dict):
+            raise ValueError(f"{arquivo}: esperado um objeto {{mac: dispositivo}}")
+        for mac, info in conteudo.items():
+            if not isinstance(info, dict) or info.get("modelo") not in MODELOS:
+                raise ValueError(f"{arquivo}: {mac} precisa de \"modelo\" entre {', '.join(MODELOS)}")
+            dispositivos[mac.upper()] = {"type": info.get("type", info["modelo"]),
+                                         "name": info.get("name", mac.upper()), **info}
+    return dispositivos
+
+
+def montar_registro(dispositivos: dict):
+    """Registro novo: perfis GATT padrão + modelo de cada dispositivo"""
+    registro = registro_padrao()
+    for mac, info in dispositivos.items():
+        registro.registrar_modelo(info["modelo"], mac=mac)
+    return registro
+
+
+def diferenca(antigos: dict, novos: dict):
+    """(adicionados, removidos, alterados): listas de MACs"""
+    adicionados = [m for m in novos if m not in antigos]
+    removidos = [m for m in antigos if m not in novos]
+    alterados = [m for m in novos if m in antigos and novos[m] != antigos[m]]
+    return adicionados, removidos, alterados
+
+
+class Observador:
+    """
+    Verifica o caminho a cada `intervalo` e espera
+    ao_mudar(dispositivos, adicionados, removidos, alterados) quando a configuração muda.
+    Arquivo apagado não esvazia a configuração: a anterior continua valendo.
+    """
+
+    def __init__(self, caminho: str, atuais: dict, ao_mudar, intervalo: float = 2.0):
+        self.caminho = caminho
+        self.atuais = atuais
+        self.ao_mudar = ao_mudar
+        self.intervalo = intervalo
+        self._assinatura = assinatura(caminho)
+        self._tarefa = None
+
+    def iniciar(self):
+        self._tarefa = asyncio.create_task(self._observar(), name="config-dispositivos")
+
+    async def encerrar(self):
+        if self._tarefa:
+            self._tarefa.cancel()
+            await asyncio.gather(self._tarefa, return_exceptions=True)
+            self._tarefa = None
+
+    async def verificar(self) -> bool:
+        """Um ciclo: recarrega se os arquivos mudaram; True se a configuração foi trocada"""
+        atual = assinatura(self.caminho)
+        if atual == self._assinatura:
+            return False
+        self._assinatura = atual
+        if not atual:
+            console.log("⚠️  {} não existe mais - mantendo {} dispositivo(s)", self.caminho, len(self.atuais))
+            return False
+        try:
+            novos = carregar(self.caminho)
+        except ValueError as e:
+            metricas.CONFIG_RECARGAS.inc("invalida")
+            console.log("⚠️  Configuração inválida, mantendo a anterior - {}", e)
+            return False
+        adicionados, removidos, alterados = diferenca(self.atuais, novos)
+        if not (adicionados or removidos or alterados):
+            return False
+        self.atuais = novos
+        await self.ao_mudar(novos, adicionados, removidos, alterados)
+        metricas.CONFIG_RECARGAS.inc("ok")
+        return True
+
+    async def _observar(self):
+        while True:
+            await asyncio.sleep(self.intervalo)
+            await self.verificar()
@@ -0,0 +1,126 @@
+"""
+Entrega de leituras ao backend TeleCuidar
+Uma sessão HTTP keep-alive, fila limitada e workers fixos com retry e backoff
+"""
+import asyncio
+import random
+import time
+
+import aiohttp
+
+from ble import metricas
+from ble.console import console
+
+# Status que valem nova tentativa (backend fora do ar, sobrecarga, proxy)
+STATUS_RETENTAVEIS = {408, 429, 500, 502, 503, 504}
+
+
+class Entregador:
+    """Envia payloads JSON por POST usando uma única sessão e N workers"""
+
+    def __init__(self, url: str, workers: int = 2, tamanho_fila: int = 256,
+                 tentativas: int = 5, backoff_base: float = 0.5,
+                 backoff_max: float = 15.0, timeout: float = 10.0):
+        self.url = url
+        self.workers = workers
+        self.tentativas = tentativas
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.fila = asyncio.Queue(maxsize=tamanho_fila)
+        self.sessao = None
+        self._tarefas = []
+
+    async def iniciar(self):
+        """Abre a sessão (pool keep-alive) e sobe os workers"""
+        conector = aiohttp.TCPConnector(limit=self.workers, keepalive_timeout=60)
+        self.sessao = aiohttp.ClientSession(
+            connector=conector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        self._tarefas = [
+            asyncio.create_task(self._worker(), name=f"entregador-{i}")
+            for i in range(self.workers)
+        ]
+
+    def enfileirar(self, payload: dict, ao_concluir=None) -> bool:
+        """
+        Coloca o payload na fila sem bloquear; retorna False se a fila estiver cheia.
+        `ao_concluir(payload, status)` é chamado quando o envio termina.
+        """
+        try:
+            self.fila.put_nowait((payload, ao_concluir))
+            return True
+        except asyncio.QueueFull:
+            console.log("❌ Fila de envio cheia ({}) - leitura descartada", self.fila.maxsize)
+            return False
+
+    async def encerrar(self, timeout: float = 10.0):
+        """Drena a fila (até `timeout` segundos), para os workers e fecha a sessão"""
+        if self._tarefas:
+            try:
+                await asyncio.wait_for(self.fila.join(), timeout)
+            except asyncio.TimeoutError:
+                console.log("⚠️  {} leitura(s) não enviadas no encerramento", self.fila.qsize())
+            for tarefa in self._tarefas:
+                tarefa.cancel()
+            await asyncio.gather(*self._tarefas, return_exceptions=True)
+            self._tarefas = []
+        if self.sessao:
+            await self.sessao.close()
+            self.sessao = None
+
+    async def _worker(self):
+        while True:
+            payload, ao_concluir = await self.fila.get()
+            # Um item com problema não pode derrubar o worker: os demais continuam na fila
+            try:
+                try:
+                    status = await self.postar(payload)
+                except Exception as e:
+                    console.log("❌ Falha inesperada no envio: {!r}", e)
+                    status = None
+                if ao_concluir:
+                    try:
+                        ao_concluir(payload, status)
+                    except Exception as e:
+                        console.log("❌ Erro no retorno do envio: {!r}", e)
+            finally:
+                self.fila.task_done()
+
+    async def postar(self, payload: dict):
+        """POST com retry; retorna o último status HTTP (None se não houve conexão)"""
+        status = None
+        for tentativa in range(self.tentativas):
+            if tentativa:
+                await asyncio.sleep(self._espera(tentativa))
+            inicio = time.perf_counter()
+            try:
+                async with self.sessao.post(self.url, json=payload) as resp:
+                    status = resp.status
+                    await resp.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                metricas.POST_STATUS.inc("erro")
+                console.log("❌ Erro de conexão (tentativa {}/{}): {}", tentativa + 1, self.tentativas, e)
+                continue
+            metricas.POST_LATENCIA.observar(time.perf_counter() - inicio)
+            metricas.POST_STATUS.inc(str(status))
+
+            if status == 200:
+                if "readings" in payload:
+                    console.log("✅ Lote enviado para TeleCuidar: {} leitura(s)", len(payload["readings"]))
+                else:
+                    console.log("✅ Enviado para TeleCuidar: {}", payload.get("values"))
+                return status
+            if status not in STATUS_RETENTAVEIS:
+                console.log("❌ Erro ao enviar: {}", status)
+                return status
+            console.log("⚠️  Backend respondeu {} (tentativa {}/{})", status, tentativa + 1, self.tentativas)
+
+        console.log("❌ Leitura não enviada após {} tentativas", self.tentativas)
+        return status
+
+    def _espera(self, tentativa: int) -> float:
+        """Backoff exponencial com jitter completo"""
+        teto = min(self.backoff_max, self.backoff_base * (2 ** tentativa))
+        return random.uniform(0, teto)
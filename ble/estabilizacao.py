@@ -0,0 +1,116 @@
+"""
+Detecção de valor estável em fluxos de leituras (peso, temperatura)
+Janela circular de tamanho fixo com soma e soma dos quadrados correntes: a cada
+amostra testa desvio padrão e inclinação e confirma assim que o platô fica
+dentro da tolerância, sem exigir N valores idênticos.
+"""
+import time
+from array import array
+
+# Parâmetros por tipo de dispositivo
+PRESETS = {
+    # OKOK anuncia em passos de 10 g; oscilação de ±50 g ainda é o mesmo peso
+    "scale": {"janela": 5, "minimo": 3, "tolerancia": 0.05, "casas": 2},
+    "thermometer": {"janela": 4, "minimo": 3, "tolerancia": 0.05, "casas": 1},
+}
+
+
+class Estabilizador:
+    """
+    adicionar(valor) devolve o valor confirmado (média da janela) uma única vez
+    por platô; None enquanto instável. Valores <= zero reiniciam a medição.
+    """
+    __slots__ = ("janela", "minimo", "tolerancia", "inclinacao_max", "casas", "zero",
+                 "_valores", "_pos", "_n", "_soma", "_soma2", "_inicio", "_confirmado",
+                 "ultimo_valor", "tempo_confirmacao", "confirmacoes")
+
+    def __init__(self, janela: int = 5, minimo: int = 3, tolerancia: float = 0.05,
+                 inclinacao_max=None, casas: int = 2, zero: float = 0.0):
+        self.janela = janela
+        self.minimo = min(minimo, janela)
+        self.tolerancia = tolerancia
+        # Deriva máxima por amostra: o platô não pode "andar" mais que a tolerância na janela
+        self.inclinacao_max = tolerancia / janela if inclinacao_max is None else inclinacao_max
+        self.casas = casas
+        self.zero = zero
+        self._valores = array("d", [0.0] * janela)
+        self.ultimo_valor = 0.0
+        self.tempo_confirmacao = None   # segundos do primeiro valor até a confirmação
+        self.confirmacoes = 0
+        self.reiniciar()
+
+    def reiniciar(self):
+        self._pos = 0
+        self._n = 0
+        self._soma = 0.0
+        self._soma2 = 0.0
+        self._inicio = None
+        self._confirmado = None
+
+    @property
+    def confirmado(self):
+        """Último valor confirmado do platô atual (None se ainda não confirmou)"""
+        return self._confirmado
+
+    def _novo_plato(self):
+        self._pos = 0
+        self._n = 0
+        self._soma = 0.0
+        self._soma2 = 0.0
+        self._confirmado = None
+
+    def adicionar(self, valor: float, t=None):
+        self.ultimo_valor = valor
+        if valor <= self.zero:
+            self.reiniciar()
+            return None
+
+        agora = time.monotonic() if t is None else t
+        if self._inicio is None:
+            self._inicio = agora
+
+        if self._n:
+            media = self._soma / self._n
+            if abs(valor - media) > self.tolerancia:
+                # Saiu do platô (ainda subindo na balança, mudou de posição...).
+                # Após uma confirmação, o tempo do próximo platô conta a partir daqui
+                if self._confirmado is not None:
+                    self._inicio = agora
+                self._novo_plato()
+
+        # Janela circular: sai o mais antigo, entra o novo
+        valores = self._valores
+        if self._n == self.janela:
+            antigo = valores[self._pos]
+            self._soma -= antigo
+            self._soma2 -= antigo * antigo
+        else:
+            self._n += 1
+        valores[self._pos] = valor
+        self._pos = (self._pos + 1) % self.janela
+        self._soma += valor
+        self._soma2 += valor * valor
+
+        if self._confirmado is not None or self._n < self.minimo:
+            return None
+
+        n = self._n
+        media = self._soma / n
+        variancia = max(0.0, self._soma2 / n - media * media)
+        if variancia > self.tolerancia * self.tolerancia:
+            return None
+
+        # Inclinação aproximada: (último - mais antigo) / amostras
+        mais_antigo = valores[self._pos if n == self.janela else 0]
+        if abs(valor - mais_antigo) / (n - 1) > self.inclinacao_max:
+            return None
+
+        self._confirmado = round(media, self.casas)
+        self.tempo_confirmacao = agora - self._inicio
+        self.confirmacoes += 1
+        return self._confirmado
+
+
+def para_tipo(tipo: str, **ajustes) -> Estabilizador:
+    """Estabilizador com o preset do deviceType (scale, thermometer)"""
+    return Estabilizador(**{**PRESETS[tipo], **ajustes})
@@ -0,0 +1,57 @@
+"""
+Estado por dispositivo para o bridge
+Um registro compacto (__slots__) por MAC, criado no primeiro pacote e removido
+após `ttl` segundos sem ser visto. O caminho quente só atualiza atributos; a
+expiração é uma varredura periódica fora dos callbacks.
+"""
+import time
+
+from ble.estabilizacao import PRESETS, para_tipo
+
+
+class EstadoDispositivo:
+    __slots__ = ("mac", "tipo", "estabilizador", "visto_em", "pacotes")
+
+    def __init__(self, mac: str, tipo: str, agora: float):
+        self.mac = mac
+        self.tipo = tipo
+        self.estabilizador = para_tipo(tipo) if tipo in PRESETS else None
+        self.visto_em = agora
+        self.pacotes = 0
+
+
+class TabelaEstados:
+    """MAC -> EstadoDispositivo com expiração por inatividade"""
+
+    def __init__(self, ttl: float = 300.0, relogio=time.monotonic):
+        self.ttl = ttl
+        self.relogio = relogio
+        self._estados = {}
+        self.expirados = 0
+
+    def obter(self, mac: str, tipo: str) -> EstadoDispositivo:
+        agora = self.relogio()
+        estado = self._estados.get(mac)
+        if estado is None:
+            estado = self._estados[mac] = EstadoDispositivo(mac, tipo, agora)
+        estado.visto_em = agora
+        estado.pacotes += 1
+        return estado
+
+    def expirar(self) -> int:
+        """Remove dispositivos inativos há mais de `ttl` s; devolve quantos saíram"""
+        limite = self.relogio() - self.ttl
+        inativos = [mac for mac, e in self._estados.items() if e.visto_em < limite]
+        for mac in inativos:
+            del self._estados[mac]
+        self.expirados += len(inativos)
+        return len(inativos)
+
+    def __len__(self):
+        return len(self._estados)
+
+    def __contains__(self, mac):
+        return mac in self._estados
+
+    def __getitem__(self, mac):
+        return self._estados[mac]
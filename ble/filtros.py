@@ -0,0 +1,107 @@
+"""
+Filtros de scan empurrados para a plataforma
+O que o sistema consegue filtrar não acorda o Python:
+  - UUIDs de serviço: filtro de descoberta do BlueZ (SetDiscoveryFilter) / CoreBluetooth / WinRT
+  - company IDs e service data de 16 bits: or_patterns do scan passivo do BlueZ
+Endereço não tem filtro no nível do sistema via bleak; para ele (e para tudo que
+o sistema não suportar) sobra uma busca num conjunto pré-calculado, sem
+.upper() por anúncio. Como os critérios se somam (E), um deles vai para o
+sistema e os outros são conferidos aqui. Um filtro só de MACs (o do bridge:
+a OKOK muda de company ID e os aparelhos GATT nem sempre anunciam o serviço)
+não tem o que levar ao sistema: todo anúncio chega ao Python.
+"""
+import sys
+
+from bleak.assigned_numbers import AdvertisementDataType
+
+from ble.decoders import normalizar_uuid
+
+_SUFIXO_BASE = "-0000-1000-8000-00805f9b34fb"
+
+
+def _uuid16(uuid: str):
+    """UUID de 16 bits (como int) se o UUID for da base Bluetooth SIG, senão None"""
+    if uuid.startswith("0000") and uuid.endswith(_SUFIXO_BASE):
+        return int(uuid[4:8], 16)
+    return None
+
+
+class FiltroScan:
+    """Filtros de um scanner: macs E company_ids E uuids (cada um opcional)"""
+
+    def __init__(self, macs=None, company_ids=None, uuids=None, passivo: bool = False):
+        # As duas grafias de cada MAC: o endereço do BLEDevice é testado como vem
+        self.macs = frozenset(m.upper() for m in macs) | frozenset(m.lower() for m in macs) if macs else None
+        self.company_ids = frozenset(company_ids) if company_ids else None
+        self.uuids = frozenset(normalizar_uuid(u) for u in uuids) if uuids else None
+        self.passivo = passivo
+        self.no_sistema = "nenhum"   # o que ficou a cargo da plataforma (para o resumo)
+        self.vistos = 0              # anúncios que chegaram ao Python
+        self.filtrados = 0           # ... e foram descartados aqui
+
+    def trocar_macs(self, macs):
+        """Novo conjunto de MACs com o scanner rodando (callbacks já envolvidos passam a usá-lo)"""
+        self.macs = frozenset(m.upper() for m in macs) | frozenset(m.lower() for m in macs) if macs else None
+
+    @property
+    def vazio(self) -> bool:
+        return self.macs is None and self.company_ids is None and self.uuids is None
+
+    def _padroes(self) -> list:
+        """
+        or_patterns do BlueZ que deixam passar tudo que o filtro aceita (vazio se não houver).
+        Só um critério vai para o sistema; MACs e o outro critério continuam em aceita()
+        """
+        if self.company_ids is not None:
+            return [(0, AdvertisementDataType.MANUFACTURER_SPECIFIC_DATA, cid.to_bytes(2, "little"))
+                    for cid in sorted(self.company_ids)]
+        if self.uuids is None:
+            return []
+        curtos = [_uuid16(u) for u in sorted(self.uuids)]
+        if None in curtos:
+            return []
+        padroes = []
+        for curto in curtos:
+            valor = curto.to_bytes(2, "little")
+            padroes.append((0, AdvertisementDataType.SERVICE_DATA_UUID16, valor))
+            padroes.append((0, AdvertisementDataType.COMPLETE_LIST_SERVICE_UUID16, valor))
+            padroes.append((0, AdvertisementDataType.INCOMPLETE_LIST_SERVICE_UUID16, valor))
+        return padroes
+
+    def argumentos_bleak(self) -> dict:
+        """kwargs do BleakScanner que levam o máximo possível do filtro para o sistema"""
+        padroes = self._padroes() if self.passivo and sys.platform.startswith("linux") else []
+        if padroes:
+            self.no_sistema = f"scan passivo BlueZ ({len(padroes)} padrões)"
+            return {"scanning_mode": "passive", "bluez": {"or_patterns": padroes}}
+        # O filtro de UUIDs da plataforma deixa passar um superconjunto; MACs e company IDs ficam em aceita()
+        if self.uuids is not None:
+            self.no_sistema = f"UUIDs de serviço ({len(self.uuids)})"
+            return {"service_uuids": sorted(self.uuids)}
+        self.no_sistema = "nenhum (só MACs: sem filtro de endereço no sistema)" \
+            if self.macs is not None and self.company_ids is None and self.uuids is None else "nenhum"
+        return {}
+
+    def aceita(self, device, adv) -> bool:
+        self.vistos += 1
+        if self.macs is not None and device.address not in self.macs:
+            self.filtrados += 1
+            return False
+        if self.company_ids is not None and self.company_ids.isdisjoint(adv.manufacturer_data):
+            self.filtrados += 1
+            return False
+        if self.uuids is not None and self.uuids.isdisjoint(adv.service_uuids) \
+                and self.uuids.isdisjoint(adv.service_data):
+            self.filtrados += 1
+            return False
+        return True
+
+    def envolver(self, detection_callback):
+        """Callback que só chama `detection_callback` para anúncios aceitos"""
+        if self.vazio:
+            return detection_callback
+
+        def callback(device, adv):
+            if self.aceita(device, adv):
+                detection_callback(device, adv)
+        return callback
@@ -0,0 +1,225 @@
+"""
+Streaming das características contínuas (Intermediate Cuff Pressure 2A36, PLX Continuous 2A5F)
+Cada amostra decodificada vai para um anel de tamanho fixo (arrays de double,
+sem alocação por pacote). A cada `intervalo` o Transmissor esvazia os anéis,
+reduz as amostras para `taxa` Hz (média de cada janela de 1/taxa s) e entrega
+um lote compacto com número de sequência: um envio por segundo por dispositivo
+em vez de um por pacote.
+
+A medição final (2A35, 2A5E) não passa por aqui: segue pelo outbox como
+qualquer leitura e encerra o stream correspondente.
+
+    {"stream": "cuff_pressure", "mac": "00:5F:...", "seq": 7, "t0": 1712345678.2,
+     "rate": 5.0, "fields": ["pressure"], "samples": [[182.0], [176.5], [null], ...],
+     "lost": 0, "end": false}
+
+A amostra i do lote vale para t0 + i / rate; janela sem amostra vira null.
+"""
+import asyncio
+import math
+import time
+from array import array
+from operator import attrgetter
+
+from ble import metricas
+
+# Tipo do stream (Decodificador.tipo) -> o que extrair de cada leitura
+PERFIS = {
+    # 2A36: o campo "systolic" carrega a pressão atual do manguito
+    "cuff_pressure": {"campos": ("pressure",), "extrair": attrgetter("systolic"),
+                      "casas": 1, "final": "blood_pressure", "gera_final": False},
+    "oximeter_continuous": {"campos": ("spo2", "pulseRate", "pulseAmplitudeIndex"),
+                            "extrair": attrgetter("spo2", "pulseRate", "pulseAmplitudeIndex"),
+                            "casas": 1, "final": "oximeter", "gera_final": True},
+}
+
+
+def _numero(valor) -> float:
+    return math.nan if valor is None else float(valor)
+
+
+class Fluxo:
+    """Anel de amostras (t, campos...) de um dispositivo e o estado do stream"""
+    __slots__ = ("mac", "tipo", "campos", "casas", "capacidade", "_tempos", "_valores",
+                 "_escritas", "_lidas", "_origem", "_proximo", "seq", "perdidas",
+                 "ultima", "ultimos", "aberto")
+
+    def __init__(self, mac: str, tipo: str, campos: tuple, casas: int = 1, capacidade: int = 512):
+        self.mac = mac
+        self.tipo = tipo
+        self.campos = campos
+        self.casas = casas
+        self.capacidade = capacidade
+        self._tempos = array("d", bytes(8 * capacidade))
+        self._valores = array("d", bytes(8 * capacidade * len(campos)))
+        self._escritas = 0      # total de amostras escritas (posição = escritas % capacidade)
+        self._lidas = 0         # total de amostras já consumidas por lotes
+        self._origem = 0.0      # t da primeira amostra do stream (âncora das janelas)
+        self._proximo = 0       # índice da primeira janela ainda não enviada
+        self.seq = 0
+        self.perdidas = 0       # sobrescritas no anel antes de irem num lote
+        self.ultima = 0.0       # t da amostra mais recente
+        self.ultimos = [math.nan] * len(campos)   # último valor válido de cada campo
+        self.aberto = False
+
+    def adicionar(self, t: float, valores):
+        if not self.aberto:
+            self.aberto = True
+            self._origem = t
+            self._proximo = 0
+        pos = self._escritas % self.capacidade
+        self._tempos[pos] = t
+        base = pos * len(self.campos)
+        for i, valor in enumerate(valores):
+            valor = _numero(valor)
+            self._valores[base + i] = valor
+            if valor == valor:
+                self.ultimos[i] = valor
+        self._escritas += 1
+        self.ultima = t
+
+    def lote(self, agora: float, taxa: float, fim: bool = False):
+        """
+        Amostras das janelas já fechadas (todas, com fim=True) reduzidas a `taxa` Hz.
+        None se não houver janela completa para enviar (com fim=True sempre há lote).
+        """
+        if self._escritas - self._lidas > self.capacidade:
+            descartadas = self._escritas - self._lidas - self.capacidade
+            self.perdidas += descartadas
+            self._lidas += descartadas
+
+        # Janelas [_proximo, limite) vão neste lote; a atual continua acumulando.
+        # Nada além da última amostra: um stream parado não gera lotes de null
+        limite = math.floor((self.ultima - self._origem) * taxa) + 1
+        if not fim:
+            limite = min(limite, math.floor((agora - self._origem) * taxa))
+        if limite <= self._proximo and not fim:
+            return None
+
+        n = len(self.campos)
+        janelas = max(0, limite - self._proximo)
+        somas = [[0.0] * n for _ in range(janelas)]
+        contagens = [[0] * n for _ in range(janelas)]
+        while self._lidas < self._escritas:
+            pos = self._lidas % self.capacidade
+            janela = math.floor((self._tempos[pos] - self._origem) * taxa) - self._proximo
+            if janela >= janelas:
+                break
+            self._lidas += 1
+            if janela < 0:
+                continue   # atrasada para uma janela já enviada
+            base = pos * n
+            for i in range(n):
+                valor = self._valores[base + i]
+                if valor == valor:
+                    somas[janela][i] += valor
+                    contagens[janela][i] += 1
+
+        amostras = [[round(s / c, self.casas) if c else None for s, c in zip(soma, contagem)]
+                    for soma, contagem in zip(somas, contagens)]
+        lote = {
+            "stream": self.tipo,
+            "mac": self.mac,
+            "seq": self.seq,
+            "t0": round(self._origem + self._proximo / taxa, 3),
+            "rate": taxa,
+            "fields": list(self.campos),
+            "samples": amostras,
+            "lost": self.perdidas,
+            "end": fim,
+        }
+        self.seq += 1
+        self.perdidas = 0
+        self._proximo += janelas
+        return lote
+
+    def fechar(self):
+        self.aberto = False
+        self._lidas = self._escritas
+        self.ultimos = [math.nan] * len(self.campos)
+
+
+class Transmissor:
+    """
+    Recebe as amostras no callback (custo constante) e, numa tarefa própria,
+    entrega os lotes com enviar_lote(lote) -> bool. Stream parado por mais que
+    `ociosidade` é encerrado; perfis com gera_final mandam ao_final(mac, tipo, valores)
+    com os últimos valores, a menos que a medição final já tenha chegado.
+    """
+
+    def __init__(self, enviar_lote, ao_final=None, taxa: float = 5.0, intervalo: float = 1.0,
+                 capacidade: int = 512, ociosidade: float = 5.0, relogio=time.time):
+        self.enviar_lote = enviar_lote
+        self.ao_final = ao_final
+        self.taxa = taxa
+        self.intervalo = intervalo
+        self.capacidade = capacidade
+        self.ociosidade = ociosidade
+        self.relogio = relogio
+        self.fluxos = {}   # (mac, tipo) -> Fluxo
+        self._tarefa = None
+
+    def amostra(self, mac: str, tipo: str, leitura):
+        chave = (mac, tipo)
+        fluxo = self.fluxos.get(chave)
+        perfil = PERFIS[tipo]
+        if fluxo is None:
+            fluxo = self.fluxos[chave] = Fluxo(mac, tipo, perfil["campos"], perfil["casas"], self.capacidade)
+        valores = perfil["extrair"](leitura)
+        fluxo.adicionar(self.relogio(), valores if len(fluxo.campos) > 1 else (valores,))
+        metricas.FLUXO_AMOSTRAS.inc(tipo)
+
+    def aberto(self, mac: str, tipo: str) -> bool:
+        fluxo = self.fluxos.get((mac, tipo))
+        return fluxo is not None and fluxo.aberto
+
+    def leitura_final(self, mac: str, tipo: str):
+        """A medição final chegou: fecha os streams que ela encerra"""
+        for (mac_fluxo, tipo_fluxo), fluxo in self.fluxos.items():
+            if mac_fluxo == mac and fluxo.aberto and PERFIS[tipo_fluxo]["final"] == tipo:
+                self._encerrar(fluxo, self.relogio(), gerar_final=False)
+
+    def iniciar(self):
+        self._tarefa = asyncio.create_task(self._ciclo(), name="fluxo")
+
+    async def encerrar(self):
+        if self._tarefa:
+            self._tarefa.cancel()
+            await asyncio.gather(self._tarefa, return_exceptions=True)
+            self._tarefa = None
+        agora = self.relogio()
+        for fluxo in self.fluxos.values():
+            if fluxo.aberto:
+                self._encerrar(fluxo, agora, gerar_final=False)
+
+    def descarregar(self, agora: float = None):
+        """Um ciclo: envia as janelas fechadas e encerra streams ociosos"""
+        agora = self.relogio() if agora is None else agora
+        for fluxo in self.fluxos.values():
+            if not fluxo.aberto:
+                continue
+            if agora - fluxo.ultima > self.ociosidade:
+                self._encerrar(fluxo, agora, gerar_final=PERFIS[fluxo.tipo]["gera_final"])
+                continue
+            lote = fluxo.lote(agora, self.taxa)
+            if lote:
+                self._enviar(lote)
+
+    async def _ciclo(self):
+        while True:
+            await asyncio.sleep(self.intervalo)
+            self.descarregar()
+
+    def _encerrar(self, fluxo: Fluxo, agora: float, gerar_final: bool):
+        self._enviar(fluxo.lote(agora, self.taxa, fim=True))
+        if gerar_final and self.ao_final:
+            valores = {c: round(v, fluxo.casas) for c, v in zip(fluxo.campos, fluxo.ultimos) if v == v}
+            if valores:
+                self.ao_final(fluxo.mac, PERFIS[fluxo.tipo]["final"], valores)
+        fluxo.fechar()
+
+    def _enviar(self, lote: dict):
+        enviado = self.enviar_lote(lote)
+        metricas.FLUXO_LOTES.inc(lote["stream"], "enviado" if enviado else "descartado")
+        if lote["lost"]:
+            metricas.FLUXO_PERDIDAS.inc(lote["stream"], n=lote["lost"])
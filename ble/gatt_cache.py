@@ -0,0 +1,202 @@
+"""
+Cache em disco do banco GATT de cada dispositivo (MAC + firmware)
+Guarda serviços, handles, propriedades e os valores estáticos (Device
+Information, Generic Access, Blood Pressure Feature). Na reconexão:
+  - o BleakClient recebe só os serviços conhecidos (services=..., e no Windows
+    use_cached_services): a descoberta não varre o aparelho inteiro de novo
+  - os valores estáticos vêm do cache; só a revisão de firmware (2A26) é lida
+    para validar a entrada - firmware diferente invalida tudo, e como a
+    descoberta daquela conexão ficou restrita aos serviços antigos, é preciso
+    reconectar com descoberta completa (FirmwareMudou; sincronizado() já faz isso)
+  - o que não está no cache é lido em paralelo, com no máximo `paralelo`
+    leituras pendentes ao mesmo tempo
+
+    cache = CacheGatt()
+    async with sincronizado(cache, mac, lambda **kw: BleakClient(dispositivo, **kw)) as (cliente, banco):
+        ...
+"""
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+
+from ble.console import console
+from ble.decoders import BASE_UUID, normalizar_uuid
+
+CAMINHO = "ble_gatt_cache.json"
+
+FIRMWARE = normalizar_uuid("2A26")
+
+# Nomes dos serviços / características mais comuns (UUID curto -> nome)
+NOMES = {
+    "1800": "Generic Access", "1801": "Generic Attribute", "180a": "Device Information",
+    "180f": "Battery Service", "1810": "Blood Pressure", "1809": "Health Thermometer",
+    "1822": "Pulse Oximeter", "181d": "Weight Scale",
+    "2a00": "Device Name", "2a01": "Appearance", "2a04": "Peripheral Preferred Connection Parameters",
+    "2a19": "Battery Level", "2a23": "System ID", "2a24": "Model Number", "2a25": "Serial Number",
+    "2a26": "Firmware Revision", "2a27": "Hardware Revision", "2a28": "Software Revision",
+    "2a29": "Manufacturer", "2a2a": "Regulatory Certification", "2a50": "PnP ID",
+    "2a35": "Blood Pressure Measurement", "2a36": "Intermediate Cuff Pressure",
+    "2a49": "Blood Pressure Feature", "2a1c": "Temperature Measurement",
+    "2a5e": "PLX Spot-check", "2a5f": "PLX Continuous", "2a9d": "Weight Measurement",
+}
+
+# Valores que não mudam sem troca de firmware: podem vir do cache
+ESTATICAS = frozenset(normalizar_uuid(u) for u in (
+    "2A00", "2A01", "2A04", "2A23", "2A24", "2A25", "2A26", "2A27", "2A28", "2A29", "2A2A", "2A50",
+    "2A49",
+))
+
+
+def nome(uuid: str) -> str:
+    """Nome conhecido do UUID (consulta de dicionário, sem testar substrings)"""
+    if uuid.startswith("0000") and uuid.endswith(BASE_UUID):
+        return NOMES.get(uuid[4:8], "")
+    return ""
+
+
+class FirmwareMudou(Exception):
+    """Firmware diferente do cache: entrada invalidada, reconectar com descoberta completa"""
+
+
+def _servicos(cliente) -> list:
+    return [{
+        "uuid": servico.uuid,
+        "handle": servico.handle,
+        "caracteristicas": [{"uuid": c.uuid, "handle": c.handle, "propriedades": list(c.properties)}
+                            for c in servico.characteristics],
+    } for servico in cliente.services]
+
+
+class CacheGatt:
+    """Arquivo JSON {mac: entrada}; gravado inteiro (arquivo temporário + rename) a cada mudança"""
+
+    def __init__(self, caminho: str = CAMINHO):
+        self.caminho = caminho
+        self.acertos = 0
+        self.falhas = 0
+        try:
+            with open(caminho, encoding="utf-8") as arquivo:
+                self.entradas = json.load(arquivo)
+        except (OSError, ValueError):
+            self.entradas = {}
+
+    def obter(self, mac: str):
+        return self.entradas.get(mac.upper())
+
+    def invalidar(self, mac: str):
+        if self.entradas.pop(mac.upper(), None) is not None:
+            self._gravar()
+
+    def argumentos_cliente(self, mac: str, caracteristicas=None) -> dict:
+        """
+        kwargs do BleakClient: só os serviços do cache (os que contêm
+        `caracteristicas`, se informadas). Vazio sem entrada: descoberta completa.
+        """
+        entrada = self.obter(mac)
+        if entrada is None:
+            return {}
+        if caracteristicas is None:
+            servicos = [s["uuid"] for s in entrada["servicos"]]
+        else:
+            procuradas = set(caracteristicas)
+            servicos = [s["uuid"] for s in entrada["servicos"]
+                        if any(c["uuid"] in procuradas for c in s["caracteristicas"])]
+            if not servicos:
+                return {}
+        return {"services": servicos, "winrt": {"use_cached_services": True}}
+
+    def guardar_servicos(self, mac: str, cliente, firmware: str = None, valores: dict = None):
+        mac = mac.upper()
+        anterior = self.entradas.get(mac) or {}
+        self.entradas[mac] = {
+            "firmware": firmware if firmware is not None else anterior.get("firmware"),
+            "salvo": time.time(),
+            "servicos": _servicos(cliente),
+            "valores": valores if valores is not None else anterior.get("valores", {}),
+        }
+        self._gravar()
+
+    async def sincronizar(self, cliente, mac: str, paralelo: int = 4) -> dict:
+        """
+        Banco GATT do dispositivo conectado: {"servicos", "valores" {uuid: bytes},
+        "do_cache" (UUIDs cujos valores vieram do cache), "firmware", "erros" {uuid: msg}}.
+        Lê em paralelo as características legíveis que o cache não cobre.
+        """
+        caracteristicas = [c for s in cliente.services for c in s.characteristics]
+        entrada = self.obter(mac)
+        valores, erros = {}, {}
+
+        firmware = None
+        char_firmware = next((c for c in caracteristicas if c.uuid == FIRMWARE), None)
+        if char_firmware is not None and "read" in char_firmware.properties:
+            try:
+                valores[FIRMWARE] = bytes(await cliente.read_gatt_char(char_firmware))
+                firmware = valores[FIRMWARE].decode("utf-8", errors="replace").strip("\x00 ")
+            except Exception as e:
+                erros[FIRMWARE] = str(e)
+
+        do_cache = set()
+        if entrada is not None and entrada.get("firmware") != firmware:
+            # Serviços novos do firmware ficaram de fora desta descoberta
+            self.falhas += 1
+            self.invalidar(mac)
+            raise FirmwareMudou(f"{mac}: firmware {entrada.get('firmware')} → {firmware}")
+        valida = entrada is not None
+        if valida:
+            self.acertos += 1
+            for uuid, hexa in entrada.get("valores", {}).items():
+                if uuid not in valores:
+                    valores[uuid] = bytes.fromhex(hexa)
+                    do_cache.add(uuid)
+        else:
+            self.falhas += 1
+
+        pendentes = [c for c in caracteristicas if "read" in c.properties and c.uuid not in valores]
+        limite = asyncio.Semaphore(paralelo)
+
+        async def ler(caracteristica):
+            async with limite:
+                try:
+                    # Pelo objeto (handle), não pelo UUID: UUIDs podem se repetir entre serviços
+                    return caracteristica, bytes(await cliente.read_gatt_char(caracteristica)), None
+                except Exception as e:
+                    return caracteristica, None, e
+
+        for caracteristica, valor, erro in await asyncio.gather(*(ler(c) for c in pendentes)):
+            if erro is not None:
+                erros[caracteristica.uuid] = str(erro) or type(erro).__name__
+            else:
+                valores.setdefault(caracteristica.uuid, valor)
+
+        estaticos = {u: v.hex() for u, v in valores.items() if u in ESTATICAS}
+        if not valida or estaticos.keys() != entrada.get("valores", {}).keys():
+            self.guardar_servicos(mac, cliente, firmware, estaticos)
+        return {"servicos": _servicos(cliente), "valores": valores, "do_cache": do_cache,
+                "firmware": firmware, "erros": erros}
+
+    def _gravar(self):
+        temporario = self.caminho + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(self.entradas, arquivo, indent=1)
+        os.replace(temporario, self.caminho)
+
+
+@asynccontextmanager
+async def sincronizado(cache: CacheGatt, mac: str, conectar):
+    """
+    (cliente, banco) já sincronizado; `conectar(**kwargs)` abre o cliente
+    (async with) com os argumentos do cache. Se o firmware mudou, reconecta
+    uma vez com descoberta completa.
+    """
+    for _ in range(2):
+        async with conectar(**cache.argumentos_cliente(mac)) as cliente:
+            try:
+                banco = await cache.sincronizar(cliente, mac)
+            except FirmwareMudou as e:
+                console.log("🔄 {}: reconectando com descoberta completa", e)
+                continue
+            yield cliente, banco
+            return
+    raise FirmwareMudou(f"{mac}: firmware mudou de novo durante a reconexão")
@@ -0,0 +1,259 @@
+"""
+Decodificadores dos perfis GATT de saúde (Bluetooth SIG)
+Blood Pressure 2A35/2A36, Health Thermometer 2A1C, Pulse Oximeter 2A5E/2A5F, Weight Scale 2A9D
+https://www.bluetooth.com/specifications/specs/gatt-specification-supplement/
+
+Cada característica tem um layout struct.Struct pré-compilado por combinação de
+flags; SFLOAT é convertido por tabela e FLOAT por tabela de potências de 10.
+Os decodificadores leem direto do buffer (bytes, bytearray ou memoryview) com
+unpack_from, sem fatiar, e não imprimem nada.
+"""
+import struct
+from array import array
+from collections import namedtuple
+
+BP_MEASUREMENT = "00002a35-0000-1000-8000-00805f9b34fb"
+INTERMEDIATE_CUFF_PRESSURE = "00002a36-0000-1000-8000-00805f9b34fb"
+TEMPERATURE_MEASUREMENT = "00002a1c-0000-1000-8000-00805f9b34fb"
+PLX_SPOT_CHECK = "00002a5e-0000-1000-8000-00805f9b34fb"
+PLX_CONTINUOUS = "00002a5f-0000-1000-8000-00805f9b34fb"
+WEIGHT_MEASUREMENT = "00002a9d-0000-1000-8000-00805f9b34fb"
+
+NAN = float("nan")
+
+# Resultados (nomes dos campos = chaves esperadas pelo backend em "values")
+PressaoArterial = namedtuple("PressaoArterial", "systolic diastolic map unit timestamp heartRate userId status")
+Temperatura = namedtuple("Temperatura", "temperature timestamp site")
+Oximetria = namedtuple("Oximetria", "spo2 pulseRate timestamp status pulseAmplitudeIndex")
+Peso = namedtuple("Peso", "weight timestamp userId bmi height")
+
+
+# === IEEE 11073 ===
+
+def _montar_tabela_sfloat():
+    """Todos os 65536 SFLOAT pré-convertidos; valores especiais (expoente 0) viram NaN/±INF"""
+    tabela = array("d", bytes(8 * 0x10000))
+    for raw in range(0x10000):
+        # Especiais só com expoente 0: 0xF7FF, por exemplo, é 2047 × 10^-1
+        if raw in (0x07FF, 0x0800, 0x0801):  # NaN, NRes, reservado
+            tabela[raw] = NAN
+            continue
+        if raw in (0x07FE, 0x0802):  # +INF, -INF
+            tabela[raw] = float("inf") if raw == 0x07FE else float("-inf")
+            continue
+        mantissa = raw & 0x0FFF
+        if mantissa >= 0x0800:
+            mantissa -= 0x1000
+        exponent = raw >> 12
+        if exponent >= 0x08:
+            exponent -= 0x10
+        tabela[raw] = mantissa / 10 ** -exponent if exponent < 0 else float(mantissa * 10 ** exponent)
+    return tabela
+
+
+SFLOAT = _montar_tabela_sfloat()
+
+# FLOAT 32-bit: 10^|expoente| indexado pelo byte alto (int8)
+_POTENCIAS = [10.0 ** e for e in range(0x101)]
+# Valores especiais: só com expoente 0 (a chave é o raw inteiro)
+_FLOAT_ESPECIAIS = {0x7FFFFF: NAN, 0x800000: NAN, 0x800001: NAN,
+                    0x7FFFFE: float("inf"), 0x800002: float("-inf")}
+
+
+def sfloat(raw: int) -> float:
+    """Converte SFLOAT (IEEE 11073 16-bit) para float"""
+    return SFLOAT[raw]
+
+
+def float32(raw: int) -> float:
+    """Converte FLOAT (IEEE 11073 32-bit) para float"""
+    if raw in _FLOAT_ESPECIAIS:
+        return _FLOAT_ESPECIAIS[raw]
+    mantissa = raw & 0x00FFFFFF
+    if mantissa >= 0x800000:
+        mantissa -= 0x1000000
+    exponent = raw >> 24
+    if exponent >= 0x80:
+        return mantissa / _POTENCIAS[0x100 - exponent]
+    return mantissa * _POTENCIAS[exponent]
+
+
+def _ou_none(valor):
+    return None if valor != valor else valor  # NaN
+
+
+def valores(resultado) -> dict:
+    """Resultado -> dict de "values" para o backend (sem campos ausentes)"""
+    if isinstance(resultado, dict):
+        return resultado
+    return {k: v for k, v in resultado._asdict().items() if v is not None}
+
+
+# === Layouts ===
+
+TIMESTAMP = "HBBBBB"  # Date Time: ano, mês, dia, hora, minuto, segundo
+
+
+def _timestamp(campos, i):
+    ano, mes, dia, hora, minuto, segundo = campos[i:i + 6]
+    return f"{ano:04d}-{mes:02d}-{dia:02d}T{hora:02d}:{minuto:02d}:{segundo:02d}"
+
+
+class Layout:
+    """Struct pré-compilado e posições dos campos opcionais para um valor de flags"""
+    __slots__ = ("struct", "tamanho", "posicoes")
+
+    def __init__(self, formato: str, posicoes: dict):
+        self.struct = struct.Struct("<" + formato)
+        self.tamanho = self.struct.size
+        self.posicoes = posicoes
+
+
+def _compilar(fixo: str, opcionais: list, bits: int) -> list:
+    """
+    Monta um Layout para cada combinação dos `bits` menos significativos das flags.
+    opcionais: [(máscara, nome, formato)] na ordem em que aparecem no pacote.
+    """
+    layouts = []
+    for flags in range(1 << bits):
+        formato = "B" + fixo
+        posicoes = {}
+        campo = 1 + len(fixo)  # formatos de um caractere: 1 campo por letra
+        for mascara, nome, fmt in opcionais:
+            if flags & mascara:
+                posicoes[nome] = campo
+                formato += fmt
+                campo += len(fmt)
+        layouts.append(Layout(formato, posicoes))
+    return layouts
+
+
+# Blood Pressure: unidade, timestamp, pulso, user ID, status
+_LAYOUTS_BP = _compilar("HHH", [
+    (0x02, "timestamp", TIMESTAMP),
+    (0x04, "pulso", "H"),
+    (0x08, "usuario", "B"),
+    (0x10, "status", "H"),
+], 5)
+
+# Health Thermometer: unidade, timestamp, local de medição
+_LAYOUTS_TEMPERATURA = _compilar("I", [
+    (0x02, "timestamp", TIMESTAMP),
+    (0x04, "local", "B"),
+], 3)
+
+# PLX Spot-check: timestamp, status da medição, status do sensor (24 bits), PAI
+_LAYOUTS_PLX_SPOT = _compilar("HH", [
+    (0x01, "timestamp", TIMESTAMP),
+    (0x02, "status", "H"),
+    (0x04, "sensor", "HB"),
+    (0x08, "pai", "H"),
+], 4)
+
+# PLX Continuous: SpO2/PR fast, SpO2/PR slow, status da medição, status do sensor, PAI
+_LAYOUTS_PLX_CONTINUO = _compilar("HH", [
+    (0x01, "rapido", "HH"),
+    (0x02, "lento", "HH"),
+    (0x04, "status", "H"),
+    (0x08, "sensor", "HB"),
+    (0x10, "pai", "H"),
+], 5)
+
+# Weight: unidade, timestamp, user ID, IMC + altura
+_LAYOUTS_PESO = _compilar("H", [
+    (0x02, "timestamp", TIMESTAMP),
+    (0x04, "usuario", "B"),
+    (0x08, "imc", "HH"),
+], 4)
+
+
+def _desempacotar(layouts, data):
+    """(campos, layout) ou None se o pacote for menor que o layout das suas flags"""
+    if not data:
+        return None, None
+    layout = layouts[data[0] & (len(layouts) - 1)]
+    if len(data) < layout.tamanho:
+        return None, None
+    return layout.struct.unpack_from(data), layout
+
+
+# === Decodificadores ===
+
+def pressao_arterial(data):
+    """Blood Pressure Measurement (2A35) e Intermediate Cuff Pressure (2A36)"""
+    campos, layout = _desempacotar(_LAYOUTS_BP, data)
+    if campos is None:
+        return None
+
+    p = layout.posicoes
+    return PressaoArterial(
+        systolic=_ou_none(SFLOAT[campos[1]]),
+        diastolic=_ou_none(SFLOAT[campos[2]]),
+        map=_ou_none(SFLOAT[campos[3]]),
+        unit="kPa" if campos[0] & 0x01 else "mmHg",
+        timestamp=_timestamp(campos, p["timestamp"]) if "timestamp" in p else None,
+        heartRate=_ou_none(SFLOAT[campos[p["pulso"]]]) if "pulso" in p else None,
+        userId=campos[p["usuario"]] if "usuario" in p else None,
+        status=campos[p["status"]] if "status" in p else None,
+    )
+
+
+def temperatura(data):
+    """Temperature Measurement (2A1C) - sempre devolvido em °C"""
+    campos, layout = _desempacotar(_LAYOUTS_TEMPERATURA, data)
+    if campos is None:
+        return None
+
+    valor = _ou_none(float32(campos[1]))
+    if valor is not None and campos[0] & 0x01:  # Fahrenheit
+        valor = (valor - 32) * 5 / 9
+    p = layout.posicoes
+    return Temperatura(
+        temperature=None if valor is None else round(valor, 2),
+        timestamp=_timestamp(campos, p["timestamp"]) if "timestamp" in p else None,
+        site=campos[p["local"]] if "local" in p else None,
+    )
+
+
+def _oximetria(campos, p):
+    return Oximetria(
+        spo2=_ou_none(SFLOAT[campos[1]]),
+        pulseRate=_ou_none(SFLOAT[campos[2]]),
+        timestamp=_timestamp(campos, p["timestamp"]) if "timestamp" in p else None,
+        status=campos[p["status"]] if "status" in p else None,
+        pulseAmplitudeIndex=_ou_none(SFLOAT[campos[p["pai"]]]) if "pai" in p else None,
+    )
+
+
+def oximetria_pontual(data):
+    """PLX Spot-check Measurement (2A5E)"""
+    campos, layout = _desempacotar(_LAYOUTS_PLX_SPOT, data)
+    return None if campos is None else _oximetria(campos, layout.posicoes)
+
+
+def oximetria_continua(data):
+    """PLX Continuous Measurement (2A5F) - valores normais (SpO2PR-Normal)"""
+    campos, layout = _desempacotar(_LAYOUTS_PLX_CONTINUO, data)
+    return None if campos is None else _oximetria(campos, layout.posicoes)
+
+
+def peso(data):
+    """Weight Measurement (2A9D): resolução 0.005 kg (SI) ou 0.01 lb"""
+    campos, layout = _desempacotar(_LAYOUTS_PESO, data)
+    if campos is None:
+        return None
+
+    imperial = campos[0] & 0x01
+    p = layout.posicoes
+    bmi = height = None
+    if "imc" in p:
+        bmi = round(campos[p["imc"]] * 0.1, 1)
+        # Altura: 0.001 m (SI) ou 0.1 polegada
+        height = round(campos[p["imc"] + 1] * (0.254 if imperial else 0.1), 1)  # cm
+    return Peso(
+        weight=round(campos[1] * (0.01 * 0.45359237 if imperial else 0.005), 2),
+        timestamp=_timestamp(campos, p["timestamp"]) if "timestamp" in p else None,
+        userId=campos[p["usuario"]] if "usuario" in p else None,
+        bmi=bmi,
+        height=height,
+    )
@@ -0,0 +1,331 @@
+"""
+Transporte persistente para o MedicalDevicesHub (SignalR, protocolo JSON sobre WebSocket)
+Uma conexão aberta com a sala da consulta: negotiate → WebSocket → handshake →
+invocações SendVitalSigns com invocationId; a mensagem de conclusão do servidor
+é o ack. Reconecta sozinho com backoff.
+
+SendVitalSigns só retransmite para a sala (não grava em BiometricsJson): o ack
+do hub não é entrega. A leitura vai ao vivo pelo hub e, ao mesmo tempo, pelo
+POST do Entregador HTTP, que é quem confirma a leitura no outbox.
+
+Limitação: com --hub toda leitura continua custando um POST; o hub é só uma
+cópia ao vivo. A cópia não segura o resultado do POST (o ack é esperado em
+segundo plano, só para métricas), e uma cópia perdida não é reenviada.
+
+O servidor também pode invocar o bridge: os métodos aceitos são registrados
+com `registrar(metodo, funcao)`. O MedicalDevicesHub atual não invoca nenhum.
+
+    python -m ble.hub_local          # hub local para testes
+"""
+import asyncio
+import itertools
+import json
+import random
+import time
+from datetime import datetime
+
+import aiohttp
+
+from ble import metricas
+from ble.console import console
+
+SEPARADOR = "\x1e"
+
+# Tipos de mensagem do protocolo SignalR
+INVOCACAO = 1
+CONCLUSAO = 3
+PING = 6
+FECHAR = 7
+
+
+class ErroHub(Exception):
+    """O hub respondeu a invocação com erro"""
+
+
+def quadro(mensagem: dict) -> str:
+    return json.dumps(mensagem, separators=(",", ":")) + SEPARADOR
+
+
+class ConexaoHub:
+    """Conexão SignalR mantida viva em segundo plano; `conectado` indica se dá para invocar"""
+
+    def __init__(self, url: str, token: str = None, timeout_ack: float = 10.0,
+                 intervalo_ping: float = 15.0, backoff_max: float = 30.0):
+        self.url = url.rstrip("/")
+        self.token = token
+        self.timeout_ack = timeout_ack
+        self.intervalo_ping = intervalo_ping
+        self.backoff_max = backoff_max
+        self.conectado = asyncio.Event()
+        self.reconexoes = 0
+        self._ws = None
+        self._sessao = None
+        self._tarefa = None
+        self._ids = itertools.count(1)
+        self._pendentes = {}   # invocationId -> Future do ack
+        self._metodos = {}     # métodos que o servidor pode invocar no bridge
+        self._envios = set()   # envios sem ack em andamento (referência até terminarem)
+
+    def registrar(self, metodo: str, funcao):
+        """funcao(*argumentos) é chamada quando o servidor invoca `metodo`"""
+        self._metodos[metodo] = funcao
+
+    async def iniciar(self):
+        self._sessao = aiohttp.ClientSession()
+        self._tarefa = asyncio.create_task(self._manter(), name="hub-conexao")
+
+    async def encerrar(self):
+        if self._tarefa:
+            self._tarefa.cancel()
+            await asyncio.gather(self._tarefa, return_exceptions=True)
+            self._tarefa = None
+        if self._envios:
+            await asyncio.gather(*self._envios, return_exceptions=True)
+        if self._ws is not None and not self._ws.closed:
+            try:
+                await self._ws.send_str(quadro({"type": FECHAR}))
+            except (ConnectionError, aiohttp.ClientError):
+                pass
+            await self._ws.close()
+        if self._sessao:
+            await self._sessao.close()
+            self._sessao = None
+
+    async def invocar(self, metodo: str, *argumentos):
+        """Invoca e espera o ack; ConnectionError/TimeoutError/ErroHub se não confirmar"""
+        if not self.conectado.is_set():
+            raise ConnectionError("hub desconectado")
+        id_ = str(next(self._ids))
+        ack = asyncio.get_running_loop().create_future()
+        self._pendentes[id_] = ack
+        try:
+            await self._ws.send_str(quadro({"type": INVOCACAO, "invocationId": id_,
+                                            "target": metodo, "arguments": list(argumentos)}))
+            return await asyncio.wait_for(ack, self.timeout_ack)
+        finally:
+            self._pendentes.pop(id_, None)
+
+    def enviar(self, metodo: str, *argumentos) -> bool:
+        """Sem ack (streams de alta taxa): False se o hub não estiver conectado"""
+        if not self.conectado.is_set():
+            return False
+        envio = asyncio.create_task(self._enviar_sem_ack(quadro({"type": INVOCACAO, "target": metodo,
+                                                                 "arguments": list(argumentos)})))
+        self._envios.add(envio)
+        envio.add_done_callback(self._envios.discard)
+        return True
+
+    async def _enviar_sem_ack(self, texto: str):
+        try:
+            await self._ws.send_str(texto)
+        except (ConnectionError, aiohttp.ClientError):
+            pass   # a leitura do socket percebe a queda e reconecta
+
+    # === Ciclo de vida da conexão ===
+
+    async def _manter(self):
+        falhas = 0
+        while True:
+            try:
+                await self._conectar()
+                falhas = 0
+                console.log("🛰️  Hub conectado: {}", self.url)
+                await self._ler()
+            except Exception as e:   # qualquer falha reconecta; só o cancelamento encerra
+                console.log("⚠️  Hub indisponível ({}): {}", self.url, str(e) or type(e).__name__)
+            finally:
+                self._desconectado()
+                if self._ws is not None and not self._ws.closed:
+                    await self._ws.close()
+            falhas += 1
+            self.reconexoes += 1
+            metricas.HUB_RECONEXOES.inc()
+            teto = min(self.backoff_max, 2 ** min(falhas, 6))
+            await asyncio.sleep(random.uniform(teto / 2, teto))
+
+    async def _conectar(self):
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else None
+        async with self._sessao.post(f"{self.url}/negotiate?negotiateVersion=1", headers=headers) as resp:
+            resp.raise_for_status()
+            negociacao = await resp.json(content_type=None)
+
+        # Serviço gerenciado pode redirecionar para outra URL/token
+        url = negociacao.get("url", self.url)
+        token = negociacao.get("accessToken", self.token)
+        parametros = {"id": negociacao.get("connectionToken") or negociacao["connectionId"]}
+        if token:
+            parametros["access_token"] = token
+        self._ws = await self._sessao.ws_connect(
+            url.replace("http", "ws", 1), params=parametros, heartbeat=None, autoping=True)
+
+        await self._ws.send_str(quadro({"protocol": "json", "version": 1}))
+        resposta = await asyncio.wait_for(self._ws.receive(), self.timeout_ack)
+        # Quadro binário, de fechamento ou erro no lugar do handshake: conexão perdida
+        if resposta.type != aiohttp.WSMsgType.TEXT:
+            raise ConnectionError(f"handshake: quadro {resposta.type.name}")
+        handshake = json.loads(resposta.data.split(SEPARADOR)[0] or "{}")
+        if handshake.get("error"):
+            raise ConnectionError(f"handshake recusado: {handshake['error']}")
+        self.conectado.set()
+
+    async def _ler(self):
+        pinger = asyncio.create_task(self._pingar())
+        try:
+            async for mensagem in self._ws:
+                if mensagem.type != aiohttp.WSMsgType.TEXT:
+                    break   # binário, fechamento ou erro: tratado como queda
+                for bruto in mensagem.data.split(SEPARADOR):
+                    if bruto:
+                        self._tratar(json.loads(bruto))
+        finally:
+            pinger.cancel()
+        raise ConnectionError("conexão com o hub encerrada")
+
+    def _tratar(self, mensagem: dict):
+        tipo = mensagem.get("type")
+        if tipo == CONCLUSAO:
+            ack = self._pendentes.get(mensagem.get("invocationId"))
+            if ack and not ack.done():
+                if mensagem.get("error"):
+                    ack.set_exception(ErroHub(mensagem["error"]))
+                else:
+                    ack.set_result(mensagem.get("result"))
+        elif tipo == INVOCACAO:
+            funcao = self._metodos.get(mensagem.get("target"))
+            if funcao is None:
+                console.log("ℹ️  Hub invocou {} (sem handler)", mensagem.get("target"))
+                return
+            try:
+                funcao(*mensagem.get("arguments", ()))
+            except (KeyError, TypeError, ValueError) as e:
+                console.log("⚠️  {} inválido: {}", mensagem.get("target"), str(e) or type(e).__name__)
+            except Exception as e:
+                # Erro do handler (ex.: sqlite no outbox) não pode derrubar a conexão
+                console.log("❌ Erro ao tratar {}: {!r}", mensagem.get("target"), e)
+        elif tipo == FECHAR:
+            raise ConnectionError(mensagem.get("error") or "hub fechou a conexão")
+
+    async def _pingar(self):
+        while True:
+            await asyncio.sleep(self.intervalo_ping)
+            await self._ws.send_str(quadro({"type": PING}))
+
+    def _desconectado(self):
+        self.conectado.clear()
+        # Acks que não vão mais chegar: quem espera cai para o HTTP
+        for ack in self._pendentes.values():
+            if not ack.done():
+                ack.set_exception(ConnectionError("hub desconectou antes do ack"))
+        self._pendentes.clear()
+
+
+def vital_signs(payload: dict) -> dict:
+    """Payload do outbox no formato VitalSignsData que o frontend recebe"""
+    return {
+        "appointmentId": payload.get("appointmentId"),
+        "senderRole": "ble_bridge",
+        "timestamp": payload.get("timestamp"),
+        "deviceType": payload.get("deviceType"),
+        "readingId": payload.get("readingId"),
+        "vitals": payload.get("values", {}),
+    }
+
+
+def vital_signs_lote(appointment_id: str, lote: dict) -> dict:
+    """Lote de um stream (ble.fluxo) no mesmo envelope; o frontend distingue pela chave stream"""
+    return {
+        "appointmentId": appointment_id,
+        "senderRole": "ble_bridge",
+        "timestamp": datetime.fromtimestamp(lote["t0"]).isoformat(),
+        "deviceType": lote["stream"],
+        "stream": lote,
+    }
+
+
+class TransporteHub:
+    """
+    Mesmo contrato do Entregador (enfileirar/iniciar/encerrar/fila), usado pelo
+    Replicador: com o hub conectado a leitura é espelhada ao vivo por
+    SendVitalSigns enquanto o POST do Entregador grava no backend; o status
+    devolvido ao Replicador é sempre o do POST, sem esperar o ack da cópia.
+    """
+
+    def __init__(self, hub: ConexaoHub, http, metodo: str = "SendVitalSigns",
+                 workers: int = 2, tamanho_fila: int = 256):
+        self.hub = hub
+        self.http = http
+        self.metodo = metodo
+        self.workers = workers
+        self.fila = asyncio.Queue(maxsize=tamanho_fila)
+        self._tarefas = []
+        self._espelhos = set()   # referências fortes às cópias ainda sem ack
+
+    async def iniciar(self):
+        await self.http.iniciar()
+        await self.hub.iniciar()
+        self._tarefas = [asyncio.create_task(self._worker(), name=f"transporte-hub-{i}")
+                         for i in range(self.workers)]
+
+    def enfileirar(self, payload: dict, ao_concluir=None) -> bool:
+        try:
+            self.fila.put_nowait((payload, ao_concluir))
+            return True
+        except asyncio.QueueFull:
+            console.log("❌ Fila de envio cheia ({}) - leitura descartada", self.fila.maxsize)
+            return False
+
+    def transmitir(self, payload: dict) -> bool:
+        """Dados de alta taxa sem ack nem fallback (perder um ponto é aceitável)"""
+        return self.hub.enviar(self.metodo, payload)
+
+    async def encerrar(self, timeout: float = 10.0):
+        if self._tarefas:
+            try:
+                await asyncio.wait_for(self.fila.join(), timeout)
+            except asyncio.TimeoutError:
+                console.log("⚠️  {} leitura(s) não enviadas no encerramento", self.fila.qsize())
+            for tarefa in self._tarefas:
+                tarefa.cancel()
+            await asyncio.gather(*self._tarefas, return_exceptions=True)
+            self._tarefas = []
+        if self._espelhos:
+            await asyncio.gather(*self._espelhos, return_exceptions=True)
+        await self.hub.encerrar()
+        await self.http.encerrar()
+
+    async def _worker(self):
+        while True:
+            payload, ao_concluir = await self.fila.get()
+            # Mesmo cuidado do Entregador: um item com problema não derruba o worker
+            try:
+                try:
+                    status = await self._entregar(payload)
+                except Exception as e:
+                    console.log("❌ Falha inesperada no envio: {!r}", e)
+                    status = None
+                if ao_concluir:
+                    try:
+                        ao_concluir(payload, status)
+                    except Exception as e:
+                        console.log("❌ Erro no retorno do envio: {!r}", e)
+            finally:
+                self.fila.task_done()
+
+    async def _entregar(self, payload: dict):
+        if self.hub.conectado.is_set():
+            espelho = asyncio.create_task(self._espelhar(payload))
+            self._espelhos.add(espelho)
+            espelho.add_done_callback(self._espelhos.discard)
+        return await self.http.postar(payload)
+
+    async def _espelhar(self, payload: dict):
+        """Cópia ao vivo para a sala; falha aqui não afeta a entrega"""
+        inicio = time.perf_counter()
+        try:
+            await self.hub.invocar(self.metodo, vital_signs(payload))
+        except (ConnectionError, asyncio.TimeoutError, ErroHub, aiohttp.ClientError) as e:
+            metricas.HUB_INVOCACOES.inc("falha")
+            console.log("⚠️  Hub não confirmou a cópia ao vivo ({})", str(e) or type(e).__name__)
+        else:
+            metricas.HUB_INVOCACOES.inc("ack")
+            metricas.HUB_ACK.observar(time.perf_counter() - inicio)
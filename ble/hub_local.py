@@ -0,0 +1,130 @@
+"""
+Hub SignalR local, no lugar do MedicalDevicesHub, para testar o transporte do bridge
+    python -m ble.hub_local [--porta 5240] [--atraso-ms 0] [--taxa-erro 0.0]
+
+Implementa só o necessário do protocolo JSON: negotiate, handshake,
+invocações com conclusão (ack), ping e close. Cada SendVitalSigns recebido é
+impresso e guardado em `recebidas`; `derrubar()` fecha as conexões para
+exercitar a reconexão e `invocar()` chama um método nos clientes conectados
+(para testar os handlers de `ConexaoHub.registrar`).
+"""
+import argparse
+import asyncio
+import json
+import random
+import uuid
+
+from aiohttp import WSMsgType, web
+
+from ble.hub import CONCLUSAO, FECHAR, INVOCACAO, SEPARADOR, quadro
+
+
+class HubLocal:
+    def __init__(self, porta: int = 5240, atraso_ms: float = 0, taxa_erro: float = 0.0,
+                 rota: str = "/hubs/medical-devices", silencioso: bool = False):
+        self.porta = porta
+        self.atraso_ms = atraso_ms
+        self.taxa_erro = taxa_erro
+        self.rota = rota
+        self.silencioso = silencioso
+        self.recebidas = []      # (método, argumentos) de cada invocação
+        self.conexoes = set()
+        self._runner = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.porta}{self.rota}"
+
+    async def iniciar(self):
+        app = web.Application()
+        app.router.add_post(f"{self.rota}/negotiate", self._negociar)
+        app.router.add_get(self.rota, self._conexao)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", self.porta).start()
+
+    async def derrubar(self):
+        for ws in list(self.conexoes):
+            await ws.close()
+
+    async def invocar(self, metodo: str, *argumentos):
+        """Invocação do servidor para todos os clientes (sem invocationId, como o SendAsync do SignalR)"""
+        texto = quadro({"type": INVOCACAO, "target": metodo, "arguments": list(argumentos)})
+        for ws in list(self.conexoes):
+            if not ws.closed:
+                await ws.send_str(texto)
+
+    async def encerrar(self):
+        await self.derrubar()
+        await self._runner.cleanup()
+
+    async def _negociar(self, _):
+        id_ = uuid.uuid4().hex
+        return web.json_response({
+            "negotiateVersion": 1, "connectionId": id_, "connectionToken": id_,
+            "availableTransports": [{"transport": "WebSockets", "transferFormats": ["Text"]}],
+        })
+
+    async def _conexao(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.conexoes.add(ws)
+        try:
+            handshake = await ws.receive()
+            if json.loads(handshake.data.split(SEPARADOR)[0]).get("protocol") != "json":
+                await ws.send_str(quadro({"error": "só o protocolo json é suportado"}))
+                return ws
+            await ws.send_str(quadro({}))
+            async for mensagem in ws:
+                if mensagem.type != WSMsgType.TEXT:
+                    break
+                for bruto in mensagem.data.split(SEPARADOR):
+                    if bruto and await self._tratar(ws, json.loads(bruto)):
+                        return ws
+        finally:
+            self.conexoes.discard(ws)
+        return ws
+
+    async def _tratar(self, ws, mensagem: dict) -> bool:
+        """True quando o cliente pediu para fechar"""
+        if mensagem.get("type") == FECHAR:
+            await ws.close()
+            return True
+        if mensagem.get("type") != INVOCACAO:
+            return False
+        self.recebidas.append((mensagem["target"], mensagem["arguments"]))
+        if not self.silencioso:
+            print(f"📥 {mensagem['target']}: {json.dumps(mensagem['arguments'], ensure_ascii=False)}")
+        if "invocationId" in mensagem:
+            asyncio.create_task(self._concluir(ws, mensagem["invocationId"]))
+        return False
+
+    async def _concluir(self, ws, id_: str):
+        if self.atraso_ms:
+            await asyncio.sleep(self.atraso_ms / 1000)
+        conclusao = {"type": CONCLUSAO, "invocationId": id_}
+        if random.random() < self.taxa_erro:
+            conclusao["error"] = "erro simulado"
+        if not ws.closed:
+            await ws.send_str(quadro(conclusao))
+
+
+async def main(args):
+    hub = HubLocal(args.porta, args.atraso_ms, args.taxa_erro)
+    await hub.iniciar()
+    print(f"🛰️  Hub local em {hub.url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await hub.encerrar()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hub SignalR local para testes do BLE Bridge")
+    parser.add_argument("--porta", type=int, default=5240)
+    parser.add_argument("--atraso-ms", type=float, default=0, help="atraso antes de cada ack")
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="fração de invocações respondidas com erro")
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        print("\n👋 Hub local encerrado")
@@ -0,0 +1,218 @@
+"""
+Métricas do BLE Bridge no formato texto do Prometheus
+Contadores, medidores e histogramas em memória, lidos em GET /metrics por um
+servidor aiohttp local. Responde "onde foi o tempo": rádio (anúncios,
+decodificação), estabilização ou backend (fila, POST, outbox).
+
+    curl http://127.0.0.1:9464/metrics
+"""
+from bisect import bisect_left
+
+from aiohttp import web
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _rotulos(nomes: tuple, valores: tuple, extra: str = "") -> str:
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+class Contador:
+    """Valor que só cresce, opcionalmente por rótulos"""
+    tipo = "counter"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: tuple = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = rotulos
+        self._valores = {}
+
+    def inc(self, *valores_rotulos, n: float = 1):
+        self._valores[valores_rotulos] = self._valores.get(valores_rotulos, 0) + n
+
+    def valor(self, *valores_rotulos) -> float:
+        return self._valores.get(valores_rotulos, 0)
+
+    def amostras(self):
+        for chave, valor in self._valores.items():
+            yield f"{self.nome}{_rotulos(self.rotulos, chave)} {valor}"
+
+
+class Medidor(Contador):
+    """
+    Valor instantâneo. Com `funcao`, é lido na hora da coleta (profundidade de
+    fila, tamanho do outbox); a função pode devolver um número ou {rótulos: valor}.
+    """
+    tipo = "gauge"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: tuple = (), funcao=None, tipo: str = None):
+        super().__init__(nome, ajuda, rotulos)
+        self.funcao = funcao
+        if tipo:
+            self.tipo = tipo
+
+    def definir(self, valor: float, *valores_rotulos):
+        self._valores[valores_rotulos] = valor
+
+    def amostras(self):
+        if self.funcao is not None:
+            lido = self.funcao()
+            if lido is None:
+                return
+            self._valores = lido if isinstance(lido, dict) else {(): lido}
+        yield from super().amostras()
+
+
+class Histograma:
+    """Distribuição em baldes cumulativos (le), com soma e contagem"""
+    tipo = "histogram"
+
+    def __init__(self, nome: str, ajuda: str, baldes: tuple, rotulos: tuple = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.baldes = tuple(sorted(baldes))
+        self.rotulos = rotulos
+        self._series = {}   # rótulos -> [contagens por balde (+Inf no fim), soma]
+
+    def observar(self, valor: float, *valores_rotulos):
+        serie = self._series.get(valores_rotulos)
+        if serie is None:
+            serie = self._series[valores_rotulos] = [[0] * (len(self.baldes) + 1), 0.0]
+        serie[0][bisect_left(self.baldes, valor)] += 1
+        serie[1] += valor
+
+    def contagem(self, *valores_rotulos) -> int:
+        serie = self._series.get(valores_rotulos)
+        return sum(serie[0]) if serie else 0
+
+    def amostras(self):
+        for chave, (contagens, soma) in self._series.items():
+            acumulado = 0
+            for limite, n in zip(self.baldes + (float("inf"),), contagens):
+                acumulado += n
+                le = 'le="+Inf"' if limite == float("inf") else f'le="{limite!r}"'
+                yield f"{self.nome}_bucket{_rotulos(self.rotulos, chave, le)} {acumulado}"
+            yield f"{self.nome}_sum{_rotulos(self.rotulos, chave)} {soma}"
+            yield f"{self.nome}_count{_rotulos(self.rotulos, chave)} {acumulado}"
+
+
+class Coletor:
+    """Conjunto de métricas exposto em um endpoint"""
+
+    def __init__(self):
+        self.metricas = {}
+
+    def registrar(self, metrica):
+        self.metricas[metrica.nome] = metrica
+        return metrica
+
+    def texto(self) -> str:
+        linhas = []
+        for metrica in self.metricas.values():
+            linhas.append(f"# HELP {metrica.nome} {metrica.ajuda}")
+            linhas.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+            linhas.extend(metrica.amostras())
+        return "\n".join(linhas) + "\n"
+
+
+REGISTRO = Coletor()
+
+# Baldes em segundos
+_MICRO = (5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 5e-3)
+_REDE = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+_HUMANO = (0.5, 1, 2, 3, 5, 10, 20, 30, 60, 120, 300)
+_LOOP = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+# === Rádio ===
+ANUNCIOS = REGISTRO.registrar(Contador(
+    "ble_anuncios_total", "Pacotes de advertisement de dispositivos conhecidos", ("mac",)))
+ANUNCIOS_REPETIDOS = REGISTRO.registrar(Contador(
+    "ble_anuncios_repetidos_total", "Advertisements idênticos descartados antes da decodificação", ("mac",)))
+ANUNCIOS_FILTRADOS = REGISTRO.registrar(Medidor(
+    "ble_anuncios_filtrados_total", "Advertisements barrados pelo filtro do scan antes do callback",
+    tipo="counter"))
+NOTIFICACOES = REGISTRO.registrar(Contador(
+    "ble_notificacoes_total", "Notify/indicate recebidos das sessões GATT", ("mac",)))
+CONEXOES = REGISTRO.registrar(Contador(
+    "ble_conexoes_total", "Tentativas de conexão GATT por resultado", ("mac", "resultado")))
+DESCONEXOES = REGISTRO.registrar(Contador(
+    "ble_desconexoes_total", "Desconexões de sessões GATT inscritas", ("mac",)))
+CONEXOES_ABORTADAS = REGISTRO.registrar(Contador(
+    "ble_conexoes_abortadas_total", "Tentativas de conexão abortadas pelo agendador", ("motivo",)))
+ACORDAR = REGISTRO.registrar(Histograma(
+    "ble_acordar_segundos", "Do anúncio que acordou o dispositivo até conexão/inscrição/primeiro dado",
+    _REDE, ("etapa",)))
+
+# === Decodificação e estabilização ===
+DECODIFICACAO = REGISTRO.registrar(Histograma(
+    "ble_decodificacao_segundos", "Tempo de decodificação por pacote", _MICRO, ("tipo",)))
+ESTABILIZACAO = REGISTRO.registrar(Histograma(
+    "ble_estabilizacao_segundos", "Do primeiro valor do platô até a leitura confirmada", _HUMANO, ("tipo",)))
+LEITURAS = REGISTRO.registrar(Contador(
+    "ble_leituras_total", "Leituras confirmadas gravadas no outbox", ("tipo",)))
+
+# === Streams (2A36, 2A5F) ===
+FLUXO_AMOSTRAS = REGISTRO.registrar(Contador(
+    "ble_fluxo_amostras_total", "Amostras de características contínuas recebidas", ("stream",)))
+FLUXO_LOTES = REGISTRO.registrar(Contador(
+    "ble_fluxo_lotes_total", "Lotes decimados por resultado do envio", ("stream", "resultado")))
+FLUXO_PERDIDAS = REGISTRO.registrar(Contador(
+    "ble_fluxo_perdidas_total", "Amostras sobrescritas no anel antes de irem num lote", ("stream",)))
+
+# === Configuração (ble_devices.json) ===
+CONFIG_RECARGAS = REGISTRO.registrar(Contador(
+    "ble_config_recargas_total", "Recargas da configuração de dispositivos por resultado", ("resultado",)))
+
+# === Concessões (dispositivo -> consulta) ===
+CONCESSOES = REGISTRO.registrar(Medidor(
+    "ble_concessoes_ativas", "Dispositivos com concessão para uma consulta"))
+SEM_CONSULTA = REGISTRO.registrar(Contador(
+    "ble_leituras_sem_consulta_total", "Leituras de dispositivos sem concessão nem consulta padrão", ("tipo",)))
+SEM_CONSULTA_DESTINO = REGISTRO.registrar(Contador(
+    "ble_leituras_sem_consulta_destino_total",
+    "Leituras guardadas sem consulta: associadas a uma concessão ou expiradas", ("destino",)))
+
+# === Backend ===
+FILA_ENVIO = REGISTRO.registrar(Medidor(
+    "ble_fila_envio", "Payloads aguardando um worker do Entregador"))
+POST_LATENCIA = REGISTRO.registrar(Histograma(
+    "ble_post_segundos", "Latência de cada tentativa de POST ao backend", _REDE))
+POST_STATUS = REGISTRO.registrar(Contador(
+    "ble_post_total", "Tentativas de POST por status HTTP (erro = sem resposta)", ("status",)))
+ENTREGA = REGISTRO.registrar(Histograma(
+    "ble_entrega_segundos", "Da leitura confirmada ao 200 do backend (inclui tempo no outbox)", _HUMANO))
+OUTBOX_PENDENTES = REGISTRO.registrar(Medidor(
+    "ble_outbox_pendentes", "Leituras pendentes no outbox"))
+OUTBOX_IDADE = REGISTRO.registrar(Medidor(
+    "ble_outbox_idade_segundos", "Idade da leitura pendente mais antiga"))
+HUB_INVOCACOES = REGISTRO.registrar(Contador(
+    "ble_hub_invocacoes_total", "Leituras espelhadas ao vivo pelo MedicalDevicesHub por resultado", ("resultado",)))
+HUB_ACK = REGISTRO.registrar(Histograma(
+    "ble_hub_ack_segundos", "Da invocação SendVitalSigns ao ack do hub", _REDE))
+HUB_RECONEXOES = REGISTRO.registrar(Contador(
+    "ble_hub_reconexoes_total", "Quedas/tentativas de reconexão com o hub"))
+
+# === Event loop (--profile) ===
+ATRASO_LOOP = REGISTRO.registrar(Histograma(
+    "ble_loop_atraso_segundos", "Atraso do event loop medido pelo vigia", _LOOP))
+BLOQUEIOS_LOOP = REGISTRO.registrar(Contador(
+    "ble_loop_bloqueios_total", "Vezes em que o loop ficou parado acima do limiar"))
+
+
+async def servir(porta: int, host: str = "127.0.0.1", registro: Coletor = REGISTRO) -> web.AppRunner:
+    """Sobe GET /metrics; devolve o runner para `await runner.cleanup()` no encerramento"""
+    async def metrics(_):
+        return web.Response(body=registro.texto().encode(),
+                            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, porta).start()
+    return runner
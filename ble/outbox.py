@@ -0,0 +1,227 @@
+"""
+Outbox local das leituras BLE (SQLite em modo WAL)
+Toda leitura confirmada é gravada aqui antes de qualquer envio; o Replicador
+esvazia a fila em ordem quando o backend está acessível. Leitura sem consulta
+(modo offline) fica no estado 'sem_consulta', fora da fila de envio, até
+`associar()` ligá-la a uma consulta.
+"""
+import asyncio
+import json
+import random
+import sqlite3
+import time
+import uuid
+from datetime import datetime
+
+from ble import metricas
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS leituras (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chave TEXT NOT NULL UNIQUE,
+    criado_em REAL NOT NULL,
+    payload TEXT NOT NULL,
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    estado TEXT NOT NULL DEFAULT 'pendente',
+    status INTEGER,
+    mac TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_leituras_estado ON leituras (estado, id);
+"""
+
+# Outbox criado antes da coluna mac: leituras sem consulta saem da fila de envio
+MIGRACAO_MAC = """
+ALTER TABLE leituras ADD COLUMN mac TEXT;
+UPDATE leituras SET estado = 'sem_consulta'
+ WHERE estado = 'pendente' AND json_extract(payload, '$.appointmentId') IS NULL;
+"""
+
+
+def _idade(payload: dict):
+    """Segundos desde o timestamp da leitura (None se o payload não tiver um válido)"""
+    try:
+        return (datetime.now() - datetime.fromisoformat(payload["timestamp"])).total_seconds()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class Outbox:
+    """Fila persistente de leituras; sobrevive a queda do processo"""
+
+    def __init__(self, caminho: str = "ble_outbox.db"):
+        self.caminho = caminho
+        self.db = sqlite3.connect(caminho, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(ESQUEMA)
+        colunas = {linha[1] for linha in self.db.execute("PRAGMA table_info(leituras)")}
+        if "mac" not in colunas:
+            self.db.executescript(MIGRACAO_MAC)
+
+    def adicionar(self, payload: dict, mac: str = None) -> str:
+        """
+        Grava a leitura e devolve sua chave no outbox (readingId).
+        Sem appointmentId ela fica em 'sem_consulta' até associar(mac, ...).
+        """
+        chave = payload.setdefault("readingId", uuid.uuid4().hex)
+        estado = "pendente" if payload.get("appointmentId") else "sem_consulta"
+        self.db.execute(
+            "INSERT OR IGNORE INTO leituras (chave, criado_em, payload, estado, mac) VALUES (?, ?, ?, ?, ?)",
+            (chave, time.time(), json.dumps(payload), estado, mac),
+        )
+        return chave
+
+    def associar(self, mac: str, consulta: str, idade_max: float = None) -> int:
+        """
+        Liga à consulta as leituras do dispositivo guardadas sem consulta
+        (só as dos últimos `idade_max` s, se informado) e as põe na fila de envio.
+        Devolve quantas foram associadas.
+        """
+        limite = 0.0 if idade_max is None else time.time() - idade_max
+        linhas = self.db.execute(
+            "SELECT id, payload FROM leituras WHERE estado = 'sem_consulta' AND mac = ? AND criado_em >= ? ORDER BY id",
+            (mac, limite),
+        ).fetchall()
+        self.db.execute("BEGIN")
+        for id_, payload in linhas:
+            payload = json.loads(payload)
+            payload["appointmentId"] = consulta
+            self.db.execute(
+                "UPDATE leituras SET estado = 'pendente', payload = ? WHERE id = ?",
+                (json.dumps(payload), id_),
+            )
+        self.db.execute("COMMIT")
+        return len(linhas)
+
+    def pendentes(self, limite: int = 50) -> list:
+        """Leituras pendentes em ordem de chegada: [(id, payload), ...]"""
+        linhas = self.db.execute(
+            "SELECT id, payload FROM leituras WHERE estado = 'pendente' ORDER BY id LIMIT ?",
+            (limite,),
+        ).fetchall()
+        return [(id_, json.loads(payload)) for id_, payload in linhas]
+
+    def confirmar(self, id_: int):
+        """Remove a leitura entregue"""
+        self.db.execute("DELETE FROM leituras WHERE id = ?", (id_,))
+
+    def falhou(self, id_: int, status):
+        self.db.execute(
+            "UPDATE leituras SET tentativas = tentativas + 1, status = ? WHERE id = ?",
+            (status, id_),
+        )
+
+    def rejeitar(self, id_: int, status):
+        """Backend recusou a leitura (4xx): sai da fila mas fica guardada para análise"""
+        self.db.execute(
+            "UPDATE leituras SET estado = 'rejeitada', tentativas = tentativas + 1, status = ? WHERE id = ?",
+            (status, id_),
+        )
+
+    def profundidade(self) -> int:
+        return self.db.execute(
+            "SELECT COUNT(*) FROM leituras WHERE estado = 'pendente'"
+        ).fetchone()[0]
+
+    def expirar_sem_consulta(self, idade_max: float) -> int:
+        """
+        Leituras sem consulta há mais de `idade_max` s não serão mais associadas:
+        saem da espera mas ficam guardadas para análise. Devolve quantas.
+        """
+        return self.db.execute(
+            "UPDATE leituras SET estado = 'expirada' WHERE estado = 'sem_consulta' AND criado_em < ?",
+            (time.time() - idade_max,),
+        ).rowcount
+
+    def sem_consulta(self) -> int:
+        """Leituras guardadas esperando uma consulta (fora da fila de envio)"""
+        return self.db.execute(
+            "SELECT COUNT(*) FROM leituras WHERE estado = 'sem_consulta'"
+        ).fetchone()[0]
+
+    def idade(self):
+        """Segundos desde a leitura pendente mais antiga (None se vazia)"""
+        mais_antiga = self.db.execute(
+            "SELECT MIN(criado_em) FROM leituras WHERE estado = 'pendente'"
+        ).fetchone()[0]
+        return None if mais_antiga is None else time.time() - mais_antiga
+
+    def fechar(self):
+        self.db.close()
+
+
+class Replicador:
+    """Esvazia o Outbox pelo Entregador, preservando a ordem por consulta/dispositivo"""
+
+    def __init__(self, outbox: Outbox, entregador, lote: int = 50,
+                 espera_max: float = 60.0):
+        self.outbox = outbox
+        self.entregador = entregador
+        self.lote = lote
+        self.espera_max = espera_max
+        self._acordar = asyncio.Event()
+        self._em_voo = {}       # id -> chave de ordenação
+        self._falhas = 0
+        self._tarefa = None
+
+    def iniciar(self):
+        self._tarefa = asyncio.create_task(self._loop(), name="replicador-outbox")
+
+    def acordar(self):
+        """Chamado após cada nova leitura gravada"""
+        self._acordar.set()
+
+    async def encerrar(self):
+        if self._tarefa:
+            self._tarefa.cancel()
+            await asyncio.gather(self._tarefa, return_exceptions=True)
+            self._tarefa = None
+
+    async def _loop(self):
+        while True:
+            self._acordar.clear()
+            self._despachar()
+            try:
+                await asyncio.wait_for(self._acordar.wait(), self.espera_max)
+            except asyncio.TimeoutError:
+                pass
+            if self._falhas:
+                await asyncio.sleep(self._espera())
+
+    def _despachar(self):
+        """Enfileira pendentes no Entregador; uma leitura em voo por (consulta, tipo)"""
+        ocupadas = set(self._em_voo.values())
+        for id_, payload in self.outbox.pendentes(self.lote):
+            if id_ in self._em_voo:
+                continue
+            chave = (payload["appointmentId"], payload.get("deviceType"))
+            if chave in ocupadas:
+                continue
+            if not self.entregador.enfileirar(payload, self._ao_concluir(id_)):
+                break
+            ocupadas.add(chave)
+            self._em_voo[id_] = chave
+
+    def _ao_concluir(self, id_: int):
+        def concluido(payload, status):
+            self._em_voo.pop(id_, None)
+            if status == 200:
+                self.outbox.confirmar(id_)
+                idade = _idade(payload)
+                if idade is not None:
+                    metricas.ENTREGA.observar(idade)
+                self._falhas = 0
+                self._acordar.set()
+            elif status is not None and 400 <= status < 500 and status not in (408, 429):
+                self.outbox.rejeitar(id_, status)
+                self._acordar.set()
+            else:
+                self.outbox.falhou(id_, status)
+                self._falhas += 1
+                self._acordar.set()
+        return concluido
+
+    def _espera(self) -> float:
+        """Backoff enquanto o backend está inacessível"""
+        teto = min(self.espera_max, 2 ** min(self._falhas, 6))
+        return random.uniform(teto / 2, teto)
@@ -0,0 +1,123 @@
+"""
+Vigia do event loop e profiler por amostragem (--profile do ble_bridge.py)
+- Mede o atraso do loop continuamente (sleep curto vs. tempo real)
+- Uma thread separada percebe quando o loop parou por mais que `limiar` e
+  imprime a pilha do código que o está segurando
+  (direto no stderr: nesse momento o loop, e portanto o console, está parado)
+- SIGUSR1 liga/desliga a amostragem de pilhas; ao desligar grava um arquivo
+  no formato "collapsed" (pilha;de;funções contagem), aceito por
+  flamegraph.pl, speedscope e inferno
+
+    kill -USR1 <pid>     # liga
+    kill -USR1 <pid>     # desliga e grava ble_perfil_<hora>.folded
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from datetime import datetime
+
+from ble import metricas
+from ble.console import console
+
+
+def _pilha_colapsada(frame) -> str:
+    """Pilha do frame mais externo ao mais interno, separada por ';'"""
+    partes = []
+    while frame is not None:
+        codigo = frame.f_code
+        partes.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(partes))
+
+
+class Vigia:
+    """Observa o loop em que `iniciar()` foi chamado"""
+
+    def __init__(self, limiar: float = 0.1, intervalo: float = 0.02,
+                 amostragem: float = 0.005, pasta: str = "."):
+        self.limiar = limiar            # loop parado por mais que isso é reportado com a pilha
+        self.intervalo = intervalo      # período do sleep usado para medir o atraso
+        self.amostragem = amostragem    # período entre amostras do profiler
+        self.pasta = pasta
+        self.atraso_max = 0.0
+        self.bloqueios = 0
+        self.amostras = Counter()
+        self.amostrando = False
+        self._batida = time.monotonic()
+        self._id_loop = None
+        self._tarefa = None
+        self._thread = None
+        self._parar = threading.Event()
+
+    def iniciar(self):
+        self._id_loop = threading.get_ident()
+        self._batida = time.monotonic()
+        self._tarefa = asyncio.create_task(self._medir(), name="vigia-loop")
+        self._thread = threading.Thread(target=self._vigiar, name="vigia-loop", daemon=True)
+        self._thread.start()
+
+    async def encerrar(self):
+        self._parar.set()
+        if self._tarefa:
+            self._tarefa.cancel()
+            await asyncio.gather(self._tarefa, return_exceptions=True)
+        if self._thread:
+            self._thread.join(1.0)
+        if self.amostrando:
+            self.alternar_amostragem()
+        console.log("⏱️  Loop: atraso máximo {:.1f} ms, {} bloqueio(s) acima de {:.0f} ms",
+                    self.atraso_max * 1000, self.bloqueios, self.limiar * 1000)
+
+    def alternar_amostragem(self):
+        """Handler do SIGUSR1"""
+        if not self.amostrando:
+            self.amostras.clear()
+            self.amostrando = True
+            console.log("🔬 Amostragem ligada (a cada {:.0f} ms)", self.amostragem * 1000)
+            return
+        self.amostrando = False
+        caminho = self.gravar()
+        console.log("🔬 Amostragem desligada: {} amostras em {}", sum(self.amostras.values()), caminho)
+
+    def gravar(self, caminho: str = None) -> str:
+        caminho = caminho or os.path.join(self.pasta, f"ble_perfil_{datetime.now():%Y%m%d_%H%M%S}.folded")
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            for pilha, n in self.amostras.most_common():
+                arquivo.write(f"{pilha} {n}\n")
+        return caminho
+
+    async def _medir(self):
+        while True:
+            antes = time.monotonic()
+            await asyncio.sleep(self.intervalo)
+            self._batida = agora = time.monotonic()
+            atraso = max(0.0, agora - antes - self.intervalo)
+            if atraso > self.atraso_max:
+                self.atraso_max = atraso
+            metricas.ATRASO_LOOP.observar(atraso)
+
+    def _vigiar(self):
+        """Thread: detecta o loop parado e coleta amostras de pilha"""
+        parado_desde = None
+        while not self._parar.wait(self.amostragem if self.amostrando else self.intervalo / 2):
+            frame = None
+            parado = time.monotonic() - self._batida - self.intervalo
+            if parado > self.limiar and parado_desde is None:
+                parado_desde = self._batida
+                frame = sys._current_frames().get(self._id_loop)
+                self.bloqueios += 1
+                metricas.BLOQUEIOS_LOOP.inc()
+                pilha = "".join(traceback.format_stack(frame)) if frame else "(pilha indisponível)\n"
+                print(f"\n🐢 Loop bloqueado há {parado * 1000:.0f} ms em:\n{pilha}", file=sys.stderr)
+            elif parado_desde is not None and self._batida > parado_desde:
+                print(f"🐢 Loop liberado após {(self._batida - parado_desde) * 1000:.0f} ms", file=sys.stderr)
+                parado_desde = None
+
+            if self.amostrando:
+                frame = frame or sys._current_frames().get(self._id_loop)
+                if frame is not None:
+                    self.amostras[_pilha_colapsada(frame)] += 1
@@ -0,0 +1,138 @@
+"""
+Download em lote das medições guardadas no aparelho via Record Access Control Point (2A52)
+O aparelho manda os registros pela característica de medição (2A35 no Omron) e
+termina com a resposta do RACP. Os bytes são acumulados e decodificados juntos
+no fim; o cursor por dispositivo (ble_sync.json) só avança depois que o lote
+foi aceito pelo backend, então uma falha no envio não perde nada.
+
+Blood Pressure Measurement não carrega número de sequência: o aparelho envia
+tudo e o que já foi sincronizado é descartado pelo timestamp do cursor (registro
+sem timestamp não tem como ser comparado e fica de fora). Perfis com número de
+sequência podem passar `sequencia` a baixar(): o pedido usa o operador >= (filtro 0x01).
+"""
+import asyncio
+import json
+import os
+import time
+
+from ble.decoders import normalizar_uuid
+
+RACP = normalizar_uuid("2A52")
+
+# Op codes
+REPORTAR = 0x01
+ABORTAR = 0x03
+CONTAR = 0x04
+NUMERO_REGISTROS = 0x05
+RESPOSTA = 0x06
+
+# Operadores e tipo de filtro
+NULO = 0x00
+TODOS = 0x01
+MAIOR_IGUAL = 0x03
+FILTRO_SEQUENCIA = 0x01
+
+# Códigos de resposta
+SUCESSO = 0x01
+SEM_REGISTROS = 0x06
+RESPOSTAS = {
+    0x02: "op code não suportado", 0x03: "operador inválido", 0x04: "operador não suportado",
+    0x05: "operando inválido", 0x07: "abort sem sucesso", 0x08: "procedimento não concluído",
+    0x09: "operando não suportado",
+}
+
+CURSOR_PATH = "ble_sync.json"
+
+
+class ErroRacp(Exception):
+    """O aparelho recusou ou não concluiu o procedimento"""
+
+
+def comando(opcode: int, sequencia: int = None) -> bytes:
+    """Pedido com todos os registros, ou só os de sequência >= `sequencia`"""
+    if sequencia is None:
+        return bytes([opcode, TODOS])
+    return bytes([opcode, MAIOR_IGUAL, FILTRO_SEQUENCIA]) + (sequencia & 0xFFFF).to_bytes(2, "little")
+
+
+class CursorSync:
+    """Última medição sincronizada de cada dispositivo: {mac: {"timestamp", "sincronizado_em"}}"""
+
+    def __init__(self, caminho: str = CURSOR_PATH):
+        self.caminho = caminho
+        try:
+            with open(caminho, encoding="utf-8") as arquivo:
+                self.cursores = json.load(arquivo)
+        except (OSError, ValueError):
+            self.cursores = {}
+
+    def obter(self, mac: str) -> dict:
+        return self.cursores.get(mac.upper(), {})
+
+    def avancar(self, mac: str, timestamp: str = None):
+        cursor = self.cursores.setdefault(mac.upper(), {})
+        if timestamp is not None:
+            cursor["timestamp"] = max(timestamp, cursor.get("timestamp") or timestamp)
+        cursor["sincronizado_em"] = time.time()
+        temporario = self.caminho + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(self.cursores, arquivo, indent=1)
+        os.replace(temporario, self.caminho)
+
+
+async def baixar(cliente, medicao: str, sequencia: int = None, timeout: float = 15.0,
+                 ao_progresso=None) -> list:
+    """
+    Pede os registros pelo RACP e devolve os bytes brutos, na ordem recebida.
+    `timeout` é o silêncio máximo entre dois registros (o histórico pode ter centenas).
+    ao_progresso(recebidos, total) é chamado a cada registro (total None se o aparelho não informar).
+    """
+    loop = asyncio.get_running_loop()
+    registros = []
+    estado = {"total": None, "ultimo": time.monotonic()}
+    numero = loop.create_future()
+    resposta = loop.create_future()
+
+    def ao_registro(_, data):
+        registros.append(bytes(data))
+        estado["ultimo"] = time.monotonic()
+        if ao_progresso:
+            ao_progresso(len(registros), estado["total"])
+
+    def ao_racp(_, data):
+        if len(data) >= 4 and data[0] == NUMERO_REGISTROS and not numero.done():
+            numero.set_result(int.from_bytes(data[2:4], "little"))
+        elif len(data) >= 4 and data[0] == RESPOSTA:
+            alvo = numero if data[2] == CONTAR else resposta
+            if alvo.done():
+                return
+            if data[3] in (SUCESSO, SEM_REGISTROS):
+                alvo.set_result(0)
+            else:
+                alvo.set_exception(ErroRacp(RESPOSTAS.get(data[3], f"código 0x{data[3]:02X}")))
+
+    await cliente.start_notify(medicao, ao_registro)
+    await cliente.start_notify(RACP, ao_racp)
+    try:
+        # Quantidade antes (opcional no aparelho): só para mostrar o progresso
+        await cliente.write_gatt_char(RACP, comando(CONTAR, sequencia), response=True)
+        try:
+            estado["total"] = await asyncio.wait_for(numero, timeout)
+        except (ErroRacp, asyncio.TimeoutError):
+            pass
+
+        await cliente.write_gatt_char(RACP, comando(REPORTAR, sequencia), response=True)
+        while not resposta.done():
+            restante = estado["ultimo"] + timeout - time.monotonic()
+            if restante <= 0:
+                await cliente.write_gatt_char(RACP, bytes([ABORTAR, NULO]), response=True)
+                raise ErroRacp(f"sem resposta após {len(registros)} registro(s)")
+            await asyncio.wait({resposta}, timeout=restante)
+        resposta.result()
+    finally:
+        for uuid in (RACP, medicao):
+            try:
+                await cliente.stop_notify(uuid)
+            except Exception:
+                pass
+    return registros
@@ -0,0 +1,403 @@
+"""
+Daemon de scan BLE compartilhado
+Um único processo é dono do adaptador, mantém cache do último BLEDevice e
+advertisement de cada endereço e distribui os anúncios filtrados por socket
+local (Unix; TCP em localhost no Windows) para qualquer número de assinantes.
+
+    python -m ble.scan_daemon
+
+Protocolo: uma linha JSON por mensagem.
+  -> {"op": "assinar", "macs": [...], "company_ids": [...], "uuids": [...]}   (de novo: troca os filtros)
+  <- {"ev": "adv", "mac": ..., "rssi": ..., "md": {cid: hex}, "sd": {uuid: hex}, ...}
+  -> {"op": "buscar", "mac": ...}
+  <- {"ev": "dispositivo", "mac": ..., "path": ..., "idade": ...} (ou "encontrado": false)
+  -> {"op": "estatisticas"}
+  <- {"ev": "estatisticas", "vistos": ..., "filtrados": ..., "descartados": ..., "no_sistema": ...}
+  <- {"ev": "erro", "mensagem": ...}   (comando inválido; a conexão continua)
+"""
+import argparse
+import asyncio
+import json
+import random
+import socket
+import time
+
+from bleak import BleakScanner
+from bleak.backends.device import BLEDevice
+from bleak.backends.scanner import AdvertisementData
+from bleak.exc import BleakError
+
+from ble.console import console
+from ble.filtros import FiltroScan
+
+if hasattr(socket, "AF_UNIX"):
+    ENDERECO = "/tmp/telecuidar-ble.sock"
+else:
+    ENDERECO = ("127.0.0.1", 47800)
+
+
+# === Daemon ===
+
+class Assinante:
+    """Conexão de um consumidor com seus filtros e fila de saída"""
+    __slots__ = ("filtro", "fila", "descartados")
+
+    def __init__(self, tamanho_fila: int):
+        self.filtro = FiltroScan()
+        self.fila = asyncio.Queue(maxsize=tamanho_fila)
+        self.descartados = 0
+
+    def filtrar(self, macs=None, company_ids=None, uuids=None):
+        self.filtro = FiltroScan(macs, company_ids, uuids)
+
+    def publicar(self, linha: bytes):
+        """Nunca bloqueia o scanner: se o consumidor atrasar, descarta o mais antigo"""
+        if self.fila.full():
+            self.fila.get_nowait()
+            self.descartados += 1
+        self.fila.put_nowait(linha)
+
+
+def _evento(mac: str, device, adv, agora: float) -> bytes:
+    details = device.details if isinstance(device.details, dict) else {}
+    return json.dumps({
+        "ev": "adv",
+        "mac": mac,
+        "t": agora,
+        "nome": adv.local_name,
+        "dnome": device.name,
+        "path": details.get("path"),
+        "rssi": adv.rssi,
+        "tx": adv.tx_power,
+        "su": adv.service_uuids,
+        "md": {str(cid): data.hex() for cid, data in adv.manufacturer_data.items()},
+        "sd": {uuid: data.hex() for uuid, data in adv.service_data.items()},
+    }).encode() + b"\n"
+
+
+class DaemonScan:
+    """Dono do adaptador: scan contínuo, cache e fan-out para assinantes"""
+
+    def __init__(self, endereco=ENDERECO, tamanho_fila: int = 1000, filtro: FiltroScan = None,
+                 validade_cache: float = 300.0, limite_cache: int = 4096):
+        self.endereco = endereco
+        self.tamanho_fila = tamanho_fila
+        self.filtro = filtro or FiltroScan()   # filtro global, aplicado no sistema quando possível
+        self.validade_cache = validade_cache
+        self.limite_cache = limite_cache
+        self.cache = {}          # mac -> (BLEDevice, AdvertisementData, visto_em), do mais antigo ao mais recente
+        self.assinantes = set()
+
+    def detection_callback(self, device, advertisement_data):
+        mac = device.address.upper()
+        agora = time.time()
+        # Reinserido no fim: a ordem do dict é a do último anúncio
+        self.cache.pop(mac, None)
+        self.cache[mac] = (device, advertisement_data, agora)
+        self._podar(agora)
+
+        linha = None
+        for assinante in self.assinantes:
+            if assinante.filtro.aceita(device, advertisement_data):
+                if linha is None:
+                    linha = _evento(mac, device, advertisement_data, agora)
+                assinante.publicar(linha)
+
+    def _podar(self, agora: float):
+        """Tira do início do cache quem passou da validade ou do limite (MACs aleatórios vêm e vão)"""
+        cache = self.cache
+        while cache:
+            mais_antigo = next(iter(cache))
+            if len(cache) <= self.limite_cache and agora - cache[mais_antigo][2] <= self.validade_cache:
+                return
+            del cache[mais_antigo]
+
+    def buscar(self, mac: str) -> dict:
+        mac = mac.upper()
+        self._podar(time.time())
+        if mac not in self.cache:
+            return {"ev": "dispositivo", "mac": mac, "encontrado": False}
+        device, adv, visto_em = self.cache[mac]
+        details = device.details if isinstance(device.details, dict) else {}
+        return {
+            "ev": "dispositivo", "mac": mac, "encontrado": True,
+            "dnome": device.name, "path": details.get("path"),
+            "rssi": adv.rssi, "idade": time.time() - visto_em,
+        }
+
+    async def _cliente(self, reader, writer):
+        assinante = Assinante(self.tamanho_fila)
+        escritor = asyncio.create_task(self._escrever(assinante, writer))
+        try:
+            async for linha in reader:
+                # Comando inválido responde erro e a conexão segue
+                try:
+                    comando = json.loads(linha)
+                except ValueError:
+                    comando = None
+                if not isinstance(comando, dict):
+                    assinante.publicar(json.dumps({
+                        "ev": "erro", "mensagem": "esperado um objeto JSON com \"op\""}).encode() + b"\n")
+                    continue
+                if comando.get("op") == "assinar":
+                    assinante.filtrar(comando.get("macs"), comando.get("company_ids"), comando.get("uuids"))
+                    self.assinantes.add(assinante)
+                elif comando.get("op") == "buscar":
+                    mac = comando.get("mac")
+                    resposta = self.buscar(mac) if isinstance(mac, str) else \
+                        {"ev": "erro", "op": "buscar", "mensagem": "esperado {\"op\": \"buscar\", \"mac\": ...}"}
+                    assinante.publicar(json.dumps(resposta).encode() + b"\n")
+                elif comando.get("op") == "estatisticas":
+                    assinante.publicar(json.dumps({
+                        "ev": "estatisticas",
+                        "vistos": assinante.filtro.vistos,
+                        "filtrados": assinante.filtro.filtrados,
+                        "descartados": assinante.descartados,
+                        "no_sistema": self.filtro.no_sistema,
+                    }).encode() + b"\n")
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            self.assinantes.discard(assinante)
+            escritor.cancel()
+            writer.close()
+
+    async def _escrever(self, assinante: Assinante, writer):
+        while True:
+            writer.write(await assinante.fila.get())
+            await writer.drain()
+
+    async def executar(self):
+        if isinstance(self.endereco, str):
+            servidor = await asyncio.start_unix_server(self._cliente, path=self.endereco)
+        else:
+            servidor = await asyncio.start_server(self._cliente, *self.endereco)
+
+        scanner = await iniciar_scanner(self.filtro.envolver(self.detection_callback), self.filtro)
+        print(f"📡 Daemon de scan ativo em {self.endereco} (filtro no sistema: {self.filtro.no_sistema})")
+        try:
+            async with servidor:
+                await servidor.serve_forever()
+        finally:
+            await scanner.stop()
+
+
+def _argumentos(filtro: FiltroScan, adaptador=None) -> dict:
+    argumentos = filtro.argumentos_bleak()
+    if adaptador:
+        argumentos.setdefault("bluez", {})["adapter"] = adaptador
+    return argumentos
+
+
+async def iniciar_scanner(callback, filtro: FiltroScan, adaptador: str = None):
+    """
+    BleakScanner com o filtro levado ao sistema (no adaptador indicado, só BlueZ);
+    se o scan passivo falhar, volta ao ativo
+    """
+    scanner = BleakScanner(callback, **_argumentos(filtro, adaptador))
+    try:
+        await scanner.start()
+    except BleakError:
+        if not filtro.passivo:
+            raise
+        console.log("⚠️  Scan passivo indisponível, usando scan ativo")
+        filtro.passivo = False
+        scanner = BleakScanner(callback, **_argumentos(filtro, adaptador))
+        await scanner.start()
+    return scanner
+
+
+# === Consumidores ===
+
+async def _abrir(endereco=ENDERECO):
+    if isinstance(endereco, str):
+        return await asyncio.open_unix_connection(endereco)
+    return await asyncio.open_connection(*endereco)
+
+
+def _dispositivo(mac: str, nome, path):
+    # BlueZ: com o caminho D-Bus o BleakClient conecta sem novo scan.
+    # Sem ele (WinRT, CoreBluetooth) não há handle do sistema: ver alvo()
+    return BLEDevice(mac, nome, {"path": path, "props": {}} if path else None)
+
+
+def alvo(dispositivo):
+    """
+    O que passar ao BleakClient: o BLEDevice, ou só o endereço quando ele veio do
+    daemon sem handle do sistema (o backend então acha o aparelho sozinho)
+    """
+    return dispositivo.address if dispositivo.details is None else dispositivo
+
+
+async def buscar_dispositivo(mac: str, idade_max: float = 60.0, endereco=ENDERECO):
+    """BLEDevice do cache do daemon (None se não visto há `idade_max` s); OSError se o daemon não roda"""
+    reader, writer = await _abrir(endereco)
+    try:
+        writer.write(json.dumps({"op": "buscar", "mac": mac}).encode() + b"\n")
+        resposta = json.loads(await reader.readline())
+    finally:
+        writer.close()
+    if not resposta.get("encontrado") or resposta["idade"] > idade_max or not resposta.get("path"):
+        return None
+    return _dispositivo(resposta["mac"], resposta.get("dnome"), resposta["path"])
+
+
+async def encontrar(mac: str, timeout: float = 15.0):
+    """Cache do daemon primeiro; sem daemon (ou sem cache) cai para um scan local"""
+    try:
+        dispositivo = await buscar_dispositivo(mac)
+        if dispositivo:
+            return dispositivo
+    except OSError:
+        pass
+    return await BleakScanner.find_device_by_address(mac, timeout=timeout)
+
+
+class ScannerCompartilhado:
+    """
+    Substituto do BleakScanner(detection_callback): assina o daemon se ele estiver
+    rodando, senão abre um BleakScanner local. O callback recebe (BLEDevice, AdvertisementData).
+    Se o daemon cair, tenta reconectar com backoff; esgotadas as tentativas, segue
+    com o scanner local.
+    """
+
+    def __init__(self, detection_callback, macs=None, company_ids=None, uuids=None,
+                 endereco=ENDERECO, passivo: bool = False, tentativas: int = 5,
+                 backoff_max: float = 8.0):
+        self.detection_callback = detection_callback
+        self.filtros = {"macs": list(macs) if macs else None,
+                        "company_ids": list(company_ids) if company_ids else None,
+                        "uuids": list(uuids) if uuids else None}
+        self.filtro = FiltroScan(macs, company_ids, uuids, passivo=passivo)
+        self.endereco = endereco
+        self.tentativas = tentativas
+        self.backoff_max = backoff_max
+        self._local = None
+        self._writer = None
+        self._tarefa = None
+        self._dispositivos = {}
+        self._remoto = {}
+
+    async def start(self):
+        try:
+            reader = await self._assinar()
+        except OSError:
+            await self._iniciar_local()
+            return
+        self._tarefa = asyncio.create_task(self._ler(reader))
+
+    async def stop(self):
+        if self._tarefa:
+            self._tarefa.cancel()
+            await asyncio.gather(self._tarefa, return_exceptions=True)
+            self._tarefa = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._local:
+            await self._local.stop()
+            self._local = None
+
+    async def _assinar(self):
+        reader, self._writer = await _abrir(self.endereco)
+        self._writer.write(json.dumps({"op": "assinar", **self.filtros}).encode() + b"\n")
+        return reader
+
+    async def _iniciar_local(self):
+        self._local = await iniciar_scanner(self.filtro.envolver(self.detection_callback), self.filtro)
+
+    def filtrar(self, macs):
+        """Troca os MACs aceitos sem parar o scan (no daemon, assinando de novo)"""
+        self.filtros["macs"] = list(macs) if macs else None
+        self.filtro.trocar_macs(macs)
+        if self._writer is not None:
+            self._writer.write(json.dumps({"op": "assinar", **self.filtros}).encode() + b"\n")
+
+    def resumo(self) -> dict:
+        """
+        Anúncios filtrados antes de chegar ao callback: pelo daemon (outro processo)
+        ou pelo conjunto local. O que o sistema filtrou não é contável daqui.
+        """
+        if self._writer is not None:
+            # Resposta chega pelo mesmo fluxo; vale para o próximo resumo
+            self._writer.write(b'{"op": "estatisticas"}\n')
+            return {"modo": "daemon", **self._remoto}
+        return {"modo": "local", "no_sistema": self.filtro.no_sistema,
+                "vistos": self.filtro.vistos, "filtrados": self.filtro.filtrados}
+
+    async def _ler(self, reader):
+        while True:
+            try:
+                await self._consumir(reader)
+            except ConnectionError:
+                pass
+            console.log("⚠️  Daemon de scan desconectou")
+            self._writer.close()
+            self._writer = None
+            reader = await self._reconectar()
+            if reader is None:
+                console.log("📡 Daemon de scan indisponível - usando scanner local")
+                await self._iniciar_local()
+                return
+            console.log("📡 Daemon de scan reconectado")
+
+    async def _reconectar(self):
+        """Novas tentativas com backoff e jitter; None se o daemon não voltou"""
+        for tentativa in range(self.tentativas):
+            teto = min(self.backoff_max, 2 ** tentativa)
+            await asyncio.sleep(random.uniform(teto / 2, teto))
+            try:
+                return await self._assinar()
+            except OSError:
+                continue
+        return None
+
+    async def _consumir(self, reader):
+        async for linha in reader:
+            # Linha corrompida é descartada sem encerrar a assinatura
+            try:
+                anuncio = self._anuncio(json.loads(linha))
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                console.log("⚠️  Evento inválido do daemon de scan: {}", str(e) or type(e).__name__)
+                continue
+            if anuncio is not None:
+                self.detection_callback(*anuncio)
+
+    def _anuncio(self, ev: dict):
+        """(BLEDevice, AdvertisementData) de um evento "adv"; None para os demais eventos"""
+        if ev.get("ev") == "estatisticas":
+            self._remoto = {k: v for k, v in ev.items() if k != "ev"}
+            return None
+        if ev.get("ev") != "adv":
+            return None
+        mac = ev["mac"]
+        dispositivo = self._dispositivos.get(mac)
+        if dispositivo is None or dispositivo.details is None and ev["path"]:
+            dispositivo = self._dispositivos[mac] = _dispositivo(mac, ev["dnome"], ev["path"])
+        return dispositivo, AdvertisementData(
+            local_name=ev["nome"],
+            manufacturer_data={int(cid): bytes.fromhex(h) for cid, h in ev["md"].items()},
+            service_data={uuid: bytes.fromhex(h) for uuid, h in ev["sd"].items()},
+            service_uuids=ev["su"],
+            tx_power=ev["tx"],
+            rssi=ev["rssi"],
+            platform_data=(),
+        )
+
+
+def argumentos():
+    parser = argparse.ArgumentParser(description="Daemon de scan BLE compartilhado")
+    parser.add_argument("--uuid", action="append", help="só anúncios com este UUID de serviço")
+    parser.add_argument("--company-id", action="append", type=lambda v: int(v, 0),
+                        help="só anúncios com este company ID (ex.: 0x00C0)")
+    parser.add_argument("--passivo", action="store_true", help="scan passivo com or_patterns (BlueZ)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = argumentos()
+    try:
+        asyncio.run(DaemonScan(filtro=FiltroScan(company_ids=args.company_id, uuids=args.uuid,
+                                                 passivo=args.passivo)).executar())
+    except KeyboardInterrupt:
+        print("\n👋 Daemon encerrado")
@@ -0,0 +1,250 @@
+"""
+Sessões GATT simultâneas no mesmo event loop
+Cada dispositivo tem sua máquina de estados (descobrindo → conectando → inscrito →
+ocioso/aguardando) e se reinscreve sozinho após desconexão. Um semáforo limita
+quantas conexões são tentadas ao mesmo tempo. Com um CacheGatt, a reconexão só
+descobre os serviços que contêm as características assinadas.
+
+Dispositivos que só conectam logo após medir (termômetro m3ja): o scan contínuo
+acorda a sessão no primeiro anúncio, a conexão usa o BLEDevice já em mãos e os
+handlers de notify são montados uma vez no adicionar(); as inscrições saem
+juntas logo após conectar. O tempo do anúncio que acordou o aparelho até
+conectar / inscrever / primeiro dado vai para o log e para ble_acordar_segundos.
+
+Com um Balanceador (ble.adaptadores), cada conexão sai pelo adaptador com
+melhor RSSI e folga naquele momento, usando o BLEDevice visto por ele. Com um
+Agendador (ble.agendador) no lugar do semáforo, a vaga de conexão vai para a
+sessão com melhor sinal e anúncio mais recente, e a tentativa é abortada se o
+aparelho parar de anunciar.
+"""
+import asyncio
+import random
+import time
+
+from bleak import BleakClient
+
+from ble import metricas
+from ble.agendador import MEDICAO
+from ble.console import console
+from ble.scan_daemon import alvo
+
+DESCOBRINDO = "descobrindo"   # esperando o dispositivo anunciar
+CONECTANDO = "conectando"
+INSCRITO = "inscrito"         # conectado e recebendo notify/indicate
+OCIOSO = "ocioso"             # desconectou normalmente; reconecta no próximo anúncio
+AGUARDANDO = "aguardando"     # falhou; backoff antes de tentar de novo
+
+# Etapas medidas a partir do anúncio que acordou o dispositivo (rótulo da métrica -> log)
+ETAPAS = {"conexao": "conectado", "inscricao": "inscrito", "primeiro_dado": "primeiro dado"}
+
+
+class Sessao:
+    """Estado de conexão de um dispositivo"""
+    __slots__ = ("mac", "caracteristicas", "estado", "dispositivo", "cliente",
+                 "falhas", "visto", "desconectado", "tarefa", "handlers", "ao_inscrever",
+                 "acordou", "aguardando_dado")
+
+    def __init__(self, mac: str, caracteristicas: list, ao_inscrever=None):
+        self.mac = mac
+        self.caracteristicas = caracteristicas
+        self.ao_inscrever = ao_inscrever   # async (cliente) depois das inscrições (ex.: comando START)
+        self.handlers = {}                 # uuid -> callback do notify, montados antes de conectar
+        self.acordou = None                # monotonic do anúncio que acordou o dispositivo
+        self.aguardando_dado = False       # próximo notify fecha a medição de latência
+        self.estado = DESCOBRINDO
+        self.dispositivo = None   # último BLEDevice visto no scan
+        self.cliente = None
+        self.falhas = 0
+        self.visto = asyncio.Event()
+        self.desconectado = asyncio.Event()
+        self.tarefa = None
+
+
+class GerenciadorSessoes:
+    """
+    Mantém várias conexões BleakClient vivas ao mesmo tempo.
+    ao_notificar(mac, uuid_caracteristica, data) recebe cada notify/indicate.
+    """
+
+    def __init__(self, ao_notificar, conexoes_simultaneas: int = 2,
+                 timeout_conexao: float = 20.0, backoff_max: float = 60.0,
+                 cliente_factory=BleakClient, cache=None, balanceador=None, agendador=None):
+        self.ao_notificar = ao_notificar
+        self.cache = cache
+        self.balanceador = balanceador
+        self.agendador = agendador
+        self.timeout_conexao = timeout_conexao
+        self.backoff_max = backoff_max
+        self.cliente_factory = cliente_factory
+        self.sessoes = {}
+        self._conexoes = asyncio.Semaphore(conexoes_simultaneas)
+        self._ativo = False
+
+    def adicionar(self, mac: str, caracteristicas: list, ao_inscrever=None):
+        """Registra um dispositivo GATT; começa a rodar se o gerenciador já foi iniciado"""
+        mac = mac.upper()
+        if mac in self.sessoes:
+            return self.sessoes[mac]
+        sessao = Sessao(mac, caracteristicas, ao_inscrever)
+        sessao.handlers = {uuid: self._handler(sessao, uuid) for uuid in caracteristicas}
+        self.sessoes[mac] = sessao
+        if self._ativo:
+            sessao.tarefa = asyncio.create_task(self._executar(sessao), name=f"sessao-{mac}")
+        return sessao
+
+    async def remover(self, mac: str):
+        """Para a sessão e desconecta (dispositivo saiu da configuração)"""
+        sessao = self.sessoes.pop(mac.upper(), None)
+        if sessao is None:
+            return
+        if sessao.tarefa:
+            sessao.tarefa.cancel()
+            await asyncio.gather(sessao.tarefa, return_exceptions=True)
+        await self._desconectar(sessao)
+
+    def anuncio(self, mac: str, dispositivo, rssi=None):
+        """Chamado pelo detection_callback: guarda o BLEDevice e acorda a sessão"""
+        sessao = self.sessoes.get(mac)
+        if sessao is None:
+            return
+        if self.agendador is not None:
+            self.agendador.anuncio(dispositivo, rssi)
+        sessao.dispositivo = dispositivo
+        if sessao.acordou is None and sessao.estado in (DESCOBRINDO, OCIOSO, AGUARDANDO):
+            sessao.acordou = time.monotonic()
+        sessao.visto.set()
+
+    def iniciar(self):
+        self._ativo = True
+        for sessao in self.sessoes.values():
+            sessao.tarefa = asyncio.create_task(self._executar(sessao), name=f"sessao-{sessao.mac}")
+
+    async def encerrar(self):
+        self._ativo = False
+        tarefas = [s.tarefa for s in self.sessoes.values() if s.tarefa]
+        for tarefa in tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+        for sessao in self.sessoes.values():
+            await self._desconectar(sessao)
+
+    def resumo(self) -> dict:
+        return {mac: sessao.estado for mac, sessao in self.sessoes.items()}
+
+    def _mudar(self, sessao: Sessao, estado: str):
+        if sessao.estado != estado:
+            sessao.estado = estado
+            console.log("🔗 {}: {}", sessao.mac, estado)
+
+    async def _executar(self, sessao: Sessao):
+        while True:
+            if sessao.estado != OCIOSO:
+                self._mudar(sessao, DESCOBRINDO)
+            sessao.visto.clear()
+            if sessao.dispositivo is None or sessao.estado == OCIOSO:
+                await sessao.visto.wait()
+
+            if await self._conectar(sessao):
+                sessao.falhas = 0
+                await sessao.desconectado.wait()
+                metricas.DESCONEXOES.inc(sessao.mac)
+                await self._desconectar(sessao)
+                sessao.acordou = None
+                sessao.aguardando_dado = False
+                self._mudar(sessao, OCIOSO)
+                continue
+
+            sessao.falhas += 1
+            sessao.acordou = None
+            await self._desconectar(sessao)
+            self._mudar(sessao, AGUARDANDO)
+            teto = min(self.backoff_max, 2 ** sessao.falhas)
+            await asyncio.sleep(random.uniform(teto / 2, teto))
+
+    async def _conectar(self, sessao: Sessao) -> bool:
+        vaga = self.agendador.vaga(sessao.mac, MEDICAO) if self.agendador is not None else self._conexoes
+        async with vaga:
+            dispositivo, do_adaptador = sessao.dispositivo, {}
+            if self.balanceador is not None:
+                adaptador = self.balanceador.escolher(sessao.mac)
+                if adaptador is None:
+                    console.log("⏳ {}: todos os adaptadores estão cheios", sessao.mac)
+                    return False
+                self.balanceador.ocupar(adaptador, sessao.mac)
+                dispositivo = self.balanceador.dispositivo(adaptador, sessao.mac)
+                do_adaptador = self.balanceador.argumentos_cliente(adaptador)
+                console.log("📶 {}: conectando por {} ({:.0f} dBm)", sessao.mac, adaptador.nome,
+                            self.balanceador.rssi(adaptador, sessao.mac))
+            self._mudar(sessao, CONECTANDO)
+            sessao.desconectado.clear()
+            do_cache = self.cache.argumentos_cliente(sessao.mac, sessao.caracteristicas) if self.cache else {}
+            sessao.cliente = self.cliente_factory(
+                alvo(dispositivo),
+                disconnected_callback=lambda _: sessao.desconectado.set(),
+                timeout=self.timeout_conexao,
+                **do_cache,
+                **do_adaptador,
+            )
+            try:
+                if self.agendador is not None:
+                    await self.agendador.conectar(sessao.cliente, sessao.mac)
+                else:
+                    await sessao.cliente.connect()
+                self._latencia(sessao, "conexao")
+                servicos = getattr(sessao.cliente, "services", None)
+                inscricoes = []
+                for uuid in sessao.caracteristicas:
+                    # Características opcionais do perfil (2A36, 2A5F) podem não existir no aparelho
+                    if servicos is not None and servicos.get_characteristic(uuid) is None:
+                        console.log("ℹ️  {}: sem a característica {}", sessao.mac, uuid[4:8].upper())
+                        continue
+                    inscricoes.append(sessao.cliente.start_notify(uuid, sessao.handlers[uuid]))
+                # Todas as inscrições de uma vez: o aparelho costuma mandar o dado logo após acordar
+                sessao.aguardando_dado = sessao.acordou is not None
+                await asyncio.gather(*inscricoes)
+                self._latencia(sessao, "inscricao")
+                if sessao.ao_inscrever:
+                    await sessao.ao_inscrever(sessao.cliente)
+            except Exception as e:
+                metricas.CONEXOES.inc(sessao.mac, "falha")
+                console.log("❌ {}: falha ao conectar ({})", sessao.mac, e)
+                if do_cache:
+                    # Serviços do cache podem estar desatualizados: a próxima tentativa descobre tudo
+                    self.cache.invalidar(sessao.mac)
+                return False
+
+        if self.cache is not None and not do_cache and servicos is not None:
+            self.cache.guardar_servicos(sessao.mac, sessao.cliente)
+        metricas.CONEXOES.inc(sessao.mac, "ok")
+        self._mudar(sessao, INSCRITO)
+        return True
+
+    def _handler(self, sessao: Sessao, uuid: str):
+        ao_notificar = self.ao_notificar
+        mac = sessao.mac
+
+        def notificacao(_, data):
+            if sessao.aguardando_dado:
+                sessao.aguardando_dado = False
+                self._latencia(sessao, "primeiro_dado")
+            ao_notificar(mac, uuid, data)
+        return notificacao
+
+    def _latencia(self, sessao: Sessao, etapa: str):
+        """Tempo desde o anúncio que acordou o dispositivo"""
+        if sessao.acordou is None:
+            return
+        decorrido = time.monotonic() - sessao.acordou
+        metricas.ACORDAR.observar(decorrido, etapa)
+        console.log("⏱️  {}: anúncio → {} em {:.2f}s", sessao.mac, ETAPAS[etapa], decorrido)
+
+    async def _desconectar(self, sessao: Sessao):
+        if self.balanceador is not None:
+            self.balanceador.liberar(sessao.mac)
+        cliente, sessao.cliente = sessao.cliente, None
+        if cliente is None:
+            return
+        try:
+            await cliente.disconnect()
+        except Exception:
+            pass
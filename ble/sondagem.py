@@ -0,0 +1,208 @@
+"""
+Sondagem de comandos de fabricante em dispositivos GATT desconhecidos
+Recebe uma matriz (características de escrita × payloads) e envia cada comando
+esperando a resposta com timeout adaptativo: a espera termina assim que chega
+um notify (mais `silencio` para respostas em vários pacotes) e o timeout de cada
+canal acompanha a latência observada (fator × média móvel, entre mínimo e máximo).
+
+Canal = serviço da característica de escrita quando ele tem característica de
+notify assinada: canais diferentes rodam em paralelo e cada notify é atribuído ao
+comando ativo do seu canal. Sem esse pareamento tudo vira um canal só (serial).
+
+O relatório JSON guarda a matriz, as respostas de cada comando (tempo relativo,
+característica, hex) e os notifies espontâneos; dá para repetir a matriz
+(carregar_matriz) ou reproduzir as respostas num handler sem o aparelho (reproduzir).
+"""
+import asyncio
+import json
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from ble.trace import CaracteristicaFalsa
+
+Comando = namedtuple("Comando", "caracteristica payload descricao")
+
+QUALQUER_CANAL = "*"
+
+
+def matriz(caracteristicas, payloads) -> list:
+    """Todas as combinações característica × payload (payload: bytes ou (bytes, descrição))"""
+    comandos = []
+    for caracteristica in caracteristicas:
+        for payload in payloads:
+            payload, descricao = payload if isinstance(payload, tuple) else (payload, None)
+            comandos.append(Comando(caracteristica, bytes(payload),
+                                    descricao or f"0x{bytes(payload).hex().upper()}"))
+    return comandos
+
+
+class _Canal:
+    __slots__ = ("ativo", "enviado", "primeira", "pacote", "latencia")
+
+    def __init__(self):
+        self.ativo = None          # resultado do comando esperando resposta
+        self.enviado = 0.0
+        self.primeira = asyncio.Event()
+        self.pacote = asyncio.Event()
+        self.latencia = None       # média móvel da latência da primeira resposta
+
+
+class Sondador:
+    """
+    Sonda um BleakClient já conectado. ao_notificar(sender, data) continua
+    recebendo todos os notifies (para exibir / gravar .bltrace).
+    """
+
+    def __init__(self, cliente, notificacoes: list, ao_notificar=None, timeout_inicial: float = 2.0,
+                 timeout_min: float = 0.3, timeout_max: float = 5.0, silencio: float = 0.25,
+                 fator: float = 3.0, relogio=time.monotonic):
+        self.cliente = cliente
+        self.notificacoes = notificacoes
+        self.ao_notificar = ao_notificar
+        self.timeout_inicial = timeout_inicial
+        self.timeout_min = timeout_min
+        self.timeout_max = timeout_max
+        self.silencio = silencio
+        self.fator = fator
+        self.relogio = relogio
+        self.resultados = []
+        self.espontaneas = []      # notifies sem comando ativo no canal
+        self._canal_notify = {}    # uuid do notify -> canal
+        self._canais = {}
+        self._inicio = relogio()
+
+    def _servico(self, uuid: str):
+        servicos = getattr(self.cliente, "services", None)
+        caracteristica = servicos.get_characteristic(uuid) if servicos is not None else None
+        return caracteristica.service_uuid if caracteristica is not None else None
+
+    async def preparar(self):
+        """Assina os notifies e monta o mapa notify -> canal"""
+        for uuid in self.notificacoes:
+            self._canal_notify[uuid] = self._servico(uuid) or QUALQUER_CANAL
+            await self.cliente.start_notify(uuid, self._notificacao)
+
+    async def encerrar(self):
+        for uuid in self.notificacoes:
+            try:
+                await self.cliente.stop_notify(uuid)
+            except Exception:
+                pass
+
+    def timeout(self, canal: _Canal) -> float:
+        if canal.latencia is None:
+            return self.timeout_inicial
+        return min(self.timeout_max, max(self.timeout_min, self.fator * canal.latencia))
+
+    async def executar(self, comandos: list) -> list:
+        """Roda a matriz; devolve os resultados na ordem dos comandos"""
+        pareados = set(self._canal_notify.values())
+        grupos = {}
+        for i, comando in enumerate(comandos):
+            canal = self._servico(comando.caracteristica)
+            grupos.setdefault(canal if canal in pareados else QUALQUER_CANAL, []).append((i, comando))
+        if QUALQUER_CANAL in grupos or QUALQUER_CANAL in pareados:
+            # Algum notify não dá para atribuir: um canal só, comandos em série
+            grupos = {QUALQUER_CANAL: [(i, c) for i, c in enumerate(comandos)]}
+
+        resultados = [None] * len(comandos)
+        await asyncio.gather(*(self._rodar(canal, lista, resultados) for canal, lista in grupos.items()))
+        self.resultados.extend(resultados)
+        return resultados
+
+    async def _rodar(self, nome: str, lista: list, resultados: list):
+        canal = self._canais[nome] = _Canal()
+        for i, comando in lista:
+            resultado = resultados[i] = {
+                "caracteristica": comando.caracteristica,
+                "payload": comando.payload.hex(),
+                "descricao": comando.descricao,
+                "canal": nome,
+                "t": round(self.relogio() - self._inicio, 3),
+                "status": "sem resposta",
+                "latencia": None,
+                "timeout": round(self.timeout(canal), 3),
+                "respostas": [],
+            }
+            canal.primeira.clear()
+            canal.ativo = resultado
+            try:
+                canal.enviado = self.relogio()
+                await self.cliente.write_gatt_char(comando.caracteristica, comando.payload, response=False)
+            except Exception as e:
+                resultado["status"] = "erro"
+                resultado["erro"] = str(e) or type(e).__name__
+                canal.ativo = None
+                continue
+
+            try:
+                await asyncio.wait_for(canal.primeira.wait(), resultado["timeout"])
+            except asyncio.TimeoutError:
+                canal.ativo = None
+                continue
+
+            # Resposta em vários pacotes: coleta até `silencio` sem nada novo
+            while True:
+                canal.pacote.clear()
+                try:
+                    await asyncio.wait_for(canal.pacote.wait(), self.silencio)
+                except asyncio.TimeoutError:
+                    break
+            canal.ativo = None
+            resultado["status"] = "resposta"
+            latencia = resultado["latencia"]
+            canal.latencia = latencia if canal.latencia is None else 0.7 * canal.latencia + 0.3 * latencia
+
+    def _notificacao(self, sender, data):
+        agora = self.relogio()
+        uuid = getattr(sender, "uuid", str(sender))
+        registro = {"t": round(agora - self._inicio, 3), "caracteristica": uuid, "data": bytes(data).hex()}
+        canal = self._canais.get(self._canal_notify.get(uuid, QUALQUER_CANAL)) \
+            or self._canais.get(QUALQUER_CANAL)
+        if canal is not None and canal.ativo is not None:
+            if not canal.ativo["respostas"]:
+                canal.ativo["latencia"] = round(agora - canal.enviado, 3)
+                canal.primeira.set()
+            canal.ativo["respostas"].append(registro)
+            canal.pacote.set()
+        else:
+            self.espontaneas.append(registro)
+        if self.ao_notificar:
+            self.ao_notificar(sender, data)
+
+    def relatorio(self, caminho: str, dispositivo: str = None, **extra) -> str:
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            json.dump({
+                "dispositivo": dispositivo,
+                "data": datetime.now().isoformat(),
+                "notificacoes": list(self.notificacoes),
+                "resultados": self.resultados,
+                "espontaneas": self.espontaneas,
+                **extra,
+            }, arquivo, indent=1, ensure_ascii=False)
+        return caminho
+
+
+def carregar_matriz(caminho: str, so_respondidos: bool = False) -> list:
+    """Comandos de um relatório (para repetir a sondagem, ou só o que respondeu)"""
+    with open(caminho, encoding="utf-8") as arquivo:
+        relatorio = json.load(arquivo)
+    return [Comando(r["caracteristica"], bytes.fromhex(r["payload"]), r["descricao"])
+            for r in relatorio["resultados"]
+            if not so_respondidos or r["status"] == "resposta"]
+
+
+def reproduzir(caminho: str, ao_notificar):
+    """
+    Passa as respostas gravadas por ao_notificar(sender, data), na ordem em que
+    chegaram; devolve os resultados por comando
+    """
+    with open(caminho, encoding="utf-8") as arquivo:
+        relatorio = json.load(arquivo)
+    mac = relatorio.get("dispositivo") or ""
+    eventos = [(r["t"], r, resultado) for resultado in relatorio["resultados"] for r in resultado["respostas"]]
+    eventos += [(r["t"], r, None) for r in relatorio["espontaneas"]]
+    for _, registro, _ in sorted(eventos, key=lambda e: e[0]):
+        ao_notificar(CaracteristicaFalsa(registro["caracteristica"], mac), bytes.fromhex(registro["data"]))
+    return relatorio["resultados"]
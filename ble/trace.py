@@ -0,0 +1,294 @@
+"""
+Captura binária de pacotes BLE e backend falso para reprodução
+Formato .bltrace: cabeçalho "TCBT" + versão, seguido de registros
+    tipo(B) t(d) mac(6s) rssi(b) company_id(H) uuid(16s) tamanho(H) payload
+A gravação passa por um anel em memória de tamanho fixo que é despejado num
+arquivo mapeado (mmap); a reprodução alimenta os mesmos callbacks do bleak
+(detection_callback, notification handlers) em tempo real ou velocidade máxima.
+"""
+import asyncio
+import mmap
+import struct
+import time
+import uuid as uuidlib
+from collections import namedtuple
+
+MAGICO = b"TCBT\x01"
+CABECALHO = struct.Struct("<Bd6sbH16sH")
+
+MANUFACTURER = 1
+SERVICE_DATA = 2
+NOTIFY = 3
+
+Registro = namedtuple("Registro", "tipo t mac rssi company_id uuid data")
+
+_SEM_UUID = bytes(16)
+
+
+def _mac_bytes(mac: str) -> bytes:
+    return bytes.fromhex(mac.replace(":", "").replace("-", ""))[:6].ljust(6, b"\0")
+
+
+def _mac_str(raw: bytes) -> str:
+    return ":".join(f"{b:02X}" for b in raw)
+
+
+class Gravador:
+    """Grava registros num anel de `tamanho_anel` bytes que transborda para um arquivo mmap"""
+
+    def __init__(self, caminho: str, tamanho_anel: int = 64 * 1024, bloco_arquivo: int = 1 << 20):
+        self.caminho = caminho
+        self.bloco_arquivo = bloco_arquivo
+        self.anel = bytearray(tamanho_anel)
+        self.ocupado = 0
+        self.registros = 0
+        self._arquivo = open(caminho, "w+b")
+        self._arquivo.truncate(bloco_arquivo)
+        self._mapa = mmap.mmap(self._arquivo.fileno(), bloco_arquivo)
+        self._mapa[:len(MAGICO)] = MAGICO
+        self._escrito = len(MAGICO)
+        self._uuids = {}  # str -> 16 bytes (evita reconverter o mesmo UUID)
+
+    def _uuid(self, uuid) -> bytes:
+        if uuid is None:
+            return _SEM_UUID
+        raw = self._uuids.get(uuid)
+        if raw is None:
+            raw = self._uuids[uuid] = uuidlib.UUID(uuid).bytes
+        return raw
+
+    def gravar(self, tipo: int, mac: str, data, rssi: int = 0, company_id: int = 0, uuid=None, t=None):
+        tamanho = CABECALHO.size + len(data)
+        if self.ocupado + tamanho > len(self.anel):
+            self.descarregar()
+            if tamanho > len(self.anel):
+                self.anel = bytearray(tamanho)
+        CABECALHO.pack_into(self.anel, self.ocupado, tipo, time.time() if t is None else t,
+                            _mac_bytes(mac), max(-128, min(127, rssi or 0)), company_id,
+                            self._uuid(uuid), len(data))
+        inicio = self.ocupado + CABECALHO.size
+        self.anel[inicio:inicio + len(data)] = data
+        self.ocupado += tamanho
+        self.registros += 1
+
+    def anuncio(self, device, advertisement_data):
+        """Pode ser passado direto como detection_callback (ou chamado de dentro dele)"""
+        mac, rssi, agora = device.address, advertisement_data.rssi, time.time()
+        for company_id, data in advertisement_data.manufacturer_data.items():
+            self.gravar(MANUFACTURER, mac, data, rssi, company_id, None, agora)
+        for uuid, data in advertisement_data.service_data.items():
+            self.gravar(SERVICE_DATA, mac, data, rssi, 0, uuid, agora)
+
+    def notificacao(self, mac: str, uuid: str, data):
+        self.gravar(NOTIFY, mac, data, uuid=uuid)
+
+    def descarregar(self):
+        """Copia o anel para o arquivo mapeado (cresce o arquivo em blocos)"""
+        if not self.ocupado:
+            return
+        fim = self._escrito + self.ocupado
+        if fim > len(self._mapa):
+            novo = (fim // self.bloco_arquivo + 1) * self.bloco_arquivo
+            self._mapa.close()
+            self._arquivo.truncate(novo)
+            self._mapa = mmap.mmap(self._arquivo.fileno(), novo)
+        self._mapa[self._escrito:fim] = memoryview(self.anel)[:self.ocupado]
+        self._escrito = fim
+        self.ocupado = 0
+
+    def fechar(self):
+        self.descarregar()
+        self._mapa.flush()
+        self._mapa.close()
+        self._arquivo.truncate(self._escrito)
+        self._arquivo.close()
+
+
+def ler(caminho: str):
+    """Lê todos os registros de um .bltrace"""
+    with open(caminho, "rb") as f:
+        conteudo = f.read()
+    if not conteudo.startswith(MAGICO):
+        raise ValueError(f"{caminho} não é um arquivo .bltrace")
+
+    registros = []
+    visao = memoryview(conteudo)
+    uuids = {}
+    pos = len(MAGICO)
+    while pos + CABECALHO.size <= len(conteudo):
+        tipo, t, mac, rssi, company_id, uuid_raw, tamanho = CABECALHO.unpack_from(conteudo, pos)
+        pos += CABECALHO.size
+        if uuid_raw == _SEM_UUID:
+            uuid = None
+        else:
+            uuid = uuids.get(uuid_raw) or uuids.setdefault(uuid_raw, str(uuidlib.UUID(bytes=uuid_raw)))
+        registros.append(Registro(tipo, t, _mac_str(mac), rssi, company_id, uuid, bytes(visao[pos:pos + tamanho])))
+        pos += tamanho
+    return registros
+
+
+# === Backend falso ===
+
+class DispositivoFalso:
+    """Substituto de BLEDevice"""
+    __slots__ = ("address", "name", "details")
+
+    def __init__(self, address: str, name=None):
+        self.address = address
+        self.name = name
+        self.details = None
+
+
+class AnuncioFalso:
+    """Substituto de AdvertisementData"""
+    __slots__ = ("local_name", "manufacturer_data", "service_data", "service_uuids", "tx_power", "rssi")
+
+    def __init__(self, manufacturer_data, service_data, rssi):
+        self.local_name = None
+        self.manufacturer_data = manufacturer_data
+        self.service_data = service_data
+        self.service_uuids = list(service_data)
+        self.tx_power = None
+        self.rssi = rssi
+
+
+class CaracteristicaFalsa:
+    """Substituto de BleakGATTCharacteristic (sender dos notification handlers)"""
+    __slots__ = ("uuid", "mac")
+
+    def __init__(self, uuid: str, mac: str):
+        self.uuid = uuid
+        self.mac = mac
+
+    def __str__(self):
+        return f"{self.uuid} ({self.mac})"
+
+
+def _anuncios(registros):
+    """Agrupa registros de advertisement do mesmo instante/dispositivo num AnuncioFalso"""
+    atual = None
+    for r in registros:
+        if r.tipo == NOTIFY:
+            continue
+        if atual is None or (r.t, r.mac) != atual[0]:
+            if atual is not None:
+                yield atual[0][0], atual[0][1], atual[1]
+            atual = ((r.t, r.mac), AnuncioFalso({}, {}, r.rssi))
+        if r.tipo == MANUFACTURER:
+            atual[1].manufacturer_data[r.company_id] = r.data
+        else:
+            atual[1].service_data[r.uuid] = r.data
+            atual[1].service_uuids.append(r.uuid)
+    if atual is not None:
+        yield atual[0][0], atual[0][1], atual[1]
+
+
+async def _no_ritmo(eventos, velocidade):
+    """Itera (t, ...) respeitando os intervalos originais; velocidade None = sem espera"""
+    inicio_real = inicio_trace = None
+    for evento in eventos:
+        if velocidade:
+            if inicio_trace is None:
+                inicio_real, inicio_trace = time.monotonic(), evento[0]
+            atraso = (evento[0] - inicio_trace) / velocidade - (time.monotonic() - inicio_real)
+            if atraso > 0:
+                await asyncio.sleep(atraso)
+        else:
+            await asyncio.sleep(0)
+        yield evento
+
+
+class ScannerFalso:
+    """Substituto de BleakScanner(detection_callback) que reproduz um trace"""
+
+    def __init__(self, detection_callback, registros, velocidade=1.0):
+        self.detection_callback = detection_callback
+        self.registros = ler(registros) if isinstance(registros, str) else registros
+        self.velocidade = velocidade
+        self.fim = asyncio.Event()
+        self._dispositivos = {}
+        self._tarefa = None
+
+    async def start(self):
+        self._tarefa = asyncio.create_task(self._reproduzir())
+
+    async def stop(self):
+        if self._tarefa:
+            self._tarefa.cancel()
+            await asyncio.gather(self._tarefa, return_exceptions=True)
+
+    async def _reproduzir(self):
+        async for _, mac, anuncio in _no_ritmo(_anuncios(self.registros), self.velocidade):
+            dispositivo = self._dispositivos.get(mac)
+            if dispositivo is None:
+                dispositivo = self._dispositivos[mac] = DispositivoFalso(mac)
+            self.detection_callback(dispositivo, anuncio)
+        self.fim.set()
+
+
+class ClienteFalso:
+    """Substituto de BleakClient: start_notify reproduz as notificações gravadas daquele MAC/UUID"""
+
+    def __init__(self, registros, dispositivo, disconnected_callback=None, timeout=None, velocidade=1.0):
+        self.registros = registros
+        self.mac = getattr(dispositivo, "address", dispositivo).upper()
+        self.disconnected_callback = disconnected_callback
+        self.velocidade = velocidade
+        self.is_connected = False
+        self._tarefas = []
+
+    async def connect(self):
+        self.is_connected = True
+        return True
+
+    async def start_notify(self, uuid, handler):
+        notificacoes = [r for r in self.registros
+                        if r.tipo == NOTIFY and r.mac == self.mac and r.uuid == uuid]
+        self._tarefas.append(asyncio.create_task(self._reproduzir(uuid, notificacoes, handler)))
+
+    async def stop_notify(self, uuid):
+        pass
+
+    async def disconnect(self):
+        self.is_connected = False
+        for tarefa in self._tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*self._tarefas, return_exceptions=True)
+        self._tarefas = []
+
+    async def _reproduzir(self, uuid, notificacoes, handler):
+        caracteristica = CaracteristicaFalsa(uuid, self.mac)
+        async for r in _no_ritmo(notificacoes, self.velocidade):
+            handler(caracteristica, bytearray(r.data))
+
+
+def fabrica_clientes(registros, velocidade=1.0):
+    """cliente_factory para ble.sessoes.GerenciadorSessoes usando um trace"""
+    registros = ler(registros) if isinstance(registros, str) else registros
+
+    def criar(dispositivo, disconnected_callback=None, timeout=None):
+        return ClienteFalso(registros, dispositivo, disconnected_callback, timeout, velocidade)
+    return criar
+
+
+async def reproduzir(caminho: str, detection_callback=None, notification_handler=None, velocidade=1.0):
+    """
+    Reproduz um trace inteiro nos callbacks no formato do bleak:
+    detection_callback(device, advertisement_data) e notification_handler(sender, data)
+    """
+    registros = ler(caminho)
+    dispositivos = {}
+    eventos = []
+    if notification_handler:
+        eventos += [(r.t, r) for r in registros if r.tipo == NOTIFY]
+    if detection_callback:
+        eventos += [(t, (mac, anuncio)) for t, mac, anuncio in _anuncios(registros)]
+    eventos.sort(key=lambda e: e[0])
+
+    async for _, evento in _no_ritmo(eventos, velocidade):
+        if isinstance(evento, Registro):
+            notification_handler(CaracteristicaFalsa(evento.uuid, evento.mac), bytearray(evento.data))
+        else:
+            mac, anuncio = evento
+            dispositivo = dispositivos.get(mac) or dispositivos.setdefault(mac, DispositivoFalso(mac))
+            detection_callback(dispositivo, anuncio)
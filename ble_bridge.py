@@ -2,102 +2,332 @@
 BLE Bridge - Ponte entre dispositivos Bluetooth e TeleCuidar
 Captura dados de balança, oxímetro, etc. e envia via HTTP para o backend
 """
+import argparse
 import asyncio
-import aiohttp
-from bleak import BleakScanner, BleakClient
+import os
+import signal
+import time
 from datetime import datetime
 
+from ble import metricas
+from ble.adaptadores import Adaptador, Balanceador, ScannerMultiplo
+from ble.agendador import Agendador
+from ble.console import Hex, console
+from ble.decoders import caracteristicas
+from ble.concessoes import TabelaConcessoes, servir as servir_concessoes
+from ble.dedup import Deduplicador
+from ble.dispositivos import CAMINHO as DEVICES_PATH, Observador, carregar, montar_registro
+from ble.envio import Entregador
+from ble.estado import TabelaEstados
+from ble.fluxo import PERFIS as STREAMS, Transmissor
+from ble.gatt_cache import CacheGatt
+from ble.hub import ConexaoHub, TransporteHub, vital_signs_lote
+from ble.gatt_saude import valores
+from ble.outbox import Outbox, Replicador
+from ble.perfil import Vigia
+from ble.scan_daemon import ScannerCompartilhado
+from ble.sessoes import GerenciadorSessoes
+from ble.trace import Gravador, ScannerFalso, fabrica_clientes
+
 # === CONFIGURAÇÃO ===
 BACKEND_URL = "http://localhost:5239/api/biometrics/ble-reading"
-APPOINTMENT_ID = None  # Será definido via argumento ou input
+HUB_URL = "http://localhost:5239/hubs/medical-devices"  # --hub: SendVitalSigns por WebSocket
+HUB_TOKEN = os.environ.get("TELECUIDAR_TOKEN")  # JWT exigido pelo [Authorize] do hub
+ENVIO_WORKERS = 2       # Conexões HTTP simultâneas com o backend
+ENVIO_FILA = 256        # Leituras aguardando envio antes de descartar
+OUTBOX_PATH = "ble_outbox.db"  # Leituras gravadas antes do envio (sobrevive a quedas)
+GATT_CACHE_PATH = "ble_gatt_cache.json"  # Serviços/handles por dispositivo (pula a redescoberta)
+STATUS_OUTBOX_S = 30    # Intervalo do resumo do outbox
+CONEXOES_SIMULTANEAS = 2  # Tentativas de conexão GATT ao mesmo tempo (por adaptador)
+CONEXOES_POR_ADAPTADOR = 5  # --adaptadores: conexões LE mantidas por controlador
+ESTADO_TTL_S = 300      # Esquece o estado de um dispositivo após 5 min sem pacotes
+METRICAS_PORTA = 9464   # GET http://127.0.0.1:9464/metrics (Prometheus)
+API_PORTA = 9465        # PUT/DELETE http://127.0.0.1:9465/leases/{mac} (concessões)
+CONCESSAO_TTL_S = 1800  # Concessão sem prazo informado vale 30 min
+SEM_CONSULTA_MAX_S = 900  # Leitura sem consulta espera até 15 min pela concessão do dispositivo
+DEDUP_HEARTBEAT_S = 0.2  # Anúncio idêntico só é redecodificado após este intervalo
+PERFIL_LIMIAR_S = 0.1    # --profile: loop parado por mais que isso é reportado com a pilha
+STREAM_TAXA_HZ = 5.0     # Pressão do manguito / PLX contínuo reduzidos a esta taxa
+STREAM_INTERVALO_S = 1.0  # Um lote por stream a cada intervalo
+CONFIG_INTERVALO_S = 2.0  # Verificação do ble_devices.json (recarrega sem reiniciar o scan)
 
-# Dispositivos conhecidos
+# Dispositivos conhecidos (modelo = chave de ble.decoders.MODELOS)
+# gatt=True: conecta e assina as características do modelo; senão só lê advertisements
+# Com ble_devices.json (--dispositivos) a lista vem do arquivo e é recarregada quando ele muda
 DEVICES = {
-    "F8:8F:C8:3A:B7:92": {"type": "scale", "name": "Balança OKOK"},
-    # Adicione outros dispositivos aqui
+    "F8:8F:C8:3A:B7:92": {"type": "scale", "name": "Balança OKOK", "modelo": "okok"},
+    "00:5F:BF:9A:64:DF": {"type": "blood_pressure", "name": "Omron HEM-7156T", "modelo": "blood_pressure", "gatt": True},
 }
 
-# Estado
-estado = {
-    "peso": {"valor": 0, "contador": 0, "confirmado": False},
-}
+# Decodificadores: perfis GATT padrão + modelos dos dispositivos conhecidos
+registro = montar_registro(DEVICES)
 
-async def enviar_leitura(tipo: str, valores: dict):
-    """Envia leitura para o backend TeleCuidar"""
-    if not APPOINTMENT_ID:
-        print(f"⚠️  Sem appointment_id - leitura não enviada")
-        return
-        
+# Estado por dispositivo (estabilização etc.), criado no primeiro pacote
+estado = TabelaEstados(ttl=ESTADO_TTL_S)
+
+# Dispositivo -> consulta: cada leitura vai para quem tem a concessão agora
+# (padrão = --consulta, para dispositivos sem concessão)
+concessoes = TabelaConcessoes(duracao=CONCESSAO_TTL_S)
+
+# Advertisements repetidos não chegam aos decodificadores
+dedup = Deduplicador(heartbeat=DEDUP_HEARTBEAT_S)
+DEBUG = False  # --debug: mostra o hex de cada payload novo
+
+# Entrega ao backend e conexões GATT (criados em main)
+entregador = None
+outbox = None
+replicador = None
+sessoes = None
+gravador = None  # --gravar
+scanner = None
+transmissor = None  # streams 2A36/2A5F (lotes pelo hub)
+
+def enviar_leitura(mac: str, tipo: str, valores: dict):
+    """Grava a leitura no outbox e acorda o replicador (não bloqueia o callback)"""
+    consulta = concessoes.consulta(mac)
     payload = {
-        "appointmentId": APPOINTMENT_ID,
+        "appointmentId": consulta,
         "deviceType": tipo,
         "timestamp": datetime.now().isoformat(),
         "values": valores
     }
     
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(BACKEND_URL, json=payload) as resp:
-                if resp.status == 200:
-                    print(f"✅ Enviado para TeleCuidar: {valores}")
-                else:
-                    print(f"❌ Erro ao enviar: {resp.status}")
-    except Exception as e:
-        print(f"❌ Erro de conexão: {e}")
-
-def processar_balanca(data: bytes):
-    """Processa dados da balança OKOK"""
-    global estado
-    
-    if len(data) < 2:
+    outbox.adicionar(payload, mac)
+    metricas.LEITURAS.inc(tipo)
+    if not consulta:
+        metricas.SEM_CONSULTA.inc(tipo)
+        console.log("⚠️  {} sem consulta - leitura guardada até a concessão do dispositivo", mac)
         return
-    
-    raw = (data[0] << 8) | data[1]
-    peso = round(raw / 100, 2)
+    replicador.acordar()
+
+def associar_guardadas(mac: str, consulta: str):
+    """Concessão nova: leituras recentes do dispositivo guardadas sem consulta vão para ela"""
+    associadas = outbox.associar(mac, consulta, SEM_CONSULTA_MAX_S)
+    if not associadas:
+        return
+    metricas.SEM_CONSULTA_DESTINO.inc("associada", n=associadas)
+    console.log("📌 {}: {} leitura(s) guardada(s) associada(s) à consulta {}", mac, associadas, consulta)
+    replicador.acordar()
+
+def expirar_guardadas():
+    """Leituras sem consulta que passaram do prazo não vão para nenhuma concessão"""
+    expiradas = outbox.expirar_sem_consulta(SEM_CONSULTA_MAX_S)
+    if expiradas:
+        metricas.SEM_CONSULTA_DESTINO.inc("expirada", n=expiradas)
+        console.log("⌛ {} leitura(s) sem consulta há mais de {:.0f} min descartada(s)",
+                    expiradas, SEM_CONSULTA_MAX_S / 60)
+
+def enviar_lote(lote: dict) -> bool:
+    """Lote de stream: só pelo hub, sem outbox (dado ao vivo; a medição final vai pelo outbox)"""
+    consulta = concessoes.consulta(lote["mac"])
+    if not consulta or not hasattr(entregador, "transmitir"):
+        return False
+    return entregador.transmitir(vital_signs_lote(consulta, lote))
+
+def final_do_stream(mac: str, tipo: str, valores: dict):
+    """Stream sem medição final própria (PLX contínuo) terminou: manda o último valor"""
+    console.log("✅ {} {}: {}", tipo, mac, valores)
+    enviar_leitura(mac, tipo, valores)
+
+async def aplicar_dispositivos(novos: dict, adicionados=(), removidos=(), alterados=()):
+    """Configuração nova com o scan rodando: troca as tabelas, o filtro do scan e as sessões GATT"""
+    global DEVICES, registro
+    antigos = DEVICES
+    # As duas tabelas mudam juntas, sem await no meio: nenhum pacote vê uma sem a outra
+    DEVICES, registro = novos, montar_registro(novos)
+    if scanner is not None and hasattr(scanner, "filtrar"):
+        scanner.filtrar(DEVICES)
+
+    for mac in adicionados:
+        console.log("➕ {} ({}, {})", novos[mac]["name"], mac, novos[mac]["modelo"])
+    for mac in alterados:
+        console.log("✏️  {} ({}) alterado", novos[mac]["name"], mac)
+    for mac in removidos:
+        console.limpar(mac)
+        console.log("➖ {} ({}) removido", antigos[mac]["name"], mac)
+
+    # Sessões GATT só mudam se o modelo ou o gatt mudou: as outras continuam conectadas
+    for mac in (*removidos, *alterados):
+        info = novos.get(mac)
+        if mac in sessoes.sessoes and (info is None or not info.get("gatt")
+                                       or info["modelo"] != antigos[mac]["modelo"]):
+            await sessoes.remover(mac)
+    for mac in (*adicionados, *alterados):
+        if novos[mac].get("gatt"):
+            sessoes.adicionar(mac, caracteristicas(novos[mac]["modelo"]))
+
+def resumo_outbox():
+    """Mostra profundidade e idade do outbox quando há leituras pendentes ou sem consulta"""
+    pendentes = outbox.profundidade()
+    if pendentes:
+        idade = outbox.idade() or 0
+        console.log("📦 Outbox: {} leitura(s) pendente(s), mais antiga há {:.0f}s", pendentes, idade)
+    sem_consulta = outbox.sem_consulta()
+    if sem_consulta:
+        console.log("📦 Outbox: {} leitura(s) guardada(s) esperando consulta", sem_consulta)
+
+def resumo_scan(scanner):
+    """Quantos anúncios o filtro do scan barrou antes do detection_callback"""
+    if not hasattr(scanner, "resumo"):
+        return
+    r = scanner.resumo()
+    if r.get("filtrados"):
+        console.log("🔍 Scan ({}): {} de {} anúncios filtrados antes do callback (no sistema: {})",
+                    r["modo"], r["filtrados"], r["vistos"], r.get("no_sistema", "nenhum"))
+
+def resumo_adaptadores():
+    """Conexões por adaptador (--adaptadores)"""
+    if sessoes.balanceador is None:
+        return
+    console.log("📶 Adaptadores: {}", ", ".join(
+        f"{a.nome} {len(a.conexoes)}/{a.capacidade}" for a in sessoes.balanceador.adaptadores.values()))
+
+def processar_balanca(mac: str, leitura):
+    """Confirma o peso da balança OKOK por estabilidade"""
+    balanca = estado.obter(mac, "scale").estabilizador
+    peso = leitura.weight
     
     # Se zerou, reseta
-    if raw == 0:
-        if estado["peso"]["confirmado"]:
-            print("🔄 Balança zerada\n")
-        estado["peso"] = {"valor": 0, "contador": 0, "confirmado": False}
+    if peso == 0:
+        console.limpar(mac)
+        if balanca.confirmado is not None:
+            console.log("🔄 Balança zerada\n")
+        balanca.reiniciar()
         return None
     
     # Mostra em tempo real
-    print(f"⚖️  {peso} kg", end="\r")
+    console.ao_vivo(mac, "⚖️  {} kg", peso)
     
-    # Conta estabilidade
-    if raw == estado["peso"]["valor"]:
-        estado["peso"]["contador"] += 1
-    else:
-        estado["peso"]["valor"] = raw
-        estado["peso"]["contador"] = 1
-        estado["peso"]["confirmado"] = False
+    confirmado = balanca.adicionar(peso)
+    if confirmado is None:
+        return None
     
-    # Confirma após 5 leituras iguais
-    if estado["peso"]["contador"] >= 5 and not estado["peso"]["confirmado"]:
-        estado["peso"]["confirmado"] = True
-        print(f"\n\n✅ PESO: {peso} kg\n")
-        return {"weight": peso}
+    metricas.ESTABILIZACAO.observar(balanca.tempo_confirmacao, "scale")
+    console.limpar(mac)
+    console.log("\n✅ PESO: {} kg (estável em {:.1f}s)\n", confirmado, balanca.tempo_confirmacao)
+    return {"weight": confirmado}
+
+def processar_manguito(mac: str, leitura):
+    """
+    Pressão do manguito (2A36) no stream; o manguito vazio depois da medição
+    encerra o stream sem esperar a ociosidade. Um degrau parado no meio da
+    desinflação não encerra: o fim é o zero ou a medição final (2A35).
+    """
+    pressao = leitura.systolic
+    if pressao is None:
+        return  # valor especial (NaN etc.) do SFLOAT: amostra sem pressão
+    if pressao > 0:
+        transmissor.amostra(mac, "cuff_pressure", leitura)
+        return
+    if not transmissor.aberto(mac, "cuff_pressure"):
+        return  # manguito vazio fora de uma medição
+    transmissor.amostra(mac, "cuff_pressure", leitura)
+    console.log("🩺 {}: manguito vazio - fim do stream", mac)
+    transmissor.leitura_final(mac, "blood_pressure")
+
+# Tipos que precisam de confirmação antes do envio; os demais já chegam como valor final
+CONFIRMADORES = {
+    "scale": processar_balanca,
+}
+
+# Streams com detecção de fim própria; os demais terminam pela medição final ou por ociosidade
+FINS_DE_STREAM = {
+    "cuff_pressure": processar_manguito,
+}
+
+def tratar_pacote(mac: str, fonte, data: bytes, nome=None, anuncio=False):
+    """Decodifica um pacote (advertisement ou notify) e envia a leitura confirmada"""
+    decodificador = registro.resolver(mac, fonte, nome)
+    if decodificador is None:
+        return
+    
+    if anuncio:
+        metricas.ANUNCIOS.inc(mac)
+        if not dedup.novo(mac, fonte, data):
+            metricas.ANUNCIOS_REPETIDOS.inc(mac)
+            return
+    if DEBUG:
+        console.log("📦 {} [{}] {} ({} repetidos)", mac, fonte, Hex(data), dedup.repeticoes(mac, fonte))
     
-    return None
+    inicio = time.perf_counter()
+    leitura = decodificador.decodificar(data)
+    metricas.DECODIFICACAO.observar(time.perf_counter() - inicio, decodificador.tipo)
+    if not leitura:
+        return
+    
+    if decodificador.tipo in STREAMS:
+        fim_do_stream = FINS_DE_STREAM.get(decodificador.tipo)
+        if fim_do_stream:
+            fim_do_stream(mac, leitura)
+        else:
+            transmissor.amostra(mac, decodificador.tipo, leitura)
+        return
+    
+    confirmar = CONFIRMADORES.get(decodificador.tipo)
+    if confirmar:
+        leitura = confirmar(mac, leitura)
+    if leitura:
+        if transmissor:
+            transmissor.leitura_final(mac, decodificador.tipo)
+        enviar_leitura(mac, decodificador.tipo, valores(leitura))
+
+def notification_handler(mac: str, uuid: str, data: bytearray):
+    """Callback das sessões GATT (notify/indicate)"""
+    if gravador:
+        gravador.notificacao(mac, uuid, data)
+    metricas.NOTIFICACOES.inc(mac)
+    tratar_pacote(mac, uuid, data)
 
 def detection_callback(device, advertisement_data):
     """Callback para dispositivos detectados via advertisement"""
     mac = device.address.upper()
+    nome = advertisement_data.local_name
     
-    if mac not in DEVICES:
-        return
-    
-    device_info = DEVICES[mac]
+    if gravador:
+        gravador.anuncio(device, advertisement_data)
+    if mac in sessoes.sessoes:
+        sessoes.anuncio(mac, device, advertisement_data.rssi)
     
-    for _, data in advertisement_data.manufacturer_data.items():
-        if device_info["type"] == "scale":
-            resultado = processar_balanca(data)
-            if resultado:
-                asyncio.create_task(enviar_leitura("scale", resultado))
+    for company_id, data in advertisement_data.manufacturer_data.items():
+        tratar_pacote(mac, company_id, data, nome, anuncio=True)
+    for uuid, data in advertisement_data.service_data.items():
+        tratar_pacote(mac, uuid, data, nome, anuncio=True)
+
+def argumentos():
+    parser = argparse.ArgumentParser(description="BLE Bridge - TeleCuidar")
+    parser.add_argument("--dispositivos", default=DEVICES_PATH, metavar="CAMINHO",
+                        help=f"arquivo ou pasta de dispositivos (padrão {DEVICES_PATH}), recarregado ao mudar")
+    parser.add_argument("--consulta", metavar="ID",
+                        help="consulta dos dispositivos sem concessão (bridge de uma consulta só)")
+    parser.add_argument("--api", type=int, default=API_PORTA, metavar="PORTA",
+                        help=f"porta da API local de concessões /leases (padrão {API_PORTA}; 0 desliga)")
+    parser.add_argument("--adaptadores", metavar="HCI,...",
+                        help="adaptadores BlueZ para scan e conexões (ex.: hci0,hci1); padrão: o do sistema")
+    parser.add_argument("--gravar", metavar="ARQUIVO", help="grava advertisements e notificações em .bltrace")
+    parser.add_argument("--replay", metavar="ARQUIVO", help="reproduz um .bltrace em vez de usar o rádio")
+    parser.add_argument("--velocidade", type=float, default=1.0, help="velocidade do replay (0 = máxima)")
+    parser.add_argument("--debug", action="store_true", help="mostra o hex de cada payload novo")
+    parser.add_argument("--metricas", type=int, default=METRICAS_PORTA, metavar="PORTA",
+                        help=f"porta do endpoint /metrics (padrão {METRICAS_PORTA}; 0 desliga)")
+    parser.add_argument("--profile", action="store_true",
+                        help="vigia o event loop; SIGUSR1 liga/desliga o profiler (.folded para flame graph)")
+    parser.add_argument("--hub", nargs="?", const=HUB_URL, metavar="URL",
+                        help=f"leituras ao vivo e streams pelo MedicalDevicesHub (padrão {HUB_URL}); a gravação continua pelo POST")
+    parser.add_argument("--log", metavar="ARQUIVO", help="também grava o log (em lotes) neste arquivo")
+    parser.add_argument("--stream-taxa", type=float, default=STREAM_TAXA_HZ, metavar="HZ",
+                        help=f"taxa dos lotes de pressão do manguito / PLX contínuo (padrão {STREAM_TAXA_HZ:g} Hz)")
+    return parser.parse_args()
 
-async def main():
-    global APPOINTMENT_ID
+async def main(args):
+    global DEVICES, registro, entregador, outbox, replicador, sessoes, gravador, transmissor, scanner, DEBUG
+    DEBUG = args.debug
+    try:
+        arquivo = carregar(args.dispositivos)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    if arquivo:
+        DEVICES, registro = arquivo, montar_registro(arquivo)
     
     print("=" * 50)
     print("   BLE BRIDGE - TeleCuidar")
@@ -107,26 +337,137 @@ async def main():
         print(f"  • {info['name']} ({mac})")
     print()
     
-    # Pede ID da consulta (opcional)
-    APPOINTMENT_ID = input("ID da consulta (Enter para pular): ").strip() or None
-    
-    if APPOINTMENT_ID:
-        print(f"\n📡 Conectado à consulta: {APPOINTMENT_ID}")
+    # Consultas chegam em tempo de execução (API local / hub); --consulta vale para o resto
+    concessoes.padrao = args.consulta
+    if args.consulta:
+        print(f"📡 Consulta padrão: {args.consulta}")
     else:
-        print("\n⚠️  Modo offline - dados não serão enviados")
+        print(f"⚠️  Sem consulta padrão - leitura de dispositivo sem concessão espera até "
+              f"{SEM_CONSULTA_MAX_S // 60} min pela concessão")
     
     print("\nAguardando leituras... (Ctrl+C para sair)\n")
     
-    scanner = BleakScanner(detection_callback)
+    # A partir daqui tudo passa pelo console: callbacks não escrevem no terminal
+    console.iniciar(args.log)
+    
+    outbox = Outbox(OUTBOX_PATH)
+    resumo_outbox()
+    entregador = Entregador(BACKEND_URL, workers=ENVIO_WORKERS, tamanho_fila=ENVIO_FILA, tentativas=3)
+    if args.hub:
+        # Uma conexão persistente com o hub para a sala ao vivo; o POST continua gravando a leitura
+        hub = ConexaoHub(args.hub, HUB_TOKEN)
+        entregador = TransporteHub(hub, entregador, workers=ENVIO_WORKERS, tamanho_fila=ENVIO_FILA)
+    replicador = Replicador(outbox, entregador)
+    # Cada concessão (API /leases) liga as leituras guardadas do dispositivo à consulta
+    concessoes.ao_conceder = associar_guardadas
+    await entregador.iniciar()
+    replicador.iniciar()
+    transmissor = Transmissor(enviar_lote, final_do_stream, taxa=args.stream_taxa,
+                              intervalo=STREAM_INTERVALO_S)
+    transmissor.iniciar()
+    if not args.hub:
+        console.log("ℹ️  Sem --hub: streams de pressão do manguito / PLX contínuo não são enviados")
+    
+    if args.gravar:
+        gravador = Gravador(args.gravar)
+        console.log("🔴 Gravando pacotes em {}", args.gravar)
+    
+    velocidade = args.velocidade or None
+    if args.replay:
+        console.log("⏯️  Replay de {} (sem rádio)", args.replay)
+        # O heartbeat do dedup é em tempo de relógio: acompanha a velocidade do replay
+        dedup.heartbeat = DEDUP_HEARTBEAT_S / velocidade if velocidade else 0.0
+        sessoes = GerenciadorSessoes(notification_handler, conexoes_simultaneas=CONEXOES_SIMULTANEAS,
+                                     cliente_factory=fabrica_clientes(args.replay, velocidade))
+    else:
+        # Com --adaptadores cada conexão vai para o adaptador com melhor sinal e folga
+        balanceador = None
+        if args.adaptadores:
+            balanceador = Balanceador([Adaptador(nome.strip(), CONEXOES_POR_ADAPTADOR)
+                                       for nome in args.adaptadores.split(",") if nome.strip()])
+        # Vagas de conexão por sinal e recência do anúncio; aparelho que sumiu não prende a vaga
+        agendador = Agendador(CONEXOES_SIMULTANEAS * len(balanceador.adaptadores) if balanceador
+                              else CONEXOES_SIMULTANEAS)
+        # Serviços de cada dispositivo em disco: a reconexão não redescobre o aparelho inteiro
+        sessoes = GerenciadorSessoes(notification_handler, cache=CacheGatt(GATT_CACHE_PATH),
+                                     balanceador=balanceador, agendador=agendador)
+    for mac, info in DEVICES.items():
+        if info.get("gatt"):
+            sessoes.adicionar(mac, caracteristicas(info["modelo"]))
+    sessoes.iniciar()
+    
+    if args.replay:
+        scanner = ScannerFalso(detection_callback, args.replay, velocidade)
+    elif sessoes.balanceador is not None:
+        # Um scan por adaptador: cada um mede o RSSI que o balanceador usa
+        scanner = ScannerMultiplo(detection_callback, sessoes.balanceador, macs=DEVICES)
+        console.log("📶 Adaptadores: {}", ", ".join(sessoes.balanceador.adaptadores))
+    else:
+        # Usa o daemon de scan (python -m ble.scan_daemon) se estiver rodando.
+        # Só MACs: o sistema não filtra por endereço, o filtro roda no Python (ble.filtros)
+        scanner = ScannerCompartilhado(detection_callback, macs=DEVICES)
     await scanner.start()
+    observador = Observador(args.dispositivos, DEVICES, aplicar_dispositivos, CONFIG_INTERVALO_S)
+    observador.iniciar()
+    
+    # Medidores lidos na hora da coleta
+    metricas.FILA_ENVIO.funcao = entregador.fila.qsize
+    metricas.OUTBOX_PENDENTES.funcao = outbox.profundidade
+    metricas.OUTBOX_IDADE.funcao = outbox.idade
+    metricas.CONCESSOES.funcao = concessoes.__len__
+    if hasattr(scanner, "resumo"):
+        metricas.ANUNCIOS_FILTRADOS.funcao = lambda: scanner.resumo().get("filtrados")
+    vigia = None
+    if args.profile:
+        vigia = Vigia(limiar=PERFIL_LIMIAR_S)
+        vigia.iniciar()
+        if hasattr(signal, "SIGUSR1"):
+            asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, vigia.alternar_amostragem)
+            console.log("⏱️  Vigia do loop ativo - kill -USR1 {} liga/desliga o profiler", os.getpid())
+        else:
+            # Sem SIGUSR1 (Windows): amostra desde o início e grava ao sair
+            vigia.alternar_amostragem()
+    servidor_metricas = None
+    if args.metricas:
+        servidor_metricas = await metricas.servir(args.metricas)
+        console.log("📈 Métricas em http://127.0.0.1:{}/metrics", args.metricas)
+    servidor_api = None
+    if args.api:
+        servidor_api = await servir_concessoes(concessoes, args.api)
+        console.log("📌 Concessões em http://127.0.0.1:{}/leases", args.api)
     
     try:
         while True:
-            await asyncio.sleep(1)
-    except KeyboardInterrupt:
-        print("\n\n👋 Encerrando...")
+            await asyncio.sleep(STATUS_OUTBOX_S)
+            resumo_outbox()
+            resumo_scan(scanner)
+            resumo_adaptadores()
+            estado.expirar()
+            concessoes.expirar()
+            expirar_guardadas()
+            if gravador:
+                gravador.descarregar()
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        console.log("\n👋 Encerrando...")
     finally:
+        if vigia:
+            await vigia.encerrar()
+        if servidor_metricas:
+            await servidor_metricas.cleanup()
+        if servidor_api:
+            await servidor_api.cleanup()
+        await observador.encerrar()
         await scanner.stop()
+        await sessoes.encerrar()
+        await transmissor.encerrar()
+        await replicador.encerrar()
+        await entregador.encerrar()
+        resumo_outbox()
+        outbox.fechar()
+        if gravador:
+            gravador.fechar()
+            console.log("💾 {} pacotes gravados em {}", gravador.registros, gravador.caminho)
+        await console.encerrar()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(main(argumentos()))
@@ -1,11 +1,17 @@
 import asyncio
-from bleak import BleakScanner
+import sys
+
+from ble.scan_daemon import ScannerCompartilhado
+from ble.trace import Gravador
 
 TARGET_MAC = "F8:8F:C8:3A:B7:92"
 
+# Opcional: python debug_peso_okok.py captura.bltrace
+gravador = Gravador(sys.argv[1]) if len(sys.argv) > 1 else None
+
 def detection_callback(device, advertisement_data):
-    if device.address.upper() != TARGET_MAC:
-        return
+    if gravador:
+        gravador.anuncio(device, advertisement_data)
 
     for _, data in advertisement_data.manufacturer_data.items():
         if len(data) >= 6 and data[0] == 0x24:
@@ -22,9 +28,12 @@ def detection_callback(device, advertisement_data):
 
 async def main():
     print("Suba na balança e fique parado...")
-    scanner = BleakScanner(detection_callback)
+    scanner = ScannerCompartilhado(detection_callback, macs=[TARGET_MAC])
     await scanner.start()
     await asyncio.sleep(15)
     await scanner.stop()
+    if gravador:
+        gravador.fechar()
+        print(f"\n{gravador.registros} pacotes gravados em {gravador.caminho}")
 
 asyncio.run(main())
@@ -1,5 +1,8 @@
 import asyncio
-from bleak import BleakClient, BleakScanner
+from bleak import BleakClient
+
+from ble.gatt_cache import CacheGatt, sincronizado
+from ble.scan_daemon import encontrar
 
 ADDRESS = "DC:23:4E:DA:E9:DD"
 
@@ -10,8 +13,7 @@ CONN_PARAMS_UUID = "00002a04-0000-1000-8000-00805f9b34fb"
 
 async def main():
     print("[*] Escaneando dispositivo...")
-    devices = await BleakScanner.discover(timeout=15.0)
-    target = next((d for d in devices if d.address.upper() == ADDRESS.upper()), None)
+    target = await encontrar(ADDRESS)
     
     if not target:
         print(f"[!] Dispositivo {ADDRESS} não encontrado!")
@@ -20,41 +22,45 @@ async def main():
     print(f"[+] Encontrado: {target.name}")
     print("[*] Conectando...")
     
-    async with BleakClient(target, timeout=30.0) as client:
+    cache = CacheGatt()
+    # Todas as características com 'read': estáticas do cache, o resto lido em paralelo
+    async with sincronizado(cache, ADDRESS, lambda **kw: BleakClient(target, timeout=30.0, **kw)) as (client, banco):
         print("[+] Conectado!\n")
         
-        # Listar todos os serviços e tentar ler todas as características com 'read'
-        for service in client.services:
-            print(f"\n=== SERVIÇO: {service.uuid} ===")
+        print(f"[*] {len(banco['do_cache'])} valor(es) do cache, firmware {banco['firmware'] or '?'}")
+        
+        for service in banco["servicos"]:
+            print(f"\n=== SERVIÇO: {service['uuid']} ===")
             
-            for char in service.characteristics:
-                props = char.properties
-                print(f"\nCaracterística: {char.uuid}")
+            for char in service["caracteristicas"]:
+                props = char["propriedades"]
+                print(f"\nCaracterística: {char['uuid']}")
                 print(f"  Propriedades: {', '.join(props)}")
                 
-                if "read" in props:
-                    try:
-                        value = await client.read_gatt_char(char.uuid)
-                        hex_val = " ".join(f"{b:02X}" for b in value)
-                        
-                        # Tentar decodificar como texto
-                        try:
-                            text_val = value.decode('utf-8', errors='ignore')
-                            if text_val.isprintable() and len(text_val) > 0:
-                                print(f"  Valor (texto): {text_val}")
-                        except:
-                            pass
-                        
-                        print(f"  Valor (hex): {hex_val}")
-                        
-                        # Tentar interpretar como número (temperatura?)
-                        if len(value) >= 2:
-                            val_le = int.from_bytes(value[:2], 'little')
-                            val_be = int.from_bytes(value[:2], 'big')
-                            print(f"  Como número (little-endian): {val_le} ({val_le/100:.2f}°C?)")
-                            print(f"  Como número (big-endian): {val_be} ({val_be/100:.2f}°C?)")
-                            
-                    except Exception as e:
-                        print(f"  [Erro ao ler]: {e}")
+                if "read" not in props:
+                    continue
+                if char["uuid"] in banco["erros"]:
+                    print(f"  [Erro ao ler]: {banco['erros'][char['uuid']]}")
+                    continue
+                value = banco["valores"].get(char["uuid"])
+                if value is None:
+                    continue
+                hex_val = value.hex(" ").upper()
+                if char["uuid"] in banco["do_cache"]:
+                    hex_val += " (cache)"
+                
+                # Tentar decodificar como texto
+                text_val = value.decode('utf-8', errors='ignore')
+                if text_val.isprintable() and len(text_val) > 0:
+                    print(f"  Valor (texto): {text_val}")
+                
+                print(f"  Valor (hex): {hex_val}")
+                
+                # Tentar interpretar como número (temperatura?)
+                if len(value) >= 2:
+                    val_le = int.from_bytes(value[:2], 'little')
+                    val_be = int.from_bytes(value[:2], 'big')
+                    print(f"  Como número (little-endian): {val_le} ({val_le/100:.2f}°C?)")
+                    print(f"  Como número (big-endian): {val_be} ({val_be/100:.2f}°C?)")
 
 asyncio.run(main())
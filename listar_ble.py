@@ -1,6 +1,8 @@
 import asyncio
 from bleak import BleakClient, BleakScanner
 
+from ble.gatt_cache import CacheGatt
+
 ADDRESS = "DC:23:4E:DA:E9:DD"
 
 async def scan_devices():
@@ -32,8 +34,11 @@ async def main():
     print(f"\n[*] Conectando ao dispositivo {target_device.name} ({target_device.address})...")
     print("[*] Aguarde até 30 segundos para a conexão...")
     
-    async with BleakClient(target_device, timeout=30.0) as client:
+    cache = CacheGatt()
+    async with BleakClient(target_device, timeout=30.0, **cache.argumentos_cliente(ADDRESS)) as client:
         print("[+] Conectado com sucesso\n")
+        if cache.obter(ADDRESS) is None:
+            cache.guardar_servicos(ADDRESS, client)
 
         for service in client.services:
             print(f"SERVICE  UUID: {service.uuid}")
@@ -1,45 +1,55 @@
 import asyncio
-from bleak import BleakScanner
+import sys
+
+from ble.scan_daemon import ScannerCompartilhado
+from ble.trace import Gravador
 
 ADDRESS = "DC:23:4E:DA:E9:DD"
 
-# Guardar dados anteriores para detectar mudanças
+# Opcional: python monitorar_mudancas.py captura.bltrace
+gravador = Gravador(sys.argv[1]) if len(sys.argv) > 1 else None
+
+# Guardar dados anteriores (bytes crus) para detectar mudanças;
+# o hex só é montado quando algo muda e precisa ser impresso
 ultimo_service_data = None
 ultimo_manufacturer_data = None
+repetidos = 0
+
+def hexa(data):
+    return data.hex(" ").upper() if data is not None else None
 
 def detection_callback(device, advertisement_data):
-    global ultimo_service_data, ultimo_manufacturer_data
+    global ultimo_service_data, ultimo_manufacturer_data, repetidos
     
-    if device.address.upper() != ADDRESS.upper():
-        return
+    if gravador:
+        gravador.anuncio(device, advertisement_data)
     
     mudou = False
     
     # Verificar Service Data
     if advertisement_data.service_data:
         for uuid, data in advertisement_data.service_data.items():
-            hex_data = " ".join(f"{b:02X}" for b in data)
-            if hex_data != ultimo_service_data:
+            if data != ultimo_service_data:
                 if ultimo_service_data is not None:
-                    print(f"\n!!! SERVICE DATA MUDOU !!!")
-                    print(f"  Anterior: {ultimo_service_data}")
-                    print(f"  Novo:     {hex_data}")
+                    print(f"\n!!! SERVICE DATA MUDOU !!! ({repetidos} repetidos antes)")
+                    print(f"  Anterior: {hexa(ultimo_service_data)}")
+                    print(f"  Novo:     {hexa(data)}")
                     mudou = True
-                ultimo_service_data = hex_data
+                ultimo_service_data = bytes(data)
     
     # Verificar Manufacturer Data
     if advertisement_data.manufacturer_data:
         for company_id, data in advertisement_data.manufacturer_data.items():
-            hex_data = " ".join(f"{b:02X}" for b in data)
-            if hex_data != ultimo_manufacturer_data:
+            if data != ultimo_manufacturer_data:
                 if ultimo_manufacturer_data is not None:
-                    print(f"\n!!! MANUFACTURER DATA MUDOU !!!")
-                    print(f"  Anterior: {ultimo_manufacturer_data}")
-                    print(f"  Novo:     {hex_data}")
+                    print(f"\n!!! MANUFACTURER DATA MUDOU !!! ({repetidos} repetidos antes)")
+                    print(f"  Anterior: {hexa(ultimo_manufacturer_data)}")
+                    print(f"  Novo:     {hexa(data)}")
                     mudou = True
-                ultimo_manufacturer_data = hex_data
+                ultimo_manufacturer_data = bytes(data)
     
     if mudou:
+        repetidos = 0
         print("\n  ^ POSSÍVEL TEMPERATURA ACIMA ^")
         # Tentar decodificar
         if advertisement_data.service_data:
@@ -52,6 +62,7 @@ def detection_callback(device, advertisement_data):
                         if 30.0 <= temp <= 45.0:  # Faixa de temperatura corporal
                             print(f"  POSSÍVEL TEMP nos bytes {i}-{i+1}: {temp:.2f}°C")
     else:
+        repetidos += 1
         print(".", end="", flush=True)
 
 async def main():
@@ -60,7 +71,7 @@ async def main():
     print("[*] Pontos '.' indicam pacotes recebidos sem mudança")
     print("[*] Pressione Ctrl+C para parar\n")
     
-    scanner = BleakScanner(detection_callback=detection_callback)
+    scanner = ScannerCompartilhado(detection_callback, macs=[ADDRESS])
     await scanner.start()
     
     try:
@@ -70,9 +81,12 @@ async def main():
         pass
     finally:
         await scanner.stop()
+        if gravador:
+            gravador.fechar()
+            print(f"\n[*] {gravador.registros} pacotes gravados em {gravador.caminho}")
     
     print("\n\n[*] Monitoramento finalizado")
-    print(f"Último Service Data: {ultimo_service_data}")
-    print(f"Último Manufacturer Data: {ultimo_manufacturer_data}")
+    print(f"Último Service Data: {hexa(ultimo_service_data)}")
+    print(f"Último Manufacturer Data: {hexa(ultimo_manufacturer_data)}")
 
 asyncio.run(main())
@@ -1,5 +1,7 @@
 import asyncio
-from bleak import BleakClient, BleakScanner
+
+from ble.agendador import METADADOS, conexao
+from ble.gatt_cache import CacheGatt, nome, sincronizado
 
 # Endereço do possível Omron
 ADDRESS = "00:5F:BF:9A:64:DF"
@@ -11,81 +13,59 @@ INTERMEDIATE_CUFF_PRESSURE = "00002a36-0000-1000-8000-00805f9b34fb"
 BLOOD_PRESSURE_FEATURE = "00002a49-0000-1000-8000-00805f9b34fb"
 
 async def main():
-    print(f"[*] Escaneando dispositivo {ADDRESS}...")
-    devices = await BleakScanner.discover(timeout=15.0)
-    target = next((d for d in devices if d.address.upper() == ADDRESS.upper()), None)
-    
-    if not target:
-        print(f"[!] Dispositivo não encontrado! Ligue-o e ative o Bluetooth.")
-        return
+    print(f"[*] Aguardando {ADDRESS} anunciar...")
     
-    print(f"[+] Encontrado: {target.name}")
-    print("[*] Conectando...")
-    
-    async with BleakClient(target, timeout=30.0) as client:
-        print("[+] Conectado!\n")
+    cache = CacheGatt()
+    # Com o dispositivo no cache, a descoberta fica restrita aos serviços conhecidos.
+    # Leitura de metadados: prioridade baixa, cede a vaga para quem vai medir
+    try:
+        # Valores legíveis: estáticos do cache (mesmo firmware), o resto lido em paralelo
+        async with sincronizado(cache, ADDRESS, lambda **kw: conexao(ADDRESS, METADADOS, **kw)) as (client, banco):
+            print(f"[+] Conectado: {client.name}\n")
         
-        print("=" * 60)
-        print("SERVIÇOS E CARACTERÍSTICAS DO DISPOSITIVO")
-        print("=" * 60)
+            print("=" * 60)
+            print("SERVIÇOS E CARACTERÍSTICAS DO DISPOSITIVO")
+            print("=" * 60)
         
-        has_bp_service = False
+            has_bp_service = False
         
-        for service in client.services:
-            # Identificar serviços conhecidos
-            service_name = ""
-            if "1810" in service.uuid:
-                service_name = " *** BLOOD PRESSURE SERVICE ***"
-                has_bp_service = True
-            elif "1800" in service.uuid:
-                service_name = " (Generic Access)"
-            elif "1801" in service.uuid:
-                service_name = " (Generic Attribute)"
-            elif "180a" in service.uuid:
-                service_name = " (Device Information)"
-            elif "180f" in service.uuid:
-                service_name = " (Battery Service)"
+            for service in banco["servicos"]:
+                # Identificar serviços conhecidos
+                if service["uuid"] == BLOOD_PRESSURE_SERVICE:
+                    service_name = " *** BLOOD PRESSURE SERVICE ***"
+                    has_bp_service = True
+                else:
+                    service_name = f" ({nome(service['uuid'])})" if nome(service["uuid"]) else ""
             
-            print(f"\nSERVIÇO: {service.uuid}{service_name}")
+                print(f"\nSERVIÇO: {service['uuid']}{service_name}")
             
-            for char in service.characteristics:
-                props = ", ".join(char.properties)
+                for char in service["caracteristicas"]:
+                    props = ", ".join(char["propriedades"])
                 
-                char_name = ""
-                if "2a35" in char.uuid:
-                    char_name = " *** BLOOD PRESSURE MEASUREMENT ***"
-                elif "2a36" in char.uuid:
-                    char_name = " (Intermediate Cuff Pressure)"
-                elif "2a49" in char.uuid:
-                    char_name = " (Blood Pressure Feature)"
-                elif "2a00" in char.uuid:
-                    char_name = " (Device Name)"
-                elif "2a29" in char.uuid:
-                    char_name = " (Manufacturer)"
-                elif "2a24" in char.uuid:
-                    char_name = " (Model Number)"
+                    if char["uuid"] == BLOOD_PRESSURE_MEASUREMENT:
+                        char_name = " *** BLOOD PRESSURE MEASUREMENT ***"
+                    else:
+                        char_name = f" ({nome(char['uuid'])})" if nome(char["uuid"]) else ""
                 
-                print(f"  └─ {char.uuid}  | {props}{char_name}")
+                    print(f"  └─ {char['uuid']}  | {props}{char_name}")
                 
-                # Tentar ler características legíveis
-                if "read" in char.properties:
-                    try:
-                        value = await client.read_gatt_char(char.uuid)
-                        try:
-                            text = value.decode('utf-8', errors='ignore')
-                            if text.isprintable() and len(text.strip()) > 0:
-                                print(f"       Valor: {text.strip()}")
-                        except:
-                            hex_val = " ".join(f"{b:02X}" for b in value)
-                            print(f"       Valor: {hex_val}")
-                    except:
-                        pass
+                    value = banco["valores"].get(char["uuid"])
+                    if value is None:
+                        continue
+                    origem = " (cache)" if char["uuid"] in banco["do_cache"] else ""
+                    text = value.decode('utf-8', errors='ignore')
+                    if text.isprintable() and len(text.strip()) > 0:
+                        print(f"       Valor: {text.strip()}{origem}")
+                    else:
+                        print(f"       Valor: {value.hex(' ').upper()}{origem}")
         
-        print("\n" + "=" * 60)
-        if has_bp_service:
-            print("✓ ESTE É UM APARELHO DE PRESSÃO BLUETOOTH PADRÃO!")
-            print("  Podemos ler as medições!")
-        else:
-            print("Este dispositivo não tem o serviço padrão de pressão arterial.")
+            print("\n" + "=" * 60)
+            if has_bp_service:
+                print("✓ ESTE É UM APARELHO DE PRESSÃO BLUETOOTH PADRÃO!")
+                print("  Podemos ler as medições!")
+            else:
+                print("Este dispositivo não tem o serviço padrão de pressão arterial.")
+    except asyncio.TimeoutError:
+        print(f"[!] Dispositivo não encontrado! Ligue-o e ative o Bluetooth.")
 
 asyncio.run(main())
@@ -1,12 +1,10 @@
 import asyncio
-from bleak import BleakScanner
+
+from ble.scan_daemon import ScannerCompartilhado
 
 TARGET_MAC = "F8:8F:C8:3A:B7:92"
 
 def detection_callback(device, advertisement_data):
-    if device.address.upper() != TARGET_MAC:
-        return
-
     for _, data in advertisement_data.manufacturer_data.items():
         if len(data) >= 4 and data[0] == 0x24:
             raw_weight = (data[2] << 8) | data[3]
@@ -17,7 +15,7 @@ def detection_callback(device, advertisement_data):
 
 async def main():
     print("Suba na balança para capturar o peso...")
-    scanner = BleakScanner(detection_callback)
+    scanner = ScannerCompartilhado(detection_callback, macs=[TARGET_MAC])
     await scanner.start()
     await asyncio.sleep(15)
     await scanner.stop()
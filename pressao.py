@@ -1,128 +1,128 @@
+import argparse
 import asyncio
-from bleak import BleakClient, BleakScanner
-import struct
+import hashlib
+
+from ble.agendador import HISTORICO, MEDICAO, conexao
+from ble.console import Hex, console
+from ble.envio import Entregador
+from ble.gatt_saude import BP_MEASUREMENT as BP_MEASUREMENT_UUID, pressao_arterial, valores
+from ble.racp import CursorSync, baixar
 
 # Endereço do Omron HEM-7156T
 ADDRESS = "00:5F:BF:9A:64:DF"
+# --historico: todas as medições novas vão em um único POST
+BACKEND_LOTE_URL = "http://localhost:5239/api/biometrics/ble-readings"
 
-# UUIDs do Blood Pressure Service
-BP_MEASUREMENT_UUID = "00002a35-0000-1000-8000-00805f9b34fb"
+def caixa_pressao(leitura):
+    """Quadro da medição; montado pelo console, fora do callback"""
+    unit = leitura.unit
+    linhas = [
+        f"\n  ╔══════════════════════════════════════╗",
+        f"  ║     MEDIÇÃO DE PRESSÃO ARTERIAL       ║",
+        f"  ╠══════════════════════════════════════╣",
+        f"  ║  Sistólica:   {leitura.systolic:6.0f} {unit:5}          ║",
+        f"  ║  Diastólica:  {leitura.diastolic:6.0f} {unit:5}          ║",
+        f"  ║  MAP:         {leitura.map:6.0f} {unit:5}          ║",
+    ]
+    if leitura.timestamp:
+        linhas.append(f"  ║  Data/Hora:   {leitura.timestamp.replace('T', ' ')}   ║")
+    if leitura.heartRate is not None:
+        linhas.append(f"  ║  Pulso:       {leitura.heartRate:6.0f} bpm            ║")
+    linhas.append(f"  ╚══════════════════════════════════════╝\n")
+    return "\n".join(linhas)
 
 def parse_blood_pressure(data):
-    """
-    Decodifica dados de Blood Pressure Measurement conforme especificação Bluetooth
-    https://www.bluetooth.com/specifications/specs/gatt-specification-supplement/
-    """
-    if len(data) < 7:
-        print(f"  Dados incompletos: {data.hex()}")
+    """Decodifica Blood Pressure Measurement (ble.gatt_saude) e mostra o resultado"""
+    leitura = pressao_arterial(data)
+    if leitura is None:
+        console.log("  Dados incompletos: {}", Hex(data))
         return None
     
-    flags = data[0]
-    
-    # Bit 0: Unidade (0 = mmHg, 1 = kPa)
-    unit_kpa = flags & 0x01
-    unit = "kPa" if unit_kpa else "mmHg"
-    
-    # Bit 1: Timestamp presente
-    has_timestamp = (flags >> 1) & 0x01
-    
-    # Bit 2: Pulse Rate presente
-    has_pulse = (flags >> 2) & 0x01
-    
-    # Bit 3: User ID presente
-    has_user_id = (flags >> 3) & 0x01
-    
-    # Bit 4: Measurement Status presente
-    has_status = (flags >> 4) & 0x01
-    
-    # Valores de pressão são SFLOAT (IEEE 11073 16-bit)
-    # Bytes 1-2: Sistólica
-    # Bytes 3-4: Diastólica  
-    # Bytes 5-6: Mean Arterial Pressure
-    
-    def sfloat_to_float(raw):
-        """Converte SFLOAT para float"""
-        mantissa = raw & 0x0FFF
-        if mantissa >= 0x0800:
-            mantissa = mantissa - 0x1000  # Sinal negativo
-        exponent = (raw >> 12) & 0x0F
-        if exponent >= 0x08:
-            exponent = exponent - 0x10  # Sinal negativo
-        return mantissa * (10 ** exponent)
-    
-    systolic_raw = struct.unpack('<H', data[1:3])[0]
-    diastolic_raw = struct.unpack('<H', data[3:5])[0]
-    map_raw = struct.unpack('<H', data[5:7])[0]
-    
-    systolic = sfloat_to_float(systolic_raw)
-    diastolic = sfloat_to_float(diastolic_raw)
-    mean_ap = sfloat_to_float(map_raw)
-    
-    print(f"\n  ╔══════════════════════════════════════╗")
-    print(f"  ║     MEDIÇÃO DE PRESSÃO ARTERIAL       ║")
-    print(f"  ╠══════════════════════════════════════╣")
-    print(f"  ║  Sistólica:   {systolic:6.0f} {unit:5}          ║")
-    print(f"  ║  Diastólica:  {diastolic:6.0f} {unit:5}          ║")
-    print(f"  ║  MAP:         {mean_ap:6.0f} {unit:5}          ║")
-    
-    offset = 7
-    
-    # Timestamp (7 bytes se presente)
-    if has_timestamp and len(data) >= offset + 7:
-        year = struct.unpack('<H', data[offset:offset+2])[0]
-        month = data[offset+2]
-        day = data[offset+3]
-        hour = data[offset+4]
-        minute = data[offset+5]
-        second = data[offset+6]
-        print(f"  ║  Data/Hora:   {day:02d}/{month:02d}/{year} {hour:02d}:{minute:02d}:{second:02d}  ║")
-        offset += 7
-    
-    # Pulse Rate (2 bytes se presente)
-    if has_pulse and len(data) >= offset + 2:
-        pulse_raw = struct.unpack('<H', data[offset:offset+2])[0]
-        pulse = sfloat_to_float(pulse_raw)
-        print(f"  ║  Pulso:       {pulse:6.0f} bpm            ║")
-        offset += 2
-    
-    print(f"  ╚══════════════════════════════════════╝\n")
-    
-    return {
-        'systolic': systolic,
-        'diastolic': diastolic,
-        'map': mean_ap,
-        'unit': unit
-    }
+    console.log(caixa_pressao, leitura)
+    return leitura
 
 def bp_notification_handler(sender, data):
     """Callback para receber dados de pressão arterial"""
-    print(f"\n[DADOS RECEBIDOS] {len(data)} bytes")
-    print(f"  RAW: {data.hex()}")
+    console.log("\n[DADOS RECEBIDOS] {} bytes", len(data))
+    console.log("  RAW: {}", Hex(data))
     parse_blood_pressure(data)
 
-async def main():
+async def baixar_historico(client, cursor):
+    """Medições guardadas no aparelho e ainda não sincronizadas (RACP), já decodificadas"""
+    anterior = cursor.obter(ADDRESS)
+    console.log("[*] Baixando medições guardadas (último sync: {})", anterior.get("timestamp") or "nunca")
+    brutos = await baixar(client, BP_MEASUREMENT_UUID,
+                          ao_progresso=lambda n, total: console.ao_vivo("racp", "  {} / {} registro(s)", n, total or "?"))
+    console.limpar("racp")
+    
+    # Decodificação em lote, depois do download (nada de trabalho por indicação)
+    leituras = [leitura for leitura in map(pressao_arterial, brutos) if leitura is not None]
+    # Sem timestamp não dá para saber se já foi sincronizado (nem datar no prontuário): sempre fica de fora
+    sem_data = sum(1 for l in leituras if not l.timestamp)
+    if sem_data:
+        console.log("[!] {} registro(s) sem data/hora ignorado(s) - acerte o relógio do aparelho", sem_data)
+    ultimo = anterior.get("timestamp")
+    novas = [l for l in leituras if l.timestamp and (not ultimo or l.timestamp > ultimo)]
+    console.log("[+] {} registro(s) no aparelho, {} novo(s)", len(leituras), len(novas))
+    for leitura in novas:
+        console.log(caixa_pressao, leitura)
+    return novas
+
+async def enviar_historico(leituras, consulta, cursor):
+    """Um único POST com o histórico; o cursor só avança se o backend aceitar"""
+    datadas = [l.timestamp for l in leituras]
+    # Mesmo lote = mesma chave; o backend só guarda os valores mais recentes, então reaplicar o lote não muda nada
+    chave = hashlib.sha1(f"{ADDRESS}|{min(datadas)}|{max(datadas)}|{len(leituras)}".encode()).hexdigest()
+    payload = {
+        "appointmentId": consulta,
+        "deviceType": "blood_pressure",
+        "readingId": chave,
+        "readings": [{"timestamp": l.timestamp, "values": valores(l)} for l in leituras],
+    }
+    entregador = Entregador(BACKEND_LOTE_URL, workers=1, tentativas=3)
+    await entregador.iniciar()
+    try:
+        status = await entregador.postar(payload)
+    finally:
+        await entregador.encerrar()
+    if status == 200:
+        cursor.avancar(ADDRESS, timestamp=max(datadas))
+        print(f"[+] {len(leituras)} medição(ões) sincronizada(s)")
+    else:
+        print("[!] Histórico não enviado; o cursor não avançou (tente de novo)")
+
+async def main(args):
     print("=" * 50)
     print("    MONITOR DE PRESSÃO ARTERIAL OMRON")
     print("=" * 50)
     
-    print(f"\n[*] Escaneando {ADDRESS}...")
-    devices = await BleakScanner.discover(timeout=15.0)
-    target = next((d for d in devices if d.address.upper() == ADDRESS.upper()), None)
-    
-    if not target:
-        print(f"[!] Omron não encontrado! Ligue-o e ative Bluetooth.")
+    # Conecta quando o Omron estiver anunciando (ble.agendador): aparelho fora de
+    # alcance não prende a conexão até o timeout
+    print(f"\n[*] Aguardando {ADDRESS} anunciar para conectar...")
+    
+    if args.historico:
+        cursor = CursorSync()
+        novas = []
+        try:
+            async with conexao(ADDRESS, HISTORICO) as client:
+                print(f"[+] Conectado: {client.name}")
+                console.iniciar()
+                novas = await baixar_historico(client, cursor)
+        except asyncio.TimeoutError:
+            console.log("[!] Omron não encontrado! Ligue-o e ative Bluetooth.")
+        except Exception as e:
+            console.log("[!] Erro: {}", e)
+        finally:
+            await console.encerrar()
+        if novas and args.consulta:
+            await enviar_historico(novas, args.consulta, cursor)
+        elif novas:
+            print("[!] Sem --consulta: medições exibidas, mas não enviadas")
         return
     
-    print(f"[+] Encontrado: {target.name}")
-    print("[*] Conectando...")
-    
     try:
-        async with BleakClient(target, timeout=30.0) as client:
-            print("[+] Conectado!")
-            
-            # Ativar indicações para Blood Pressure Measurement
-            print("[*] Ativando recebimento de medições...\n")
-            await client.start_notify(BP_MEASUREMENT_UUID, bp_notification_handler)
+        async with conexao(ADDRESS, MEDICAO) as client:
+            print(f"[+] Conectado: {client.name}")
             
             print("=" * 50)
             print("  INSTRUÇÕES:")
@@ -132,20 +132,38 @@ async def main():
             print("  Aguardando por 2 minutos...")
             print("=" * 50)
             
+            # Daqui em diante a saída passa pelo console (callbacks não escrevem no terminal)
+            console.iniciar()
+            # Ativar indicações para Blood Pressure Measurement
+            console.log("[*] Ativando recebimento de medições...\n")
+            await client.start_notify(BP_MEASUREMENT_UUID, bp_notification_handler)
+            
             # Aguardar mantendo conexão ativa
             for i in range(120):
                 if not client.is_connected:
-                    print("\n[!] Conexão perdida!")
+                    console.log("\n[!] Conexão perdida!")
                     break
                 await asyncio.sleep(1)
             
-            print("\n[*] Finalizando...")
+            console.log("\n[*] Finalizando...")
             if client.is_connected:
                 try:
                     await client.stop_notify(BP_MEASUREMENT_UUID)
                 except:
                     pass
+    except asyncio.TimeoutError:
+        console.log("[!] Omron não encontrado! Ligue-o e ative Bluetooth.")
     except Exception as e:
-        print(f"[!] Erro: {e}")
+        console.log("[!] Erro: {}", e)
+    finally:
+        await console.encerrar()
+
+def argumentos():
+    parser = argparse.ArgumentParser(description="Monitor de pressão arterial Omron")
+    parser.add_argument("--historico", action="store_true",
+                        help="baixa as medições guardadas no aparelho (RACP) em vez de esperar uma nova")
+    parser.add_argument("--consulta", metavar="ID", help="com --historico: envia o lote para esta consulta")
+    return parser.parse_args()
 
-asyncio.run(main())
+if __name__ == "__main__":
+    asyncio.run(main(argumentos()))
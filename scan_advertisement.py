@@ -1,34 +1,41 @@
 import asyncio
-from bleak import BleakScanner
+import sys
+
+from ble.scan_daemon import ScannerCompartilhado
+from ble.trace import Gravador
 
 ADDRESS = "DC:23:4E:DA:E9:DD"
 
+# Opcional: python scan_advertisement.py captura.bltrace
+gravador = Gravador(sys.argv[1]) if len(sys.argv) > 1 else None
+
 def detection_callback(device, advertisement_data):
-    if device.address.upper() == ADDRESS.upper():
-        print(f"\n[{device.name}] RSSI: {advertisement_data.rssi} dBm")
-        
-        # Dados do fabricante (manufacturer data)
-        if advertisement_data.manufacturer_data:
-            for company_id, data in advertisement_data.manufacturer_data.items():
-                hex_data = " ".join(f"{b:02X}" for b in data)
-                print(f"  Manufacturer ({company_id:04X}): {hex_data}")
-        
-        # Dados de serviço
-        if advertisement_data.service_data:
-            for uuid, data in advertisement_data.service_data.items():
-                hex_data = " ".join(f"{b:02X}" for b in data)
-                print(f"  Service Data ({uuid}): {hex_data}")
-        
-        # Nome local
-        if advertisement_data.local_name:
-            print(f"  Local Name: {advertisement_data.local_name}")
+    if gravador:
+        gravador.anuncio(device, advertisement_data)
+    print(f"\n[{device.name}] RSSI: {advertisement_data.rssi} dBm")
+    
+    # Dados do fabricante (manufacturer data)
+    if advertisement_data.manufacturer_data:
+        for company_id, data in advertisement_data.manufacturer_data.items():
+            hex_data = " ".join(f"{b:02X}" for b in data)
+            print(f"  Manufacturer ({company_id:04X}): {hex_data}")
+    
+    # Dados de serviço
+    if advertisement_data.service_data:
+        for uuid, data in advertisement_data.service_data.items():
+            hex_data = " ".join(f"{b:02X}" for b in data)
+            print(f"  Service Data ({uuid}): {hex_data}")
+    
+    # Nome local
+    if advertisement_data.local_name:
+        print(f"  Local Name: {advertisement_data.local_name}")
 
 async def main():
     print(f"[*] Monitorando advertisements de {ADDRESS}")
     print("[*] Ligue o termômetro e faça medições!")
     print("[*] Pressione Ctrl+C para parar\n")
     
-    scanner = BleakScanner(detection_callback=detection_callback)
+    scanner = ScannerCompartilhado(detection_callback, macs=[ADDRESS])
     
     await scanner.start()
     
@@ -39,6 +46,9 @@ async def main():
         pass
     finally:
         await scanner.stop()
+        if gravador:
+            gravador.fechar()
+            print(f"[*] {gravador.registros} pacotes gravados em {gravador.caminho}")
         print("\n[*] Scan finalizado.")
 
 asyncio.run(main())
@@ -1,5 +1,13 @@
+import argparse
 import asyncio
-from bleak import BleakClient, BleakScanner
+import sys
+from collections import deque
+from datetime import datetime
+
+from ble.agendador import MEDICAO, conexao
+from ble.console import Hex, console
+from ble.sondagem import Sondador, carregar_matriz, matriz, reproduzir
+from ble.trace import Gravador
 
 ADDRESS = "DC:23:4E:DA:E9:DD"
 
@@ -9,96 +17,138 @@ CHAR_NOTIFY = "00000002-0000-1001-8001-00805f9b07d0"
 CHAR_WRITE_2 = "5833ff02-9b8b-5191-6142-22a4536ef123"
 CHAR_NOTIFY_2 = "5833ff03-9b8b-5191-6142-22a4536ef123"
 
-dados_recebidos = []
+# Últimas mensagens para o resumo final; a captura completa vai para o .bltrace
+dados_recebidos = deque(maxlen=200)
+total_recebidos = 0
 
-def parse_temperature(data):
-    """Tenta interpretar os bytes como temperatura"""
-    hex_str = " ".join(f"{b:02X}" for b in data)
-    print(f"  RAW: {hex_str}")
-    
+# Opcional: python temperatura.py captura.bltrace (notifies em .bltrace; a sondagem vai para o relatório JSON)
+gravador = None
+
+def interpretacoes(data):
+    """Várias tentativas de interpretação; montadas pelo console, fora do callback"""
+    linhas = [f"  RAW: {Hex(data)}"]
     if len(data) >= 2:
-        # Várias tentativas de interpretação
         val_le = int.from_bytes(data[:2], 'little', signed=False)
         val_le_signed = int.from_bytes(data[:2], 'little', signed=True)
         
-        print(f"  Interpretações possíveis:")
-        print(f"    - {val_le / 100:.2f} °C (little-endian /100)")
-        print(f"    - {val_le / 10:.1f} °C (little-endian /10)")
-        print(f"    - {val_le_signed / 100:.2f} °C (signed /100)")
+        linhas.append(f"  Interpretações possíveis:")
+        linhas.append(f"    - {val_le / 100:.2f} °C (little-endian /100)")
+        linhas.append(f"    - {val_le / 10:.1f} °C (little-endian /10)")
+        linhas.append(f"    - {val_le_signed / 100:.2f} °C (signed /100)")
         
         if len(data) >= 4:
             # Alguns termômetros usam 4 bytes
             val_4b = int.from_bytes(data[:4], 'little', signed=False)
-            print(f"    - {val_4b / 1000:.3f} °C (4 bytes /1000)")
+            linhas.append(f"    - {val_4b / 1000:.3f} °C (4 bytes /1000)")
+    return "\n".join(linhas)
+
+def parse_temperature(data):
+    """Tenta interpretar os bytes como temperatura"""
+    console.log(interpretacoes, bytes(data))
 
 def notification_handler(sender, data):
     """Processa dados recebidos via notify"""
-    print(f"\n[DADOS RECEBIDOS] de {sender}")
-    dados_recebidos.append(data)
+    global total_recebidos
+    console.log("\n[DADOS RECEBIDOS] de {}", sender)
+    total_recebidos += 1
+    dados_recebidos.append(bytes(data))
+    if gravador:
+        gravador.notificacao(ADDRESS, sender.uuid, data)
     parse_temperature(data)
 
-async def main():
-    print("[*] Escaneando termômetro m3ja...")
-    devices = await BleakScanner.discover(timeout=15.0)
-    target = next((d for d in devices if d.address.upper() == ADDRESS.upper()), None)
-    
-    if not target:
-        print(f"[!] Termômetro não encontrado! Certifique-se de que está ligado.")
-        return
+# Matriz de sondagem: cada payload em cada característica de escrita
+PAYLOADS = [
+    (bytes([0x01]), "Iniciar medição"),
+    (bytes([0x02]), "Solicitar temperatura"),
+    bytes([0x03]),
+    bytes([0x10]),
+    bytes([0x11]),
+    bytes([0xA1]),
+    bytes([0xA2]),
+]
+
+def resumo_sondagem(resultados):
+    linhas = ["", "=== COMANDOS ==="]
+    for r in resultados:
+        latencia = f"{r['latencia'] * 1000:.0f} ms" if r["latencia"] is not None else "-"
+        linhas.append(f"  {r['caracteristica'][:8]} {r['descricao']:<22} {r['status']:<13} "
+                      f"{latencia:>7}  {len(r['respostas'])} pacote(s)")
+        for resposta in r["respostas"][:3]:
+            linhas.append(f"      {resposta['caracteristica'][:8]}: {bytes.fromhex(resposta['data']).hex(' ').upper()}")
+    return "\n".join(linhas)
+
+async def main(args):
+    # O m3ja só anuncia logo após medir: conecta no anúncio, sem tentativa presa no timeout
+    print("[*] Aguardando o termômetro m3ja anunciar...")
     
-    print(f"[+] Encontrado: {target.name}")
-    print("[*] Conectando...")
+    if args.matriz:
+        comandos = carregar_matriz(args.matriz, so_respondidos=args.respondidos)
+    else:
+        comandos = matriz([CHAR_WRITE, CHAR_WRITE_2], PAYLOADS)
     
     try:
-        async with BleakClient(target, timeout=30.0) as client:
-            print("[+] Conectado!\n")
+        async with conexao(ADDRESS, MEDICAO) as client:
+            print(f"[+] Conectado: {client.name}\n")
             
+            # Daqui em diante a saída passa pelo console (callbacks não escrevem no terminal)
+            console.iniciar()
             # Ativar notify em ambas as características
-            print("[*] Ativando recebimento de dados...")
-            await client.start_notify(CHAR_NOTIFY, notification_handler)
-            await client.start_notify(CHAR_NOTIFY_2, notification_handler)
-            print("[+] Notify ativado\n")
-            
-            # Tentar diferentes comandos para solicitar temperatura
-            comandos = [
-                (bytes([0x01]), "Iniciar medição"),
-                (bytes([0x02]), "Solicitar temperatura"),
-                (bytes([0x03]), "Comando 0x03"),
-                (bytes([0x10]), "Comando 0x10"),
-                (bytes([0x11]), "Comando 0x11"),
-                (bytes([0xA1]), "Comando 0xA1"),
-                (bytes([0xA2]), "Comando 0xA2"),
-            ]
+            console.log("[*] Ativando recebimento de dados...")
+            sondador = Sondador(client, [CHAR_NOTIFY, CHAR_NOTIFY_2], notification_handler)
+            await sondador.preparar()
+            console.log("[+] Notify ativado\n")
             
-            print("[*] Enviando comandos para solicitar temperatura...")
-            for cmd, desc in comandos:
-                try:
-                    await client.write_gatt_char(CHAR_WRITE, cmd, response=False)
-                    print(f"  -> Enviado: {desc}")
-                    await asyncio.sleep(2)  # Esperar resposta
-                except Exception as e:
-                    print(f"  [!] Erro: {e}")
+            # Cada comando espera só até a resposta (timeout adaptativo por serviço)
+            console.log("[*] Enviando {} comandos...", len(comandos))
+            resultados = await sondador.executar(comandos)
+            console.log(resumo_sondagem, resultados)
             
-            print("\n[*] Aguardando dados por mais 30 segundos...")
-            print("[*] FAÇA UMA MEDIÇÃO COM O TERMÔMETRO AGORA!\n")
+            console.log("\n[*] Aguardando dados por mais {} segundos...", args.espera)
+            console.log("[*] FAÇA UMA MEDIÇÃO COM O TERMÔMETRO AGORA!\n")
             
-            for i in range(30):
+            for i in range(args.espera):
                 await asyncio.sleep(1)
                 if i % 10 == 9:
-                    print(f"  ... {30-i-1} segundos restantes")
+                    console.log("  ... {} segundos restantes", args.espera - i - 1)
             
-            print("\n[*] Finalizando...")
-            await client.stop_notify(CHAR_NOTIFY)
-            await client.stop_notify(CHAR_NOTIFY_2)
+            console.log("\n[*] Finalizando...")
+            await sondador.encerrar()
+            console.log("[+] Relatório: {}", sondador.relatorio(args.relatorio, ADDRESS, nome=client.name))
             
+    except asyncio.TimeoutError:
+        console.log("[!] Termômetro não encontrado! Certifique-se de que está ligado.")
     except Exception as e:
-        print(f"[!] Erro de conexão: {e}")
+        console.log("[!] Erro de conexão: {}", e)
+    finally:
+        await console.encerrar()
     
     print(f"\n=== RESUMO ===")
-    print(f"Total de mensagens recebidas: {len(dados_recebidos)}")
+    print(f"Total de mensagens recebidas: {total_recebidos}")
     if dados_recebidos:
-        print("Dados recebidos:")
-        for i, d in enumerate(dados_recebidos):
-            print(f"  {i+1}: {' '.join(f'{b:02X}' for b in d)}")
+        print(f"Últimas {len(dados_recebidos)} mensagens:")
+        for i, d in enumerate(dados_recebidos, total_recebidos - len(dados_recebidos) + 1):
+            print(f"  {i}: {' '.join(f'{b:02X}' for b in d)}")
+    if gravador:
+        gravador.fechar()
+        print(f"Captura gravada em {gravador.caminho}")
+
+def argumentos():
+    parser = argparse.ArgumentParser(description="Sondagem do termômetro m3ja")
+    parser.add_argument("captura", nargs="?", help="grava os notifies em .bltrace")
+    parser.add_argument("--relatorio", default=f"sondagem_{datetime.now():%Y%m%d_%H%M%S}.json",
+                        help="relatório JSON da sondagem")
+    parser.add_argument("--matriz", metavar="RELATORIO", help="repete os comandos de um relatório")
+    parser.add_argument("--respondidos", action="store_true", help="com --matriz: só os que responderam")
+    parser.add_argument("--reproduzir", metavar="RELATORIO",
+                        help="passa as respostas de um relatório pelas interpretações, sem o aparelho")
+    parser.add_argument("--espera", type=int, default=30, help="segundos aguardando medição manual")
+    return parser.parse_args()
 
-asyncio.run(main())
+if __name__ == "__main__":
+    args = argumentos()
+    if args.reproduzir:
+        print(resumo_sondagem(reproduzir(args.reproduzir, notification_handler)))
+        sys.exit(0)
+    if args.captura:
+        gravador = Gravador(args.captura)
+    asyncio.run(main(args))
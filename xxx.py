@@ -1,5 +1,9 @@
 import asyncio
-from bleak import BleakClient, BleakScanner
+
+from ble.estabilizacao import para_tipo
+from ble.gatt_cache import CacheGatt
+from ble.scan_daemon import ScannerCompartilhado
+from ble.sessoes import GerenciadorSessoes
 
 # ===== DADOS DO SEU TERMÔMETRO =====
 ADDRESS = "DC:23:4E:DA:E9:DD"
@@ -10,6 +14,9 @@ CHAR_NOTIFY_2 = "5833ff03-9b8b-5191-6142-22a4536ef123"  # Serviço 5833ff01
 CHAR_WRITE_1 = "00000001-0000-1001-8001-00805f9b07d0"   # Serviço 0000fd50
 CHAR_WRITE_2 = "5833ff02-9b8b-5191-6142-22a4536ef123"   # Serviço 5833ff01
 
+# Valor final = leitura que para de variar
+termometro = para_tipo("thermometer")
+
 def notification_handler(sender, data):
     hex_data = " ".join(f"{b:02X}" for b in data)
     print(f"[NOTIFY] RAW BYTES: {hex_data}")
@@ -19,6 +26,10 @@ def notification_handler(sender, data):
         value = int.from_bytes(data[:2], byteorder="little")
         print(f"[INFO] Valor bruto: {value}")
         print(f"[INFO] Possível temperatura: {value / 100:.2f} °C")
+        if 30.0 <= value / 100 <= 45.0:  # Faixa de temperatura corporal
+            final = termometro.adicionar(value / 100)
+            if final is not None:
+                print(f"[OK] Temperatura estável: {final:.1f} °C ({termometro.tempo_confirmacao:.1f}s)")
 
 async def send_command(client, char_uuid, command, description):
     """Tenta enviar um comando para uma característica"""
@@ -30,59 +41,36 @@ async def send_command(client, char_uuid, command, description):
         print(f"[!] Falha ao enviar {description}: {e}")
         return False
 
-async def connect_and_listen(target):
-    """Conecta ao dispositivo e escuta por notificações"""
-    try:
-        client = BleakClient(target, timeout=20.0)
-        await client.connect()
-        print("[+] Conectado!")
-        
-        await client.start_notify(CHAR_NOTIFY_1, notification_handler)
-        await client.start_notify(CHAR_NOTIFY_2, notification_handler)
-        
-        # Enviar comando START
-        await send_command(client, CHAR_WRITE_1, bytes([0x01]), "START")
-        
-        # Aguardar enquanto conectado
-        while client.is_connected:
-            await asyncio.sleep(0.5)
-            
-        print("[!] Dispositivo desconectou")
-        return True
-    except Exception as e:
-        print(f"[!] Erro: {e}")
-        return False
+async def iniciar_medicao(client):
+    """Logo após as inscrições: o termômetro só manda dados depois do START"""
+    await send_command(client, CHAR_WRITE_1, bytes([0x01]), "START")
+
+def ao_notificar(mac, uuid, data):
+    notification_handler(uuid, data)
 
 async def main():
-    print("[*] Escaneando dispositivo...")
-    devices = await BleakScanner.discover(timeout=15.0)
-    target = next((d for d in devices if d.address.upper() == ADDRESS.upper()), None)
-    
-    if not target:
-        print(f"[!] Dispositivo {ADDRESS} não encontrado. Ligue o termômetro!")
-        return
+    # O termômetro só aceita conexão por alguns segundos depois de medir: em vez de
+    # re-escanear a cada tentativa, o scan fica ligado e a sessão conecta no
+    # primeiro anúncio, com as inscrições já prontas (ble/sessoes.py)
+    sessoes = GerenciadorSessoes(ao_notificar, conexoes_simultaneas=1, timeout_conexao=10.0,
+                                 backoff_max=1.0, cache=CacheGatt())
+    sessoes.adicionar(ADDRESS, [CHAR_NOTIFY_1, CHAR_NOTIFY_2], ao_inscrever=iniciar_medicao)
     
-    print(f"[+] Encontrado: {target.name}")
-    print("[*] Aguardando conexões por 2 minutos...")
-    print("[*] Faça medições com o termômetro!\n")
+    def detection_callback(device, advertisement_data):
+        sessoes.anuncio(device.address.upper(), device)
     
-    start_time = asyncio.get_event_loop().time()
-    timeout = 120  # 2 minutos
+    scanner = ScannerCompartilhado(detection_callback, macs=[ADDRESS])
+    await scanner.start()
+    sessoes.iniciar()
     
-    while (asyncio.get_event_loop().time() - start_time) < timeout:
-        print("[*] Tentando conectar...")
-        
-        # Re-escanear para pegar o dispositivo atualizado
-        devices = await BleakScanner.discover(timeout=5.0)
-        target = next((d for d in devices if d.address.upper() == ADDRESS.upper()), None)
-        
-        if target:
-            await connect_and_listen(target)
-        else:
-            print("[!] Dispositivo não encontrado no scan. Ligue-o novamente.")
-        
-        await asyncio.sleep(2)
+    print(f"[*] Aguardando o termômetro {ADDRESS} por 2 minutos...")
+    print("[*] Faça medições com o termômetro!\n")
     
-    print("\n[*] Tempo esgotado. Finalizando.")
+    try:
+        await asyncio.sleep(120)  # 2 minutos
+        print("\n[*] Tempo esgotado. Finalizando.")
+    finally:
+        await scanner.stop()
+        await sessoes.encerrar()
 
 asyncio.run(main())